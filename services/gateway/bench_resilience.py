@@ -0,0 +1,179 @@
+"""Drive the gateway through an upstream brownout and report latency, errors and RSS.
+
+Starts a fake locations upstream with injectable latency and error rate plus
+the gateway under uvicorn (response cache disabled so every request reaches
+the upstream). Load runs through three phases: healthy, brownout (slow and
+failing), and recovered. Per phase it prints status counts, p50/p99 latency,
+peak gateway RSS, and the circuit breaker state::
+
+    python bench_resilience.py --concurrency 200 --brownout-latency 3 --brownout-error-rate 0.5
+
+Gateway settings can be overridden through the usual env vars, e.g.
+``GATEWAY_LOCATIONS_BREAKER_OPEN_SECONDS=5``. Linux only (RSS comes from
+/proc). Needs uvicorn and httpx installed locally.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import httpx
+
+from bench_stream import free_port, rss_mb, spawn
+
+# Mutated by the bench through PUT /_faults on the fake upstream.
+FAULTS = {"latency": 0.0, "error_rate": 0.0}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--label", default="run", help="Name printed next to the results")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent client loops")
+    parser.add_argument("--healthy-seconds", type=float, default=5.0)
+    parser.add_argument("--brownout-seconds", type=float, default=15.0)
+    parser.add_argument("--recovered-seconds", type=float, default=15.0)
+    parser.add_argument("--healthy-latency", type=float, default=0.01, help="Seconds per upstream call")
+    parser.add_argument("--brownout-latency", type=float, default=3.0, help="Seconds per upstream call")
+    parser.add_argument("--brownout-error-rate", type=float, default=0.5, help="Fraction of 503s")
+    parser.add_argument("--serve-upstream", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+async def upstream_app(scope, receive, send) -> None:
+    """Fake upstream: GET sleeps FAULTS["latency"] and fails FAULTS["error_rate"] of calls."""
+    if scope["type"] != "http":
+        return
+    if scope["path"] == "/_faults":
+        query = dict(
+            part.split("=", 1) for part in scope["query_string"].decode().split("&") if "=" in part
+        )
+        FAULTS.update({key: float(value) for key, value in query.items() if key in FAULTS})
+        status, body = 200, json.dumps(FAULTS).encode()
+    else:
+        latency = FAULTS["latency"]
+        await asyncio.sleep(random.uniform(0.5 * latency, 1.5 * latency))
+        if random.random() < FAULTS["error_rate"]:
+            status, body = 503, b"injected failure"
+        else:
+            status, body = 200, b'{"ok": true}'
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def client_loop(
+    client: httpx.AsyncClient,
+    deadline: float,
+    statuses: Counter,
+    latencies: List[float],
+) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/locations/{random.randrange(10_000)}")
+            statuses[response.status_code] += 1
+        except httpx.HTTPError:
+            statuses["client_error"] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+def metric_values(text: str, name: str) -> Dict[str, float]:
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(name):
+            key, _, value = line.rpartition(" ")
+            values[key[len(name) :]] = float(value)
+    return values
+
+
+async def run_phase(
+    name: str,
+    seconds: float,
+    concurrency: int,
+    gateway: httpx.AsyncClient,
+    gateway_pid: int,
+) -> None:
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    peak = rss_mb(gateway_pid)
+
+    async def sample() -> None:
+        nonlocal peak
+        while time.perf_counter() < deadline:
+            peak = max(peak, rss_mb(gateway_pid))
+            await asyncio.sleep(0.05)
+
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        sample(), *(client_loop(gateway, deadline, statuses, latencies) for _ in range(concurrency))
+    )
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    metrics = (await gateway.get("/metrics")).text
+    state = metric_values(metrics, "gateway_circuit_state").get('{upstream="locations"}', 0.0)
+    rejected = defaultdict(float)
+    for labels, value in metric_values(metrics, "gateway_rejected_requests_total").items():
+        if 'upstream="locations"' in labels:
+            rejected[labels.split('reason="')[1].split('"')[0]] += value
+    print(
+        f"{name:<10} n={len(latencies):<6} p50={p50 * 1000:8.1f}ms p99={p99 * 1000:8.1f}ms  "
+        f"statuses={dict(sorted(statuses.items(), key=str))}  peak RSS {peak:6.1f} MB  "
+        f"breaker={['closed', 'half-open', 'open'][int(state)]}  rejected(total)={dict(rejected)}"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    upstream_port, gateway_port = free_port(), free_port()
+    env = dict(os.environ)
+    upstream = spawn(
+        [sys.executable, __file__, "--serve-upstream", str(upstream_port)], env, upstream_port
+    )
+    env["LOCATIONS_BASE_URL"] = f"http://127.0.0.1:{upstream_port}"
+    env.setdefault("GATEWAY_CACHE_TTLS", "locations=0")
+    env.setdefault("LOG_LEVEL", "CRITICAL")
+    gateway_process = spawn(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(gateway_port), "--log-level", "warning"],
+        env,
+        gateway_port,
+    )
+    phases = [
+        ("healthy", args.healthy_seconds, args.healthy_latency, 0.0),
+        ("brownout", args.brownout_seconds, args.brownout_latency, args.brownout_error_rate),
+        ("recovered", args.recovered_seconds, args.healthy_latency, 0.0),
+    ]
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency + 1)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{gateway_port}", limits=limits, timeout=120.0
+        ) as gateway, httpx.AsyncClient(base_url=f"http://127.0.0.1:{upstream_port}") as control:
+            print(f"[{args.label}] concurrency {args.concurrency}")
+            for name, seconds, latency, error_rate in phases:
+                await control.put("/_faults", params={"latency": latency, "error_rate": error_rate})
+                await run_phase(name, seconds, args.concurrency, gateway, gateway_process.pid)
+    finally:
+        for process in (gateway_process, upstream):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.serve_upstream is not None:
+        import uvicorn
+
+        uvicorn.run(upstream_app, port=args.serve_upstream, log_level="warning")
+        return
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
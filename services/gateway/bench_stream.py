@@ -0,0 +1,234 @@
+"""Measure gateway time-to-first-byte and RSS while proxying multi-MB bodies.
+
+Starts a fake upstream (it streams a large body and counts uploaded bytes)
+plus the gateway itself under uvicorn, pointing ``LOCATIONS_BASE_URL`` at the
+fake. It then downloads and uploads bodies through the gateway while sampling
+the gateway's resident memory::
+
+    python bench_stream.py --size-mb 50 --concurrency 8 --label streaming
+
+Run it against the previous build (``git stash`` the gateway) to compare:
+a buffering proxy shows TTFB close to the full transfer time and RSS growing
+with size x concurrency. Linux only (RSS comes from /proc). Needs uvicorn and
+httpx installed locally.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import httpx
+
+CHUNK_BYTES = 64 * 1024
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--label", default="run", help="Name printed next to the results")
+    parser.add_argument("--size-mb", type=float, default=50.0, help="Body size per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel transfers per phase")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds of parallel transfers per phase")
+    parser.add_argument(
+        "--upstream-mbps",
+        type=float,
+        default=200.0,
+        help="Throttle the fake upstream to this many MB/s (0 = unthrottled)",
+    )
+    parser.add_argument("--serve-upstream", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+async def upstream_app(scope, receive, send) -> None:
+    """Minimal ASGI upstream: GET streams ``?bytes=N``; POST/PUT count the upload."""
+    if scope["type"] != "http":
+        return
+    if scope["method"] in {"POST", "PUT"}:
+        received = 0
+        more = True
+        while more:
+            message = await receive()
+            received += len(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = str(received).encode()
+        headers = [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    query = dict(part.split("=", 1) for part in scope["query_string"].decode().split("&") if "=" in part)
+    remaining = int(query.get("bytes", "0"))
+    delay = float(query.get("chunk_delay", "0"))
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/octet-stream"),
+                (b"content-length", str(remaining).encode()),
+            ],
+        }
+    )
+    chunk = b"x" * CHUNK_BYTES
+    while remaining > 0:
+        piece = chunk[: min(CHUNK_BYTES, remaining)]
+        remaining -= len(piece)
+        await send({"type": "http.response.body", "body": piece, "more_body": remaining > 0})
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        key, _, value = line.partition(":")
+        if key == "VmRSS":
+            return int(value.split()[0]) / 1024
+    return 0.0
+
+
+def spawn(args: List[str], env: dict, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(args, env=env, cwd=Path(__file__).resolve().parent)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return process
+        time.sleep(0.1)
+    process.kill()
+    raise SystemExit(f"{' '.join(args)} did not start listening on {port}")
+
+
+async def download(client: httpx.AsyncClient, url: str) -> Tuple[float, float, int]:
+    started = time.perf_counter()
+    ttfb = None
+    received = 0
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            received += len(chunk)
+    return ttfb or 0.0, time.perf_counter() - started, received
+
+
+async def upload(client: httpx.AsyncClient, url: str, size: int) -> Tuple[float, float, int]:
+    async def body():
+        remaining = size
+        chunk = b"y" * CHUNK_BYTES
+        while remaining > 0:
+            piece = chunk[: min(CHUNK_BYTES, remaining)]
+            remaining -= len(piece)
+            yield piece
+
+    started = time.perf_counter()
+    response = await client.post(url, content=body(), headers={"content-length": str(size)})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, int(response.text)
+
+
+async def sample_rss(pid: int, stop: asyncio.Event, peaks: List[float]) -> None:
+    while not stop.is_set():
+        peaks.append(rss_mb(pid))
+        await asyncio.sleep(0.02)
+
+
+async def run_phase(
+    name: str, gateway_pid: int, make_transfer, concurrency: int, rounds: int, size: int
+) -> None:
+    stop = asyncio.Event()
+    samples: List[float] = []
+    baseline = rss_mb(gateway_pid)
+    sampler = asyncio.create_task(sample_rss(gateway_pid, stop, samples))
+    results = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results.extend(await asyncio.gather(*(make_transfer() for _ in range(concurrency))))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    bad = [received for _, _, received in results if received != size]
+    ttfbs = sorted(ttfb for ttfb, _, _ in results)
+    totals = sorted(total for _, total, _ in results)
+    moved = size * len(results) / 1e6
+    print(
+        f"{name:<9} n={len(results):<4} ttfb p50={statistics.median(ttfbs) * 1000:8.1f}ms "
+        f"p99={ttfbs[min(len(ttfbs) - 1, int(len(ttfbs) * 0.99))] * 1000:8.1f}ms  "
+        f"total p50={statistics.median(totals) * 1000:8.1f}ms  {moved / elapsed:7.1f} MB/s  "
+        f"gateway RSS {baseline:6.1f} -> peak {max(samples, default=baseline):6.1f} MB"
+        + (f"  SHORT BODIES: {len(bad)}" if bad else "")
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    size = int(args.size_mb * 1024 * 1024)
+    upstream_port, gateway_port = free_port(), free_port()
+    env = dict(os.environ)
+    upstream = spawn(
+        [sys.executable, __file__, "--serve-upstream", str(upstream_port)], env, upstream_port
+    )
+    env["LOCATIONS_BASE_URL"] = f"http://127.0.0.1:{upstream_port}"
+    env.setdefault("LOG_LEVEL", "WARNING")
+    gateway = spawn(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(gateway_port), "--log-level", "warning"],
+        env,
+        gateway_port,
+    )
+    try:
+        chunk_delay = CHUNK_BYTES / (args.upstream_mbps * 1024 * 1024) if args.upstream_mbps else 0
+        base = f"http://127.0.0.1:{gateway_port}"
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base, limits=limits, timeout=300.0) as client:
+            print(
+                f"[{args.label}] {args.size_mb:g} MB bodies, concurrency {args.concurrency}, "
+                f"upstream {args.upstream_mbps:g} MB/s"
+            )
+            await run_phase(
+                "download",
+                gateway.pid,
+                lambda: download(client, f"/locations/blob?bytes={size}&chunk_delay={chunk_delay}"),
+                args.concurrency,
+                args.rounds,
+                size,
+            )
+            await run_phase(
+                "upload",
+                gateway.pid,
+                lambda: upload(client, "/locations/upload", size),
+                args.concurrency,
+                args.rounds,
+                size,
+            )
+    finally:
+        for process in (gateway, upstream):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.serve_upstream is not None:
+        import uvicorn
+
+        uvicorn.run(upstream_app, port=args.serve_upstream, log_level="warning")
+        return
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Response compression for upstreams that send identity bodies.
+
+Upstreams that already compress (locations precomputes its variants) are
+relayed untouched; the gateway only encodes compressible 2xx bodies that
+arrive without a Content-Encoding.
+"""
+
+from __future__ import annotations
+
+import gzip
+import zlib
+from typing import Dict, Mapping, Optional
+
+import brotli
+import zstandard
+
+# Server preference when the client weighs several codings equally.
+CODINGS = ("zstd", "br", "gzip")
+# Fast levels: streamed bodies are compressed per request.
+LEVELS = {"zstd": 3, "br": 4, "gzip": 5}
+COMPRESSIBLE_STATUSES = {200, 201, 202}
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick a coding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        param, _, value = params.strip().partition("=")
+        if param.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    wildcard = weights.get("*")
+    best, best_weight = None, 0.0
+    for coding in CODINGS:
+        weight = weights.get(coding, wildcard if wildcard is not None else 0.0)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compressible(status_code: int, headers: Mapping[str, str], min_bytes: int) -> bool:
+    if status_code not in COMPRESSIBLE_STATUSES:
+        return False
+    if headers.get("content-encoding", "identity").lower() != "identity":
+        return False
+    if "no-transform" in headers.get("cache-control", "").lower():
+        return False
+    content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if not (content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(("+json", "+xml"))):
+        return False
+    length = headers.get("content-length")
+    return length is None or int(length) >= min_bytes
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=LEVELS[coding]).compress(body)
+    if coding == "br":
+        return brotli.compress(body, quality=LEVELS[coding])
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=LEVELS[coding], mtime=0)
+    raise ValueError(f"Unsupported content coding {coding!r}")
+
+
+class StreamCompressor:
+    """Incremental encoder for bodies relayed chunk by chunk."""
+
+    def __init__(self, coding: str) -> None:
+        self.coding = coding
+        if coding == "zstd":
+            self._encoder = zstandard.ZstdCompressor(level=LEVELS[coding]).compressobj()
+        elif coding == "br":
+            self._encoder = brotli.Compressor(quality=LEVELS[coding])
+        elif coding == "gzip":
+            self._encoder = zlib.compressobj(LEVELS[coding], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported content coding {coding!r}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.coding == "br":
+            return self._encoder.process(chunk)
+        return self._encoder.compress(chunk)
+
+    def flush(self) -> bytes:
+        if self.coding == "br":
+            return self._encoder.finish()
+        return self._encoder.flush()
+
+
+def vary_on_accept_encoding(headers: Dict[str, str]) -> None:
+    names = [name.strip() for name in headers.get("vary", "").split(",") if name.strip()]
+    if not any(name.lower() in {"accept-encoding", "*"} for name in names):
+        headers["vary"] = ", ".join(names + ["Accept-Encoding"])
+
+
+def weaken_etag(headers: Dict[str, str]) -> None:
+    """The gateway changed the bytes, so the upstream's strong ETag no longer holds."""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
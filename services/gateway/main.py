@@ -1,15 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
-from typing import Dict, Iterable, Optional
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 import httpx
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from prometheus_client import Counter
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_client import Counter, Gauge, Histogram
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from compression import (
+    StreamCompressor,
+    compress,
+    compressible,
+    negotiate,
+    vary_on_accept_encoding,
+    weaken_etag,
+)
+from resilience import STATE_VALUES, AdmissionLimiter, CircuitBreaker, RetryBudget, backoff_seconds
+from response_cache import (
+    CachedResponse,
+    ResponseCache,
+    build_entry,
+    has_credentials,
+    parse_cache_control,
+    storable,
+)
+from routes import Route, RouteTable, compile_routes
+
 logger = logging.getLogger("gateway-service")
 logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 
@@ -29,6 +54,33 @@ ALLOWED_ORIGINS = [
     for origin in os.environ.get("ALLOWED_ORIGINS", DEFAULT_ALLOWED_ORIGINS).split(",")
     if origin.strip()
 ]
+CACHE_MAX_BYTES = int(os.environ.get("GATEWAY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.environ.get("GATEWAY_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+# Identity upstream bodies smaller than this are relayed uncompressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("GATEWAY_COMPRESS_MIN_BYTES", "1024"))
+# "upstream=seconds" pairs. A route's TTL caps upstream max-age and applies when
+# the upstream sends none; 0 or a missing entry disables caching for that route.
+CACHE_ROUTE_TTLS = {
+    name.strip(): float(ttl)
+    for name, _, ttl in (
+        pair.partition("=")
+        for pair in os.environ.get("GATEWAY_CACHE_TTLS", "locations=5,legacy=10").split(",")
+        if pair.strip()
+    )
+}
+# JSON route table (see routes.py), normally mounted from the gateway-routes
+# ConfigMap. It is re-read whenever the file changes; without it the gateway
+# sends /locations and /photos to LOCATIONS_BASE_URL and everything else to
+# LEGACY_BASE_URL.
+ROUTES_FILE = os.environ.get("GATEWAY_ROUTES_FILE", "/etc/gateway/routes.json")
+ROUTES_RELOAD_SECONDS = float(os.environ.get("GATEWAY_ROUTES_RELOAD_SECONDS", "5"))
+DEFAULT_UPSTREAMS = {"locations": LOCATIONS_BASE_URL, "legacy": LEGACY_BASE_URL}
+DEFAULT_ROUTES = [
+    {"prefix": "/locations", "upstream": "locations"},
+    {"prefix": "/locations:batch", "upstream": "locations"},
+    {"prefix": "/photos", "upstream": "locations"},
+    {"prefix": "/", "upstream": "legacy"},
+]
 
 HOP_BY_HOP_HEADERS = {
     "connection",
@@ -43,7 +95,114 @@ HOP_BY_HOP_HEADERS = {
     "content-length",
 }
 
+
+class UpstreamPoolConfig(NamedTuple):
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    http2: bool
+    connect_timeout: float
+    read_timeout: float
+    write_timeout: float
+    pool_timeout: float
+
+
+class UpstreamResilienceConfig(NamedTuple):
+    # Admission control: concurrent calls and callers queued behind them.
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+    # Circuit breaker over the last `breaker_window` calls.
+    breaker_failure_ratio: float
+    breaker_min_calls: int
+    breaker_window: int
+    breaker_open_seconds: float
+    breaker_half_open_probes: int
+    # Retries (GET/HEAD only) within a budget of `retry_budget_ratio` x traffic.
+    retry_attempts: int
+    retry_budget_ratio: float
+    retry_min_per_second: float
+    retry_backoff_base: float
+    retry_backoff_cap: float
+
+
+class UpstreamState(NamedTuple):
+    pool: UpstreamPoolConfig
+    resilience: UpstreamResilienceConfig
+    client: httpx.AsyncClient
+    breaker: CircuitBreaker
+    retry_budget: RetryBudget
+    admission: AdmissionLimiter
+
+
+def _upstream_config(upstream: str, defaults: Any) -> Any:
+    """Read GATEWAY_<UPSTREAM>_<FIELD> overrides, e.g. GATEWAY_LEGACY_MAX_CONNECTIONS."""
+    values: Dict[str, Any] = {}
+    prefix = upstream.upper().replace("-", "_")
+    for field, default in defaults._asdict().items():
+        raw = os.environ.get(f"GATEWAY_{prefix}_{field.upper()}")
+        if raw is None:
+            values[field] = default
+        elif isinstance(default, bool):
+            values[field] = raw.strip().lower() in {"1", "true", "yes", "on"}
+        else:
+            values[field] = type(default)(raw)
+    return type(defaults)(**values)
+
+
+# Each upstream gets its own client so a slow or saturated one cannot take the
+# other's connections. The locations keep-alive expiry stays under uvicorn's 5s
+# idle timeout so the gateway never reuses a socket the service just closed;
+# the legacy API Gateway is TLS, where HTTP/2 and long-lived connections save
+# handshakes. Upstreams added through the route table start from DEFAULT_POOL.
+DEFAULT_POOL = UpstreamPoolConfig(
+    max_connections=50,
+    max_keepalive_connections=20,
+    keepalive_expiry=4.0,
+    http2=False,
+    connect_timeout=2.0,
+    read_timeout=30.0,
+    write_timeout=30.0,
+    pool_timeout=5.0,
+)
+UPSTREAM_POOLS = {
+    "locations": DEFAULT_POOL._replace(max_connections=100, max_keepalive_connections=50),
+    "legacy": DEFAULT_POOL._replace(
+        max_keepalive_connections=50, keepalive_expiry=60.0, http2=True, connect_timeout=5.0
+    ),
+}
+
+DEFAULT_RESILIENCE = UpstreamResilienceConfig(
+    max_concurrent=200,
+    max_queue=100,
+    queue_timeout=1.0,
+    breaker_failure_ratio=0.5,
+    breaker_min_calls=20,
+    breaker_window=50,
+    breaker_open_seconds=10.0,
+    breaker_half_open_probes=1,
+    retry_attempts=2,
+    retry_budget_ratio=0.2,
+    retry_min_per_second=1.0,
+    retry_backoff_base=0.05,
+    retry_backoff_cap=1.0,
+)
+
+# Conditional request headers (If-None-Match, If-Modified-Since) are end-to-end
+# and are forwarded as-is so upstreams can answer 304 Not Modified. Cacheable
+# reads are the exception: the cache revalidates with its own validators and
+# answers the client's conditionals itself.
+CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since", "if-match", "if-unmodified-since"}
 ALLOWED_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"]
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Only bodiless idempotent reads are retried: other request bodies are
+# streamed to the upstream and cannot be replayed.
+RETRYABLE_METHODS = {"GET", "HEAD"}
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+RETRYABLE_STATUSES = {502, 503, 504}
+# Statuses that count against an upstream's circuit breaker, along with
+# transport errors and timeouts. Other 5xx are application errors.
+BREAKER_FAILURE_STATUSES = {502, 503, 504}
 
 app = FastAPI(title="Gateway Service", version="0.1.0")
 app.add_middleware(
@@ -55,13 +214,89 @@ app.add_middleware(
 )
 Instrumentator().instrument(app).expose(app, include_in_schema=False)
 
-_client: Optional[httpx.AsyncClient] = None
+# Created on first use, so upstreams introduced by a route reload get their
+# own pool and breaker. Keyed by upstream name, so they survive reloads.
+_upstreams: Dict[str, UpstreamState] = {}
+# Empty until _load_routes succeeds; requests then get a 503 rather than a 404.
+route_table = RouteTable([])
+_routes_signature: Optional[Tuple[int, int, int]] = None
+_route_watcher: Optional["asyncio.Task[None]"] = None
+response_cache = ResponseCache(CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES)
+# Upstream GETs currently being fetched into the cache, by variant key. Their
+# futures resolve to the stored entry, or None when it was not cacheable.
+_in_flight: Dict[Tuple, "asyncio.Future[Optional[CachedResponse]]"] = {}
 
 PROXY_REQUESTS = Counter(
     "gateway_proxy_requests_total",
     "Total number of proxied requests grouped by upstream and outcome",
     ("upstream", "outcome"),
 )
+CACHE_EVENTS = Counter(
+    "gateway_cache_events_total",
+    "Gateway response cache lookups grouped by upstream and event "
+    "(hit, revalidated, miss, coalesced, bypass)",
+    ("upstream", "event"),
+)
+CACHE_BYTES = Gauge("gateway_cache_bytes", "Bytes held by the gateway response cache")
+REJECTED_REQUESTS = Counter(
+    "gateway_rejected_requests_total",
+    "Requests answered with 503 without reaching the upstream, by reason "
+    "(overloaded, circuit_open)",
+    ("upstream", "reason"),
+)
+UPSTREAM_RETRIES = Counter(
+    "gateway_upstream_retries_total",
+    "Retries of idempotent upstream requests, by outcome (sent, budget_exhausted)",
+    ("upstream", "outcome"),
+)
+CIRCUIT_STATE = Gauge(
+    "gateway_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("upstream",),
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "gateway_admission_in_flight",
+    "Upstream calls holding an admission slot",
+    ("upstream",),
+)
+ADMISSION_QUEUED = Gauge(
+    "gateway_admission_queued",
+    "Requests waiting for an admission slot",
+    ("upstream",),
+)
+POOL_CONNECTIONS = Gauge(
+    "gateway_upstream_pool_connections",
+    "Open connections per upstream pool by state (active, idle)",
+    ("upstream", "state"),
+)
+POOL_QUEUED = Gauge(
+    "gateway_upstream_pool_queued_requests",
+    "Requests waiting for a free connection in each upstream pool",
+    ("upstream",),
+)
+POOL_WAIT_SECONDS = Histogram(
+    "gateway_upstream_pool_wait_seconds",
+    "Time a request waited for a pooled connection before it was sent",
+    ("upstream",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+CONNECT_SECONDS = Histogram(
+    "gateway_upstream_connect_seconds",
+    "Setup time (TCP connect, TLS handshake) of new upstream connections",
+    ("upstream",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+ROUTE_RELOADS = Counter(
+    "gateway_route_reloads_total",
+    "Route table loads from GATEWAY_ROUTES_FILE by outcome (success, error)",
+    ("outcome",),
+)
+ROUTE_COUNT = Gauge("gateway_routes", "Routes in the active route table")
+COMPRESSION_BYTES = Counter(
+    "gateway_compression_bytes_total",
+    "Bytes through gateway-side response compression, by coding and side (in, out)",
+    ("upstream", "coding", "side"),
+)
 
 
 def _strip_trailing_slash(value: str) -> str:
@@ -77,79 +312,604 @@ def _build_target_url(base: str, path: str, raw_query: str) -> str:
 
 
 def _copy_headers(source: Iterable[tuple[str, str]]) -> Dict[str, str]:
+    """Drop hop-by-hop headers; names come back lower-cased so later filters match."""
     result: Dict[str, str] = {}
     for key, value in source:
         lk = key.lower()
         if lk in HOP_BY_HOP_HEADERS:
             continue
-        result[key] = value
+        result[lk] = value
     return result
 
 
-def _upstream_label(target_base: str) -> str:
-    if target_base == LOCATIONS_BASE_URL:
-        return "locations"
-    if target_base == LEGACY_BASE_URL:
-        return "legacy"
-    return "custom"
+def _collection_prefix(route: Route, path: str) -> str:
+    segment = route.upstream_path(path).strip("/").split("/", 1)[0]
+    return _build_target_url(route.base_url, f"/{segment}", "")
+
+
+def _upstream(name: str) -> UpstreamState:
+    """Return the client, breaker and limits for an upstream, creating them on first use."""
+    state = _upstreams.get(name)
+    if state is not None:
+        return state
+    pool = _upstream_config(name, UPSTREAM_POOLS.get(name, DEFAULT_POOL))
+    resilience = _upstream_config(name, DEFAULT_RESILIENCE)
+    state = UpstreamState(
+        pool=pool,
+        resilience=resilience,
+        client=httpx.AsyncClient(
+            http2=pool.http2,
+            limits=httpx.Limits(
+                max_connections=pool.max_connections,
+                max_keepalive_connections=pool.max_keepalive_connections,
+                keepalive_expiry=pool.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=pool.connect_timeout,
+                read=pool.read_timeout,
+                write=pool.write_timeout,
+                pool=pool.pool_timeout,
+            ),
+        ),
+        breaker=CircuitBreaker(
+            failure_ratio=resilience.breaker_failure_ratio,
+            min_calls=resilience.breaker_min_calls,
+            window=resilience.breaker_window,
+            open_seconds=resilience.breaker_open_seconds,
+            half_open_probes=resilience.breaker_half_open_probes,
+        ),
+        retry_budget=RetryBudget(
+            ratio=resilience.retry_budget_ratio,
+            min_per_second=resilience.retry_min_per_second,
+            max_tokens=max(1.0, resilience.retry_min_per_second * 10),
+        ),
+        admission=AdmissionLimiter(
+            max_concurrent=resilience.max_concurrent,
+            max_queue=resilience.max_queue,
+            queue_timeout=resilience.queue_timeout,
+        ),
+    )
+    _upstreams[name] = state
+    POOL_CONNECTIONS.labels(name, "active").set_function(lambda: _pool_stats(name)[0])
+    POOL_CONNECTIONS.labels(name, "idle").set_function(lambda: _pool_stats(name)[1])
+    POOL_QUEUED.labels(name).set_function(lambda: _pool_stats(name)[2])
+    CIRCUIT_STATE.labels(name).set_function(lambda: STATE_VALUES[state.breaker.state])
+    ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: state.admission.active)
+    ADMISSION_QUEUED.labels(name).set_function(lambda: state.admission.waiting)
+    logger.info("Upstream pool %s: %s", name, pool)
+    return state
+
+
+def _load_routes(initial: bool = False) -> None:
+    """Swap in the route table from ROUTES_FILE if the file changed since the last look.
+
+    After startup an invalid file is logged and the current table stays in
+    place, so a bad ConfigMap edit cannot take routing down. A missing file
+    means the defaults.
+    """
+    global route_table, _routes_signature
+    try:
+        stat = os.stat(ROUTES_FILE)
+        # ConfigMap updates swap a symlink, which changes the inode.
+        signature: Optional[Tuple[int, int, int]] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    if signature == _routes_signature and not initial:
+        return
+    _routes_signature = signature
+
+    try:
+        if signature is None:
+            config: Any = {
+                "routes": [route for route in DEFAULT_ROUTES if DEFAULT_UPSTREAMS[route["upstream"]]]
+            }
+        else:
+            with open(ROUTES_FILE, encoding="utf-8") as handle:
+                config = json.load(handle)
+        table = compile_routes(config, DEFAULT_UPSTREAMS)
+    except (OSError, ValueError) as exc:
+        ROUTE_RELOADS.labels("error").inc()
+        if initial:
+            raise
+        logger.error("Keeping the current routes; %s is invalid: %s", ROUTES_FILE, exc)
+        return
+
+    route_table = table
+    ROUTE_COUNT.set(len(table))
+    ROUTE_RELOADS.labels("success").inc()
+    logger.info(
+        "Loaded %d routes from %s",
+        len(table),
+        ROUTES_FILE if signature is not None else "defaults",
+    )
+
 
+async def _watch_routes() -> None:
+    while True:
+        await asyncio.sleep(ROUTES_RELOAD_SECONDS)
+        _load_routes()
 
-async def _proxy_request(request: Request, target_base: str) -> Response:
-    if not target_base:
-        return Response(status_code=502, content="Missing upstream configuration")
 
-    if _client is None:
-        raise RuntimeError("HTTP client not initialized")
+_load_routes(initial=True)
 
-    body = await request.body()
-    target_url = _build_target_url(target_base, request.url.path, request.url.query)
-    headers = _copy_headers(request.headers.raw)
-    headers.setdefault("x-forwarded-host", request.headers.get("host", ""))
-    headers["x-forwarded-proto"] = request.url.scheme
 
-    logger.debug("Proxying %s %s -> %s", request.method, request.url.path, target_url)
-    upstream_name = _upstream_label(target_base)
+def _upstream_failure() -> Response:
+    return Response(
+        content="Upstream request failed",
+        status_code=502,
+        headers={"content-type": "text/plain; charset=utf-8"},
+    )
 
-    method = request.method.upper()
+
+def _rejected(upstream_name: str, reason: str, retry_after: float) -> Response:
+    REJECTED_REQUESTS.labels(upstream_name, reason).inc()
+    return Response(
+        content=f"Upstream {upstream_name} unavailable ({reason})",
+        status_code=503,
+        headers={
+            "content-type": "text/plain; charset=utf-8",
+            "retry-after": str(max(1, int(retry_after + 0.999))),
+        },
+    )
+
+
+async def _relay_body(
+    upstream_response: httpx.Response,
+    upstream_name: str,
+    buffered: Sequence[bytes] = (),
+    chunks: Optional[AsyncIterator[bytes]] = None,
+) -> AsyncIterator[bytes]:
+    """Yield upstream bytes as they arrive, still encoded, so nothing is buffered whole.
+
+    StreamingResponse only pulls the next chunk once the previous one has been
+    handed to the client socket, so a slow client throttles the upstream read.
+    ``buffered``/``chunks`` resume a body the cache started reading.
+    """
     try:
-        upstream_response = await _client.request(
-            method,
-            target_url,
-            content=body if method not in {"GET", "HEAD"} else None,
-            headers=headers,
-        )
+        for chunk in buffered:
+            yield chunk
+        async for chunk in chunks or upstream_response.aiter_raw():
+            yield chunk
     except httpx.HTTPError as exc:
         PROXY_REQUESTS.labels(upstream_name, "failure").inc()
-        logger.error("Upstream request failed for %s: %s", upstream_name, exc)
-        return Response(
-            content="Upstream request failed",
-            status_code=502,
-            headers={"content-type": "text/plain; charset=utf-8"},
+        logger.error("Upstream body stream failed for %s: %s", upstream_name, exc)
+        raise
+    finally:
+        await upstream_response.aclose()
+
+
+def _pool_stats(upstream: str) -> Tuple[int, int, int]:
+    """(active, idle, queued) for an upstream pool, read from httpcore's pool state."""
+    state = _upstreams.get(upstream)
+    pool = getattr(getattr(state.client if state else None, "_transport", None), "_pool", None)
+    if pool is None:
+        return 0, 0, 0
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+    queued = sum(1 for pending in list(getattr(pool, "_requests", [])) if pending.is_queued())
+    return len(connections) - idle, idle, queued
+
+
+class _PoolTrace:
+    """httpcore trace hook timing one request's pool wait and connection setup."""
+
+    def __init__(self, upstream: str) -> None:
+        self.upstream = upstream
+        self.started = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.sent = False
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.started":
+            self.connect_started = time.perf_counter()
+        elif event.endswith("send_request_headers.started") and not self.sent:
+            self.sent = True
+            now = time.perf_counter()
+            if self.connect_started is not None:
+                CONNECT_SECONDS.labels(self.upstream).observe(now - self.connect_started)
+                POOL_WAIT_SECONDS.labels(self.upstream).observe(self.connect_started - self.started)
+            else:
+                POOL_WAIT_SECONDS.labels(self.upstream).observe(now - self.started)
+
+
+async def _send_upstream(
+    method: str,
+    target_url: str,
+    headers: Dict[str, str],
+    route: Route,
+    content: Optional[AsyncIterator[bytes]] = None,
+) -> httpx.Response | Response:
+    """Send a request, returning the upstream response with its body still unread.
+
+    Failures come back as a ready-made gateway Response instead: 503 when
+    admission control or the circuit breaker rejects the call, 502 when the
+    upstream could not be reached. Bodiless reads are retried with jittered
+    backoff while the upstream's retry budget allows.
+
+    The admission slot is held until response headers arrive. That is where
+    brownouts pile requests up. Body streaming is bounded by the pool size.
+    """
+    upstream_name = route.upstream
+    upstream = _upstream(upstream_name)
+    client, config = upstream.client, upstream.resilience
+    breaker, budget, admission = upstream.breaker, upstream.retry_budget, upstream.admission
+    timeout: Any = httpx.USE_CLIENT_DEFAULT
+    if route.timeout is not None:
+        timeout = httpx.Timeout(
+            connect=upstream.pool.connect_timeout,
+            read=route.timeout,
+            write=upstream.pool.write_timeout,
+            pool=upstream.pool.pool_timeout,
         )
+    if not await admission.acquire():
+        return _rejected(upstream_name, "overloaded", 1.0)
 
+    retryable = method in RETRYABLE_METHODS and content is None
+    budget.deposit()
+    attempt = 0
+    try:
+        while True:
+            admitted_as = breaker.allow()
+            if admitted_as is None:
+                return _rejected(upstream_name, "circuit_open", breaker.retry_after())
+
+            upstream_request = client.build_request(
+                method,
+                target_url,
+                content=content,
+                headers=headers,
+                timeout=timeout,
+                extensions={"trace": _PoolTrace(upstream_name)},
+            )
+            upstream_response: Optional[httpx.Response] = None
+            try:
+                upstream_response = await client.send(upstream_request, stream=True)
+            except httpx.HTTPError as exc:
+                breaker.record(admitted_as, False)
+                PROXY_REQUESTS.labels(upstream_name, "failure").inc()
+                logger.error("Upstream request failed for %s: %s", upstream_name, exc)
+                should_retry = isinstance(exc, RETRYABLE_ERRORS)
+            except BaseException:
+                # Cancelled, or failed outside httpx: no outcome to record, but
+                # a half-open probe must not keep its slot.
+                breaker.release(admitted_as)
+                raise
+            else:
+                status_code = upstream_response.status_code
+                breaker.record(admitted_as, status_code not in BREAKER_FAILURE_STATUSES)
+                PROXY_REQUESTS.labels(upstream_name, "success" if status_code < 500 else "failure").inc()
+                should_retry = status_code in RETRYABLE_STATUSES
+
+            attempt += 1
+            if not (retryable and should_retry and attempt < config.retry_attempts):
+                return upstream_response if upstream_response is not None else _upstream_failure()
+            if not budget.try_spend():
+                UPSTREAM_RETRIES.labels(upstream_name, "budget_exhausted").inc()
+                return upstream_response if upstream_response is not None else _upstream_failure()
+            if upstream_response is not None:
+                await upstream_response.aclose()
+            UPSTREAM_RETRIES.labels(upstream_name, "sent").inc()
+            await asyncio.sleep(
+                backoff_seconds(attempt, config.retry_backoff_base, config.retry_backoff_cap)
+            )
+    finally:
+        admission.release()
+
+
+async def _compress_body(
+    body: AsyncIterator[bytes], coding: str, upstream_name: str
+) -> AsyncIterator[bytes]:
+    compressor = StreamCompressor(coding)
+    bytes_in = COMPRESSION_BYTES.labels(upstream_name, coding, "in")
+    bytes_out = COMPRESSION_BYTES.labels(upstream_name, coding, "out")
+    async for chunk in body:
+        bytes_in.inc(len(chunk))
+        encoded = compressor.compress(chunk)
+        if encoded:
+            bytes_out.inc(len(encoded))
+            yield encoded
+    encoded = compressor.flush()
+    bytes_out.inc(len(encoded))
+    yield encoded
+
+
+async def _stream_response(
+    upstream_response: httpx.Response,
+    upstream_name: str,
+    buffered: Sequence[bytes] = (),
+    chunks: Optional[AsyncIterator[bytes]] = None,
+    accept_encoding: Optional[str] = None,
+) -> Response:
     response_headers = _copy_headers(upstream_response.headers.multi_items())
-    outcome = "success" if upstream_response.status_code < 500 else "failure"
-    PROXY_REQUESTS.labels(upstream_name, outcome).inc()
-
-    return Response(
-        content=upstream_response.content,
+    if upstream_response.status_code == 304:
+        # Validators (ETag, Last-Modified, Cache-Control) pass through untouched;
+        # a 304 must not carry a body or a rewritten content-length.
+        await upstream_response.aclose()
+        return Response(status_code=304, headers=response_headers)
+
+    body = _relay_body(upstream_response, upstream_name, buffered, chunks)
+    coding = None
+    if compressible(upstream_response.status_code, upstream_response.headers, COMPRESS_MIN_BYTES):
+        vary_on_accept_encoding(response_headers)
+        coding = negotiate(accept_encoding)
+    if coding is not None:
+        response_headers["content-encoding"] = coding
+        weaken_etag(response_headers)
+        body = _compress_body(body, coding, upstream_name)
+    elif "content-length" in upstream_response.headers:
+        # Raw bytes are relayed without decoding, so the upstream length and
+        # content-encoding still describe the body exactly.
+        response_headers["content-length"] = upstream_response.headers["content-length"]
+    return StreamingResponse(
+        body,
         status_code=upstream_response.status_code,
         headers=response_headers,
+        # Also runs when the client disconnects mid-stream, releasing the
+        # upstream connection back to the pool.
+        background=BackgroundTask(upstream_response.aclose),
+    )
+
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if entry.etag is None:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified:
+        try:
+            return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _serve_cached(request: Request, entry: CachedResponse, state: str) -> Response:
+    headers = dict(entry.headers)
+    headers["age"] = str(entry.age_seconds())
+    headers["x-cache"] = state
+    if _not_modified(request, entry):
+        headers.pop("content-type", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, status_code=entry.status_code, headers=headers)
+
+
+async def _fetch_into_cache(
+    request: Request,
+    target_url: str,
+    headers: Dict[str, str],
+    route: Route,
+    route_ttl: float,
+    stale: Optional[CachedResponse],
+    credentialed: bool = False,
+) -> Tuple[Response, Optional[CachedResponse]]:
+    """GET from the upstream, store the response when allowed, and answer the client.
+
+    A stale entry is revalidated with its own validators. Bodies that turn out
+    larger than the per-entry limit are streamed through instead of stored.
+    """
+    upstream_name = route.upstream
+    base_key = (upstream_name, target_url)
+    # The client's own validators are answered from the stored entry.
+    upstream_headers = {
+        key: value for key, value in headers.items() if key not in CONDITIONAL_HEADERS
+    }
+    if stale is not None and stale.etag:
+        upstream_headers["if-none-match"] = stale.etag
+    if stale is not None and stale.last_modified:
+        upstream_headers["if-modified-since"] = stale.last_modified
+
+    upstream_response = await _send_upstream("GET", target_url, upstream_headers, route)
+    if not isinstance(upstream_response, httpx.Response):
+        return upstream_response, None
+
+    if stale is not None and upstream_response.status_code == 304:
+        await upstream_response.aclose()
+        refreshed_headers = _copy_headers(upstream_response.headers.multi_items())
+        if stale.etag and stale.etag.startswith("W/"):
+            # The stored body was compressed here; keep its ETag weak.
+            weaken_etag(refreshed_headers)
+        entry = stale.refreshed(refreshed_headers, route_ttl)
+        response_cache.put(base_key, entry)
+        CACHE_BYTES.set(response_cache.size)
+        CACHE_EVENTS.labels(upstream_name, "revalidated").inc()
+        return _serve_cached(request, entry, "REVALIDATED"), entry
+
+    CACHE_EVENTS.labels(upstream_name, "miss").inc()
+    length = upstream_response.headers.get("content-length")
+    if not storable(upstream_response.status_code, upstream_response.headers, credentialed) or (
+        length is not None and int(length) > response_cache.max_entry_bytes
+    ):
+        return await _stream_response(
+            upstream_response, upstream_name, accept_encoding=request.headers.get("accept-encoding")
+        ), None
+
+    chunks = upstream_response.aiter_raw()
+    buffered: List[bytes] = []
+    size = 0
+    try:
+        async for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size > response_cache.max_entry_bytes:
+                return await _stream_response(
+                    upstream_response,
+                    upstream_name,
+                    buffered,
+                    chunks,
+                    request.headers.get("accept-encoding"),
+                ), None
+    except httpx.HTTPError as exc:
+        PROXY_REQUESTS.labels(upstream_name, "failure").inc()
+        logger.error("Upstream body read failed for %s: %s", upstream_name, exc)
+        await upstream_response.aclose()
+        return _upstream_failure(), None
+    await upstream_response.aclose()
+
+    # Compress once on the way into the cache; hits then serve stored bytes.
+    # The entry varies on Accept-Encoding, so each coding is its own variant.
+    response_headers = _copy_headers(upstream_response.headers.multi_items())
+    body = b"".join(buffered)
+    if compressible(upstream_response.status_code, upstream_response.headers, COMPRESS_MIN_BYTES):
+        vary_on_accept_encoding(response_headers)
+        coding = negotiate(request.headers.get("accept-encoding"))
+        if coding is not None and len(body) >= COMPRESS_MIN_BYTES:
+            COMPRESSION_BYTES.labels(upstream_name, coding, "in").inc(len(body))
+            body = await asyncio.to_thread(compress, body, coding)
+            COMPRESSION_BYTES.labels(upstream_name, coding, "out").inc(len(body))
+            response_headers["content-encoding"] = coding
+            weaken_etag(response_headers)
+    entry = build_entry(
+        upstream_response.status_code, response_headers, body, request.headers, route_ttl
+    )
+    response_cache.put(base_key, entry)
+    CACHE_BYTES.set(response_cache.size)
+    return _serve_cached(request, entry, "MISS"), entry
+
+
+async def _cached_read(
+    request: Request,
+    method: str,
+    target_url: str,
+    headers: Dict[str, str],
+    route: Route,
+    route_ttl: float,
+) -> Response:
+    """Serve GET/HEAD from the cache, coalescing concurrent misses into one upstream call."""
+    upstream_name = route.upstream
+    accept_encoding = request.headers.get("accept-encoding") if method == "GET" else None
+    request_directives = parse_cache_control(request.headers.get("cache-control"))
+    if "no-store" in request_directives:
+        CACHE_EVENTS.labels(upstream_name, "bypass").inc()
+        return await _forward(method, target_url, headers, route, accept_encoding=accept_encoding)
+
+    base_key = (upstream_name, target_url)
+    entry = response_cache.get(base_key, request.headers)
+    credentialed = has_credentials(request.headers)
+    if credentialed and entry is not None and not entry.public:
+        entry = None
+    if entry is not None and entry.is_fresh() and "no-cache" not in request_directives:
+        CACHE_EVENTS.labels(upstream_name, "hit").inc()
+        return _serve_cached(request, entry, "HIT")
+    if method == "HEAD":
+        CACHE_EVENTS.labels(upstream_name, "miss").inc()
+        return await _forward(method, target_url, headers, route)
+    if credentialed:
+        # Never coalesced: a shared flight would hand this client's response to
+        # others. It is still stored when the upstream marks it public.
+        response, _ = await _fetch_into_cache(
+            request, target_url, headers, route, route_ttl, entry, credentialed=True
+        )
+        return response
+
+    flight_key = response_cache.variant_key(base_key, request.headers)
+    pending = _in_flight.get(flight_key)
+    if pending is not None:
+        shared = await asyncio.shield(pending)
+        if shared is not None and shared.matches(request.headers):
+            CACHE_EVENTS.labels(upstream_name, "coalesced").inc()
+            return _serve_cached(request, shared, "COALESCED")
+        # The leader's response was not storable or varies on a header this
+        # request does not share, so fetch it separately.
+        CACHE_EVENTS.labels(upstream_name, "miss").inc()
+        return await _forward(method, target_url, headers, route, accept_encoding=accept_encoding)
+
+    future: asyncio.Future[Optional[CachedResponse]] = asyncio.get_running_loop().create_future()
+    _in_flight[flight_key] = future
+    stored: Optional[CachedResponse] = None
+    try:
+        response, stored = await _fetch_into_cache(
+            request, target_url, headers, route, route_ttl, entry
+        )
+        return response
+    finally:
+        _in_flight.pop(flight_key, None)
+        future.set_result(stored)
+
+
+async def _forward(
+    method: str,
+    target_url: str,
+    headers: Dict[str, str],
+    route: Route,
+    content: Optional[AsyncIterator[bytes]] = None,
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    upstream_response = await _send_upstream(method, target_url, headers, route, content)
+    if not isinstance(upstream_response, httpx.Response):
+        return upstream_response
+    return await _stream_response(upstream_response, route.upstream, accept_encoding=accept_encoding)
+
+
+async def _proxy_request(request: Request) -> Response:
+    if not route_table:
+        return Response(
+            status_code=503,
+            content="Routes not loaded",
+            headers={"content-type": "text/plain; charset=utf-8", "retry-after": "1"},
+        )
+    route = route_table.resolve(request.url.path)
+    if route is None:
+        return Response(status_code=404, content="No route for path")
+
+    target_url = _build_target_url(
+        route.base_url, route.upstream_path(request.url.path), request.url.query
+    )
+    headers = _copy_headers(request.headers.items())
+    headers.setdefault("x-forwarded-host", request.headers.get("host", ""))
+    headers["x-forwarded-proto"] = request.url.scheme
+
+    logger.debug("Proxying %s %s -> %s", request.method, request.url.path, target_url)
+    upstream_name = route.upstream
+
+    method = request.method.upper()
+    # HEAD has no body to encode, so it never negotiates a coding.
+    accept_encoding = request.headers.get("accept-encoding") if method != "HEAD" else None
+    route_ttl = route.cache_ttl if route.cache_ttl is not None else CACHE_ROUTE_TTLS.get(upstream_name, 0.0)
+    if method in {"GET", "HEAD"}:
+        if route_ttl > 0 and response_cache.max_bytes > 0:
+            return await _cached_read(request, method, target_url, headers, route, route_ttl)
+        return await _forward(method, target_url, headers, route, accept_encoding=accept_encoding)
+
+    # The body is forwarded chunk by chunk as the client sends it. Keep the
+    # client's length when it gave one; otherwise httpx sends it chunked.
+    # _copy_headers already dropped both framing headers, so this is the only
+    # Content-Length the upstream sees.
+    content_length = request.headers.get("content-length")
+    if content_length is not None and "transfer-encoding" not in request.headers:
+        headers["content-length"] = content_length
+    response = await _forward(
+        method, target_url, headers, route, request.stream(), accept_encoding=accept_encoding
     )
+    if method not in SAFE_METHODS and response.status_code < 400:
+        # A successful write may change anything in its collection (e.g. the
+        # pin list after PUT /locations/{id}), so drop the whole prefix.
+        response_cache.invalidate_prefix(upstream_name, _collection_prefix(route, request.url.path))
+        CACHE_BYTES.set(response_cache.size)
+    return response
 
 
 @app.on_event("startup")
 async def _startup() -> None:
-    global _client
-    timeout = httpx.Timeout(30.0, connect=5.0)
-    _client = httpx.AsyncClient(timeout=timeout)
-    logger.info("Gateway service ready; proxying to %s", LEGACY_BASE_URL)
+    global _route_watcher
+    for upstream in route_table.upstreams:
+        _upstream(upstream)
+    if ROUTES_RELOAD_SECONDS > 0:
+        _route_watcher = asyncio.create_task(_watch_routes())
+    logger.info(
+        "Gateway service ready; %d routes to %s", len(route_table), ", ".join(route_table.upstreams)
+    )
 
 
 @app.on_event("shutdown")
 async def _shutdown() -> None:
-    if _client is not None:
-        await _client.aclose()
+    if _route_watcher is not None:
+        _route_watcher.cancel()
+    for upstream in _upstreams.values():
+        await upstream.client.aclose()
+    _upstreams.clear()
 
 
 @app.get("/healthz", tags=["health"])
@@ -157,11 +917,6 @@ async def healthcheck() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.api_route("/locations{full_path:path}", methods=ALLOWED_METHODS)
-async def proxy_locations(full_path: str, request: Request) -> Response:
-    return await _proxy_request(request, LOCATIONS_BASE_URL)
-
-
 @app.api_route("/{full_path:path}", methods=ALLOWED_METHODS)
-async def proxy_legacy(full_path: str, request: Request) -> Response:
-    return await _proxy_request(request, LEGACY_BASE_URL)
+async def proxy(full_path: str, request: Request) -> Response:
+    return await _proxy_request(request)
@@ -0,0 +1,182 @@
+"""Per-upstream failure handling for the gateway: circuit breaking, retry
+budgets and admission control.
+
+All three are plain in-process state touched only from the event loop, so no
+locking is needed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Optional
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Opens when the failure ratio over the last ``window`` calls crosses a threshold.
+
+    While open, calls are rejected without touching the upstream. After
+    ``open_seconds`` the breaker goes half-open and lets ``half_open_probes``
+    calls through: a success closes it, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_ratio: float,
+        min_calls: int,
+        window: int,
+        open_seconds: float,
+        half_open_probes: int,
+    ) -> None:
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> Optional[str]:
+        """Return the state the call is admitted under, or None if it is rejected."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return None
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                return None
+            self._probes += 1
+            return HALF_OPEN
+        return CLOSED
+
+    def release(self, admitted_as: str) -> None:
+        """Give back a call's probe slot without recording an outcome.
+
+        For calls that end without a verdict on the upstream, such as a client
+        disconnecting mid-probe. Otherwise the slot would stay taken and the
+        breaker would reject every call while half-open.
+        """
+        if admitted_as == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def record(self, admitted_as: str, success: bool) -> None:
+        if admitted_as == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if self.state != HALF_OPEN:
+                return
+            if success:
+                self._reset(CLOSED)
+            else:
+                self._trip()
+            return
+        if self.state != CLOSED:
+            # A call admitted before the breaker opened; its outcome is stale.
+            return
+        if len(self._outcomes) == self._outcomes.maxlen and not self._outcomes[0]:
+            self._failures -= 1
+        self._outcomes.append(success)
+        if not success:
+            self._failures += 1
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self._failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        self._reset(OPEN)
+        self._opened_at = time.monotonic()
+
+    def _reset(self, state: str) -> None:
+        self.state = state
+        self._outcomes.clear()
+        self._failures = 0
+        self._probes = 0
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of recent traffic.
+
+    Every request deposits ``ratio`` tokens and every retry spends one, so
+    retries can add at most ``ratio`` extra load. ``min_per_second`` keeps a
+    trickle of retries available when traffic is low.
+    """
+
+    def __init__(self, *, ratio: float, min_per_second: float, max_tokens: float) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._refilled_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+def backoff_seconds(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+    return random.uniform(0.0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class AdmissionLimiter:
+    """Bounds concurrent upstream calls and the queue waiting for a slot.
+
+    ``acquire`` fails immediately once ``max_queue`` callers are already
+    waiting, and fails after ``queue_timeout`` seconds otherwise, so overload
+    turns into fast rejections instead of piled-up coroutines and sockets.
+    """
+
+    def __init__(self, *, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
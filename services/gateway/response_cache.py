@@ -0,0 +1,221 @@
+"""Shared (gateway-side) HTTP response cache for idempotent upstream reads.
+
+Implements the subset of RFC 9111 the gateway needs: freshness from
+``s-maxage``/``max-age`` capped by a per-route TTL, ``no-store``/``private``
+responses are never stored, ``no-cache`` responses are stored but revalidated
+on every use, and ``Vary`` selects between stored variants. Responses that set
+cookies or answer a request with credentials are stored only when marked
+``public``. Bodies are kept in an LRU bounded by total bytes.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+BaseKey = Tuple[str, str]
+
+# Variants are keyed on these request headers until an upstream response
+# tells us its real Vary list.
+DEFAULT_VARY = ("accept-encoding",)
+CACHEABLE_STATUSES = {200}
+# Per-entry bookkeeping (key tuples, headers) on top of the body itself.
+ENTRY_OVERHEAD_BYTES = 512
+# Request headers that make a response specific to one client.
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def parse_vary(value: Optional[str]) -> Tuple[str, ...]:
+    return tuple(sorted({name.strip().lower() for name in (value or "").split(",") if name.strip()}))
+
+
+def vary_values(headers: Mapping[str, str], names: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(headers.get(name, "") for name in names)
+
+
+def has_credentials(headers: Mapping[str, str]) -> bool:
+    return any(name in headers for name in CREDENTIAL_HEADERS)
+
+
+def freshness_seconds(directives: Dict[str, Optional[str]], route_ttl: float) -> float:
+    """Seconds a stored response may be served without revalidation."""
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(0.0, min(float(directives[name] or 0), route_ttl))
+            except ValueError:
+                return 0.0
+    return route_ttl
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    vary: Tuple[str, ...]
+    variant: Tuple[str, ...]
+    stored_at: float
+    expires_at: float
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    @property
+    def public(self) -> bool:
+        return "public" in parse_cache_control(self.headers.get("cache-control"))
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.expires_at
+
+    def matches(self, headers: Mapping[str, str]) -> bool:
+        return vary_values(headers, self.vary) == self.variant
+
+    def age_seconds(self) -> int:
+        return int(time.monotonic() - self.stored_at)
+
+    def refreshed(self, headers: Mapping[str, str], route_ttl: float) -> "CachedResponse":
+        """Apply a 304's updated headers and restart the freshness clock."""
+        merged = dict(self.headers)
+        merged.update({key.lower(): value for key, value in headers.items()})
+        now = time.monotonic()
+        ttl = freshness_seconds(parse_cache_control(merged.get("cache-control")), route_ttl)
+        return self._replace(headers=merged, stored_at=now, expires_at=now + ttl)
+
+
+def storable(status_code: int, headers: Mapping[str, str], credentialed: bool = False) -> bool:
+    """Whether a response may go into the shared cache.
+
+    ``credentialed`` is set when the request carried Authorization or Cookie.
+    """
+    directives = parse_cache_control(headers.get("cache-control"))
+    if status_code not in CACHEABLE_STATUSES:
+        return False
+    if "no-store" in directives or "private" in directives:
+        return False
+    # Another client must not receive this client's session or personalised body.
+    if (credentialed or "set-cookie" in headers) and "public" not in directives:
+        return False
+    if "*" in parse_vary(headers.get("vary")):
+        return False
+    # Responses that can never be fresh are only worth keeping with validators.
+    return freshness_seconds(directives, float("inf")) > 0 or bool(
+        headers.get("etag") or headers.get("last-modified")
+    )
+
+
+def build_entry(
+    status_code: int,
+    headers: Mapping[str, str],
+    body: bytes,
+    request_headers: Mapping[str, str],
+    route_ttl: float,
+) -> CachedResponse:
+    lowered = {key.lower(): value for key, value in headers.items()}
+    vary = parse_vary(lowered.get("vary"))
+    now = time.monotonic()
+    ttl = freshness_seconds(parse_cache_control(lowered.get("cache-control")), route_ttl)
+    return CachedResponse(
+        status_code=status_code,
+        headers=lowered,
+        body=body,
+        vary=vary,
+        variant=vary_values(request_headers, vary),
+        stored_at=now,
+        expires_at=now + ttl,
+    )
+
+
+class ResponseCache:
+    """LRU of upstream responses keyed by (upstream, URL) plus Vary variant."""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self._entries: OrderedDict[Tuple[BaseKey, Tuple[str, ...]], CachedResponse] = OrderedDict()
+        self._vary: Dict[BaseKey, Tuple[str, ...]] = {}
+        self._variant_counts: Dict[BaseKey, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def variant_key(
+        self, base_key: BaseKey, headers: Mapping[str, str]
+    ) -> Tuple[BaseKey, Tuple[str, ...]]:
+        names = self._vary.get(base_key, DEFAULT_VARY)
+        return base_key, vary_values(headers, names)
+
+    def get(self, base_key: BaseKey, headers: Mapping[str, str]) -> Optional[CachedResponse]:
+        names = self._vary.get(base_key)
+        if names is None:
+            return None
+        key = (base_key, vary_values(headers, names))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, base_key: BaseKey, entry: CachedResponse) -> None:
+        cost = len(entry.body) + ENTRY_OVERHEAD_BYTES
+        if cost > self.max_entry_bytes or cost > self.max_bytes:
+            return
+        if self._vary.get(base_key, entry.vary) != entry.vary:
+            # The upstream changed its Vary list; older variants are unreachable.
+            self.discard(base_key)
+        key = (base_key, entry.variant)
+        self._pop(key)
+        self._vary[base_key] = entry.vary
+        self._variant_counts[base_key] = self._variant_counts.get(base_key, 0) + 1
+        self._entries[key] = entry
+        self.size += cost
+        while self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: Tuple[BaseKey, Tuple[str, ...]]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body) + ENTRY_OVERHEAD_BYTES
+        base_key = key[0]
+        remaining = self._variant_counts[base_key] - 1
+        if remaining:
+            self._variant_counts[base_key] = remaining
+        else:
+            del self._variant_counts[base_key]
+            del self._vary[base_key]
+
+    def discard(self, base_key: BaseKey) -> None:
+        for key in [key for key in self._entries if key[0] == base_key]:
+            self._pop(key)
+
+    def invalidate_prefix(self, upstream: str, url_prefix: str) -> int:
+        """Drop every entry for ``upstream`` whose URL starts with ``url_prefix``."""
+        stale = [
+            key for key in self._entries if key[0][0] == upstream and key[0][1].startswith(url_prefix)
+        ]
+        for key in stale:
+            self._pop(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vary.clear()
+        self._variant_counts.clear()
+        self.size = 0
@@ -0,0 +1,134 @@
+"""Config-driven routing table for the gateway.
+
+Routes map a path prefix to an upstream, with an optional prefix rewrite, read
+timeout and cache TTL. The config is JSON, normally mounted from a ConfigMap::
+
+    {
+      "upstreams": {"photos": "http://photos.sandbox-app.svc.cluster.local"},
+      "routes": [
+        {"prefix": "/locations", "upstream": "locations", "cacheTtl": 5},
+        {"prefix": "/api/photos", "upstream": "photos", "rewrite": "/photos",
+         "timeoutSeconds": 10},
+        {"prefix": "/", "upstream": "legacy"}
+      ]
+    }
+
+Prefixes match whole path segments ("/locations" matches "/locations/abc" but
+not "/locationsx") and the longest one wins. Routes are compiled into a trie
+keyed by segment, so resolving a path costs O(path length) regardless of how
+many routes exist.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+
+class Route(NamedTuple):
+    prefix: str
+    upstream: str
+    base_url: str
+    rewrite: Optional[str] = None
+    timeout: Optional[float] = None
+    cache_ttl: Optional[float] = None
+
+    def upstream_path(self, path: str) -> str:
+        """The path sent upstream: ``rewrite`` replaces the matched prefix."""
+        if self.rewrite is None:
+            return path
+        remainder = path[len(self.prefix.rstrip("/")) :]
+        return (self.rewrite.rstrip("/") + remainder) or "/"
+
+
+class _Node:
+    __slots__ = ("children", "route")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        self.route: Optional[Route] = None
+
+
+def _segments(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+class RouteTable:
+    def __init__(self, routes: List[Route]) -> None:
+        self.routes = routes
+        self._root = _Node()
+        for route in routes:
+            node = self._root
+            for segment in _segments(route.prefix):
+                node = node.children.setdefault(segment, _Node())
+            if node.route is not None:
+                raise ValueError(f"Duplicate route prefix {route.prefix!r}")
+            node.route = route
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    @property
+    def upstreams(self) -> List[str]:
+        return sorted({route.upstream for route in self.routes})
+
+    def resolve(self, path: str) -> Optional[Route]:
+        node = self._root
+        match = node.route
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.route is not None:
+                match = node.route
+        return match
+
+
+def _optional_float(entry: Mapping[str, Any], key: str) -> Optional[float]:
+    value = entry.get(key)
+    if value is None:
+        return None
+    value = float(value)
+    if value < 0:
+        raise ValueError(f"{key} must not be negative")
+    return value
+
+
+def compile_routes(config: Mapping[str, Any], default_upstreams: Mapping[str, str]) -> RouteTable:
+    """Validate a routes config and build its table; raises ValueError on bad input."""
+    if not isinstance(config, Mapping) or not isinstance(config.get("upstreams") or {}, Mapping):
+        raise ValueError("Routes config must be an object with an optional upstreams object")
+    upstreams = dict(default_upstreams)
+    upstreams.update(config.get("upstreams") or {})
+
+    routes: List[Route] = []
+    for index, entry in enumerate(config.get("routes") or []):
+        try:
+            prefix = entry["prefix"]
+            upstream = entry["upstream"]
+            if not isinstance(prefix, str) or not prefix.startswith("/"):
+                raise ValueError("prefix must start with '/'")
+            if upstream not in upstreams:
+                raise ValueError(f"unknown upstream {upstream!r}")
+            base_url = upstreams[upstream]
+            if not isinstance(base_url, str) or not base_url.startswith(("http://", "https://")):
+                raise ValueError(f"upstream {upstream!r} needs an http(s) URL, got {base_url!r}")
+            rewrite = entry.get("rewrite")
+            if rewrite is not None and not str(rewrite).startswith("/"):
+                raise ValueError("rewrite must start with '/'")
+            routes.append(
+                Route(
+                    prefix="/" + "/".join(_segments(prefix)),
+                    upstream=upstream,
+                    base_url=base_url.rstrip("/"),
+                    rewrite=rewrite,
+                    timeout=_optional_float(entry, "timeoutSeconds"),
+                    cache_ttl=_optional_float(entry, "cacheTtl"),
+                )
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid route #{index} ({entry!r}): {exc}") from exc
+    if not routes:
+        raise ValueError("Routes config defines no routes")
+    return RouteTable(routes)
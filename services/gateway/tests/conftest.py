@@ -0,0 +1,56 @@
+import os
+import sys
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+import httpx
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVICE_DIR))
+
+# Default routes, no reload task, and no real upstream address.
+os.environ["GATEWAY_ROUTES_FILE"] = str(SERVICE_DIR / "tests" / "no-routes.json")
+os.environ["GATEWAY_ROUTES_RELOAD_SECONDS"] = "0"
+os.environ["LOCATIONS_BASE_URL"] = "http://locations.test"
+os.environ["LEGACY_BASE_URL"] = "http://legacy.test"
+
+import main  # noqa: E402
+
+Handler = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+def upstream():
+    """Point an upstream at an async handler; returns the requests it receives."""
+
+    def install(handler: Handler, name: str = "locations") -> List[httpx.Request]:
+        received: List[httpx.Request] = []
+
+        async def record(request: httpx.Request) -> httpx.Response:
+            received.append(request)
+            return await handler(request)
+
+        state = main._upstream(name)
+        main._upstreams[name] = state._replace(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(record))
+        )
+        return received
+
+    main.response_cache.clear()
+    yield install
+    main.response_cache.clear()
+    main._in_flight.clear()
+    main._upstreams.clear()
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway.test") as http:
+        yield http
@@ -0,0 +1,157 @@
+import gzip
+import json
+
+import brotli
+import httpx
+import pytest
+import zstandard
+
+from compression import StreamCompressor, compressible, negotiate, vary_on_accept_encoding, weaken_etag
+
+pytestmark = pytest.mark.anyio
+
+BODY = json.dumps([{"id": index, "title": f"Pin {index}"} for index in range(200)]).encode()
+DECODERS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    # Streamed frames carry no content size, which ZstdDecompressor.decompress needs.
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+def upstream_response(body=BODY, status_code=200, **headers):
+    # A stream, not content=, so the gateway reads the body like a real upstream's.
+    return httpx.Response(
+        status_code,
+        stream=httpx.ByteStream(body),
+        headers={"content-type": "application/json", "etag": '"v1"', "cache-control": "max-age=60", **headers},
+    )
+
+
+@pytest.mark.parametrize(
+    "header, coding",
+    [
+        ("gzip, br", "br"),
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("*", "zstd"),
+        ("*;q=0.5, zstd;q=0", "br"),
+        ("br;q=0, identity", None),
+        ("zstd;q=oops, gzip", "gzip"),
+        (None, None),
+    ],
+)
+def test_negotiate_follows_weights_then_server_order(header, coding):
+    assert negotiate(header) == coding
+
+
+@pytest.mark.parametrize(
+    "status_code, headers, expected",
+    [
+        (200, {"content-type": "application/json; charset=utf-8"}, True),
+        (201, {"content-type": "application/geo+json"}, True),
+        (200, {"content-type": "image/png"}, False),
+        (206, {"content-type": "text/plain"}, False),
+        (200, {"content-type": "text/plain", "content-encoding": "br"}, False),
+        (200, {"content-type": "text/plain", "cache-control": "public, no-transform"}, False),
+        (200, {"content-type": "text/plain", "content-length": "100"}, False),
+    ],
+)
+def test_compressible(status_code, headers, expected):
+    assert compressible(status_code, headers, 1024) is expected
+
+
+@pytest.mark.parametrize("coding", ["gzip", "br", "zstd"])
+def test_stream_compressor_round_trips(coding):
+    compressor = StreamCompressor(coding)
+    encoded = b"".join(compressor.compress(BODY[start : start + 500]) for start in range(0, len(BODY), 500))
+    encoded += compressor.flush()
+
+    assert DECODERS[coding](encoded) == BODY
+
+
+def test_header_helpers():
+    headers = {"etag": '"v1"', "vary": "Origin"}
+    weaken_etag(headers)
+    weaken_etag(headers)
+    vary_on_accept_encoding(headers)
+    vary_on_accept_encoding(headers)
+
+    assert headers == {"etag": 'W/"v1"', "vary": "Origin, Accept-Encoding"}
+
+
+async def test_cached_variants_per_coding_carry_weak_etags(upstream, client):
+    async def handler(request):
+        return upstream_response()
+
+    received = upstream(handler)
+    responses = {}
+    for coding in ("br", "gzip", "zstd", None):
+        headers = {"accept-encoding": coding or "identity"}
+        responses[coding] = await client.get("/locations", headers=headers)
+
+    for coding, response in responses.items():
+        assert response.content == BODY
+        assert response.headers.get("content-encoding") == coding
+        assert response.headers["etag"] == ('"v1"' if coding is None else 'W/"v1"')
+        assert "Accept-Encoding" in response.headers["vary"]
+    # One stored variant per coding.
+    assert len(received) == 4
+    hit = await client.get("/locations", headers={"accept-encoding": "br"})
+    assert (hit.headers["x-cache"], hit.content) == ("HIT", BODY)
+
+
+async def test_weak_etags_validate_compressed_variants(upstream, client):
+    async def handler(request):
+        if request.headers.get("if-none-match", "").removeprefix("W/") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"', "cache-control": "max-age=0"})
+        return upstream_response(**{"cache-control": "max-age=0"})
+
+    received = upstream(handler)
+    first = await client.get("/locations", headers={"accept-encoding": "gzip"})
+    assert first.headers["etag"] == 'W/"v1"'
+
+    for etag in ('W/"v1"', '"v1"'):
+        revalidated = await client.get(
+            "/locations", headers={"accept-encoding": "gzip", "if-none-match": etag}
+        )
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == 'W/"v1"'
+    # The stale entry went upstream with its own (weak) validator.
+    assert received[-1].headers["if-none-match"] == 'W/"v1"'
+    refreshed = await client.get("/locations", headers={"accept-encoding": "gzip"})
+    assert (refreshed.headers["x-cache"], refreshed.content) == ("REVALIDATED", BODY)
+    assert refreshed.headers["etag"] == 'W/"v1"'
+
+
+async def test_small_and_precompressed_bodies_pass_through(upstream, client):
+    precompressed = brotli.compress(BODY)
+
+    async def handler(request):
+        if request.url.path == "/locations/small":
+            return upstream_response(b"{}")
+        return upstream_response(precompressed, **{"content-encoding": "br"})
+
+    upstream(handler)
+    small = await client.get("/locations/small", headers={"accept-encoding": "gzip"})
+    relayed = await client.get("/locations/big", headers={"accept-encoding": "gzip, br"})
+
+    assert "content-encoding" not in small.headers
+    assert small.headers["etag"] == '"v1"'
+    assert relayed.headers["content-encoding"] == "br"
+    assert relayed.headers["etag"] == '"v1"'
+    assert relayed.content == BODY
+
+
+async def test_streamed_responses_are_compressed_on_the_fly(upstream, client):
+    async def handler(request):
+        return upstream_response(status_code=201, **{"cache-control": "no-store"})
+
+    upstream(handler)
+    response = await client.post("/locations", json={"title": "x"}, headers={"accept-encoding": "zstd"})
+
+    assert response.status_code == 201
+    assert response.headers["content-encoding"] == "zstd"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "content-length" not in response.headers
+    assert response.content == BODY
@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from resilience import CLOSED, HALF_OPEN, OPEN
+
+pytestmark = pytest.mark.anyio
+
+
+def configure(monkeypatch, **settings: str) -> None:
+    # Read when the upstream's state is created, i.e. on the fixture's first install.
+    for field, value in settings.items():
+        monkeypatch.setenv(f"GATEWAY_LOCATIONS_{field.upper()}", value)
+
+
+def reply(status_code: int) -> httpx.Response:
+    # A stream, not content=, so the gateway reads the body like a real upstream's.
+    return httpx.Response(status_code, stream=httpx.ByteStream(b"{}"))
+
+
+def breaker() -> main.CircuitBreaker:
+    return main._upstreams["locations"].breaker
+
+
+async def test_breaker_opens_then_closes_after_a_successful_probe(upstream, client, monkeypatch):
+    configure(
+        monkeypatch, breaker_min_calls="2", breaker_window="2", breaker_open_seconds="0.05", retry_attempts="1"
+    )
+    healthy = False
+
+    async def handler(request):
+        return reply(200 if healthy else 503)
+
+    received = upstream(handler)
+    assert [(await client.get(f"/locations/{n}")).status_code for n in range(2)] == [503, 503]
+    assert breaker().state == OPEN
+
+    rejected = await client.get("/locations/2")
+    assert rejected.status_code == 503
+    assert rejected.text == "Upstream locations unavailable (circuit_open)"
+    assert len(received) == 2
+
+    await asyncio.sleep(0.06)
+    healthy = True
+    probe = await client.get("/locations/3")
+
+    assert probe.status_code == 200
+    assert breaker().state == CLOSED
+    assert len(received) == 3
+
+
+async def test_cancelled_probe_gives_back_its_slot(upstream, client, monkeypatch):
+    configure(
+        monkeypatch, breaker_min_calls="1", breaker_window="1", breaker_open_seconds="0.05", retry_attempts="1"
+    )
+    hang = asyncio.Event()
+
+    async def handler(request):
+        if request.url.path == "/locations/hang":
+            hang.set()
+            await asyncio.Event().wait()
+        if request.url.path == "/locations/down":
+            return reply(503)
+        return reply(200)
+
+    upstream(handler)
+    await client.get("/locations/down")
+    await asyncio.sleep(0.06)
+
+    probe = asyncio.ensure_future(client.get("/locations/hang"))
+    await hang.wait()
+    assert breaker().state == HALF_OPEN
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    response = await client.get("/locations/ok")
+    assert response.status_code == 200
+    assert breaker().state == CLOSED
+    assert main._upstreams["locations"].admission.active == 0
+
+
+async def test_retries_stop_when_the_budget_is_spent(upstream, client, monkeypatch):
+    # One token, no deposits and a negligible refill: exactly one retry in total.
+    configure(
+        monkeypatch,
+        retry_attempts="3",
+        retry_budget_ratio="0",
+        retry_min_per_second="0.001",
+        retry_backoff_base="0",
+        breaker_min_calls="100",
+    )
+
+    async def handler(request):
+        return reply(503)
+
+    received = upstream(handler)
+    first = await client.get("/locations/a")
+    second = await client.get("/locations/b")
+
+    assert (first.status_code, second.status_code) == (503, 503)
+    assert [request.url.path for request in received] == ["/locations/a", "/locations/a", "/locations/b"]
+
+
+async def test_writes_are_not_retried(upstream, client, monkeypatch):
+    configure(monkeypatch, retry_attempts="3", retry_backoff_base="0")
+
+    async def handler(request):
+        return reply(503)
+
+    received = upstream(handler)
+    response = await client.post("/locations", json={"id": "a"})
+
+    assert response.status_code == 503
+    assert len(received) == 1
+
+
+async def test_admission_rejects_once_the_queue_is_full(upstream, client, monkeypatch):
+    configure(monkeypatch, max_concurrent="1", max_queue="0")
+    entered, release = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        entered.set()
+        await release.wait()
+        return reply(201)
+
+    received = upstream(handler)
+    first = asyncio.ensure_future(client.post("/locations", json={"id": "a"}))
+    await entered.wait()
+
+    overloaded = await client.post("/locations", json={"id": "b"})
+    assert overloaded.status_code == 503
+    assert overloaded.text == "Upstream locations unavailable (overloaded)"
+    assert overloaded.headers["retry-after"] == "1"
+
+    release.set()
+    assert (await first).status_code == 201
+    assert len(received) == 1
+    assert main._upstreams["locations"].admission.active == 0
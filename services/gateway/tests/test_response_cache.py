@@ -0,0 +1,142 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+
+pytestmark = pytest.mark.anyio
+
+
+def cacheable(body: bytes = b'{"items": []}', **headers: str) -> httpx.Response:
+    # A stream, not content=, so the gateway reads the body like a real upstream's.
+    return httpx.Response(
+        200,
+        stream=httpx.ByteStream(body),
+        headers={"content-type": "application/json", "cache-control": "max-age=60", "etag": '"v1"', **headers},
+    )
+
+
+async def test_concurrent_misses_share_one_upstream_call(upstream, client):
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return cacheable()
+
+    received = upstream(slow)
+    responses = await asyncio.gather(*(client.get("/locations") for _ in range(10)))
+
+    assert len(received) == 1
+    assert {response.status_code for response in responses} == {200}
+    assert {response.headers["x-cache"] for response in responses} == {"MISS", "COALESCED"}
+    assert all(response.content == b'{"items": []}' for response in responses)
+
+
+async def test_fresh_entry_is_served_without_upstream_call(upstream, client):
+    async def handler(request):
+        return cacheable()
+
+    received = upstream(handler)
+    first = await client.get("/locations")
+    second = await client.get("/locations")
+
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert second.content == first.content
+    assert len(received) == 1
+
+
+async def test_client_validators_are_answered_from_the_cache(upstream, client):
+    async def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return cacheable()
+
+    received = upstream(handler)
+    revalidating = await client.get(
+        "/locations", headers={"If-None-Match": '"v1"', "Connection": "keep-alive, x-trace"}
+    )
+
+    assert revalidating.status_code == 304
+    assert "if-none-match" not in received[0].headers
+    assert received[0].headers.get("connection") != "keep-alive, x-trace"
+
+    # The full response was stored, so a client without the validator gets it.
+    plain = await client.get("/locations")
+    assert plain.status_code == 200
+    assert plain.headers["x-cache"] == "HIT"
+    assert plain.content == b'{"items": []}'
+    assert len(received) == 1
+
+
+async def test_coalesced_followers_get_304_for_matching_validators(upstream, client):
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        if request.headers.get("if-none-match"):
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return cacheable()
+
+    received = upstream(slow)
+    responses = await asyncio.gather(
+        *(client.get("/locations", headers={"if-none-match": '"v1"'}) for _ in range(5))
+    )
+
+    assert len(received) == 1
+    assert [response.status_code for response in responses] == [304] * 5
+
+
+async def test_successful_write_drops_cached_collection(upstream, client):
+    async def handler(request):
+        if request.method == "PUT":
+            return httpx.Response(200, stream=httpx.ByteStream(b'{"id": "a"}'))
+        return cacheable()
+
+    received = upstream(handler)
+    await client.get("/locations")
+    await client.put("/locations/a", json={"title": "A"})
+    after = await client.get("/locations")
+
+    assert after.headers["x-cache"] == "MISS"
+    assert [request.method for request in received] == ["GET", "PUT", "GET"]
+    assert len(main.response_cache) == 1
+
+
+async def test_responses_setting_cookies_are_not_shared(upstream, client):
+    async def handler(request):
+        return cacheable(**{"set-cookie": "session=abc"})
+
+    received = upstream(handler)
+    await client.get("/locations")
+    second = await client.get("/locations")
+
+    assert second.headers.get("x-cache") != "HIT"
+    assert second.headers["set-cookie"] == "session=abc"
+    assert len(received) == 2
+    assert len(main.response_cache) == 0
+
+
+async def test_credentialed_requests_are_not_stored_or_served_from_cache(upstream, client):
+    async def handler(request):
+        return cacheable(body=request.headers.get("cookie", "anonymous").encode())
+
+    received = upstream(handler)
+    anonymous = await client.get("/locations")
+    alice = await client.get("/locations", headers={"cookie": "user=alice"})
+    bob = await client.get("/locations", headers={"authorization": "Bearer bob"})
+    again = await client.get("/locations")
+
+    assert alice.content == b"user=alice"
+    assert bob.content == b"anonymous"
+    assert [anonymous.headers["x-cache"], again.headers["x-cache"]] == ["MISS", "HIT"]
+    assert again.content == b"anonymous"
+    assert len(received) == 3
+
+
+async def test_public_responses_are_stored_for_credentialed_requests(upstream, client):
+    async def handler(request):
+        return cacheable(**{"cache-control": "public, max-age=60", "set-cookie": "seen=1"})
+
+    received = upstream(handler)
+    first = await client.get("/locations", headers={"cookie": "user=alice"})
+    second = await client.get("/locations")
+
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert len(received) == 1
@@ -0,0 +1,37 @@
+import httpx
+import pytest
+
+import main
+from routes import RouteTable, compile_routes
+
+pytestmark = pytest.mark.anyio
+
+
+def test_longest_whole_segment_prefix_wins():
+    table = compile_routes(
+        {
+            "routes": [
+                {"prefix": "/locations", "upstream": "locations"},
+                {"prefix": "/api/photos", "upstream": "locations", "rewrite": "/photos"},
+                {"prefix": "/", "upstream": "legacy"},
+            ]
+        },
+        {"locations": "http://locations.test", "legacy": "http://legacy.test"},
+    )
+
+    assert table.resolve("/locations/abc").upstream == "locations"
+    assert table.resolve("/locationsx").upstream == "legacy"
+    assert table.resolve("/api/photos/1").upstream_path("/api/photos/1") == "/photos/1"
+
+
+async def test_requests_before_routes_load_get_503(upstream, client, monkeypatch):
+    async def handler(request):
+        return httpx.Response(200)
+
+    received = upstream(handler)
+    monkeypatch.setattr(main, "route_table", RouteTable([]))
+    response = await client.get("/locations")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert received == []
@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def echo(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(201, stream=httpx.ByteStream(request.content))
+
+
+async def test_write_forwards_a_single_content_length(upstream, client):
+    received = upstream(echo)
+    response = await client.post("/locations", content=b'{"title": "A"}')
+
+    assert response.status_code == 201
+    assert response.content == b'{"title": "A"}'
+    assert received[0].headers.get_list("content-length") == ["14"]
+    assert "transfer-encoding" not in received[0].headers
+
+
+async def test_chunked_write_is_forwarded_without_a_length(upstream, client):
+    async def body():
+        yield b'{"title": '
+        yield b'"A"}'
+
+    received = upstream(echo)
+    response = await client.post("/locations", content=body())
+
+    assert response.status_code == 201
+    assert response.content == b'{"title": "A"}'
+    assert received[0].headers.get_list("content-length") == []
@@ -0,0 +1,108 @@
+"""Benchmark the map cluster index: build time, write updates and query latency.
+
+Builds a ClusterIndex over synthetic pins (clustered like bench_geo's catalog)
+at each ``--pins`` size, then times:
+
+* a full build, what a pod pays at startup or after a ``reset``;
+* single-pin moves, what every write applied from the change stream costs;
+* tile queries (GET /locations/clusters/{z}/{x}/{y}) at several zooms;
+* viewport queries (GET /locations/clusters?bbox=) about 6x4 tiles large.
+
+Nothing touches the database::
+
+    python bench_clusters.py --pins 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from bench_geo import synthetic_points
+from clusters import ClusterIndex, project, unproject
+
+ZOOMS = (2, 6, 10, 14, 18)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--pins", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Index sizes"
+    )
+    parser.add_argument("--queries", type=int, default=500, help="Queries per scenario")
+    parser.add_argument("--updates", type=int, default=5_000, help="Single-pin moves to time")
+    parser.add_argument("--max-zoom", type=int, default=16)
+    parser.add_argument("--cells-per-tile", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    return parser.parse_args()
+
+
+def timings_ms(calls: List[Callable[[], object]]) -> Tuple[float, float]:
+    samples = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    quantiles = statistics.quantiles(samples, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def run(args: argparse.Namespace, count: int) -> None:
+    points = [(pin_id, lat, lon, random.random() < 0.05) for pin_id, lat, lon in synthetic_points(count)]
+    options = {"max_zoom": args.max_zoom, "cells_per_tile": args.cells_per_tile}
+
+    started = time.perf_counter()
+    index = ClusterIndex.build(points, **options)
+    build_seconds = time.perf_counter() - started
+    cells = sum(len(level) for level in index.levels)
+    print(f"\n{count:,} pins: build {build_seconds:.2f}s, {cells:,} cells over {args.max_zoom + 1} zooms")
+
+    moves = [
+        (pin_id, lat + random.uniform(-0.5, 0.5), lon, featured)
+        for pin_id, lat, lon, featured in random.sample(points, min(args.updates, count))
+    ]
+    p50, p99 = timings_ms([lambda move=move: index.upsert(*move) for move in moves])
+    print(f"  move one pin           p50 {p50 * 1000:8.1f}us  p99 {p99 * 1000:8.1f}us")
+
+    for zoom in ZOOMS:
+        size = 1 << zoom
+        # Tiles around real pins, since that is where the map looks.
+        tiles = []
+        for _, lat, lon, _ in random.sample(points, args.queries):
+            x, y = project(lat, lon)
+            tiles.append((zoom, min(int(x * size), size - 1), min(int(y * size), size - 1)))
+        sizes = [len(index.tile(*tile)) for tile in tiles]
+        p50, p99 = timings_ms([lambda tile=tile: index.tile(*tile) for tile in tiles])
+        print(
+            f"  tile    z={zoom:<2}          p50 {p50:8.3f}ms  p99 {p99:8.3f}ms  "
+            f"~{statistics.mean(sizes):.0f} clusters"
+        )
+
+    for zoom in ZOOMS:
+        size = 1 << zoom
+        boxes = []
+        for _, lat, lon, _ in random.sample(points, args.queries):
+            x, y = project(lat, lon)
+            north, west = unproject(max(0.0, x - 3 / size), max(0.0, y - 2 / size))
+            south, east = unproject(min(1.0, x + 3 / size), min(1.0, y + 2 / size))
+            boxes.append((zoom, max(-180.0, west), south, min(180.0, east), north))
+        sizes = [len(index.within(*box)) for box in boxes]
+        p50, p99 = timings_ms([lambda box=box: index.within(*box) for box in boxes])
+        print(
+            f"  viewport z={zoom:<2} (6x4)   p50 {p50:8.3f}ms  p99 {p99:8.3f}ms  "
+            f"~{statistics.mean(sizes):.0f} clusters"
+        )
+
+
+def main() -> None:
+    args = parse_args()
+    random.seed(args.seed)
+    for count in args.pins:
+        run(args, count)
+
+
+if __name__ == "__main__":
+    main()
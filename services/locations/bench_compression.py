@@ -0,0 +1,104 @@
+"""Benchmark response compression on the pin list: bytes on the wire and CPU per request.
+
+Scales the real ``photo-site/pins.json`` documents up (1000x by default), encodes
+the list the way ``build_list_response`` does, then reports for each coding:
+
+- compressed size and ratio at the precompute (static) and per-request
+  (dynamic) levels, with the CPU time to compress and decompress once;
+- CPU per request through ``conditional_response`` when the variant was
+  precomputed for the cache generation vs compressed on every request::
+
+    python bench_compression.py --scale 1000 --requests 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+import brotli
+import orjson
+import zstandard
+from starlette.requests import Request
+
+from bench_import import TEMPLATE_PATH, generate_pins
+from compression import CODINGS, DYNAMIC_LEVELS, STATIC_LEVELS, compress, precompress
+from main import (
+    COMPRESS_MIN_BYTES,
+    EncodedResponse,
+    conditional_response,
+    make_etag,
+    normalize_pin,
+)
+
+DECOMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+    "br": brotli.decompress,
+    "gzip": gzip.decompress,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="Copies of each template pin")
+    parser.add_argument("--requests", type=int, default=20, help="Requests timed per mode")
+    return parser.parse_args()
+
+
+def cpu_ms(func: Callable[[], object], repeat: int = 1) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def make_request(accept_encoding: str) -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/locations", "headers": headers})
+
+
+def main() -> None:
+    args = parse_args()
+    templates = json.loads(TEMPLATE_PATH.read_text(encoding="utf-8"))
+    pins = list(generate_pins(len(templates) * args.scale, templates))
+    body = orjson.dumps([normalize_pin(pin) for pin in pins])
+    print(f"{len(pins)} pins, identity body {len(body) / 1e6:.2f} MB")
+
+    print(f"\n{'coding':<6} {'level':<8} {'bytes':>11} {'ratio':>7} {'compress':>11} {'decompress':>11}")
+    for coding in CODINGS:
+        for label, levels in (("static", STATIC_LEVELS), ("dynamic", DYNAMIC_LEVELS)):
+            level = levels[coding]
+            compressed = compress(body, coding, level)
+            assert DECOMPRESSORS[coding](compressed) == body
+            print(
+                f"{coding:<6} {label + ' ' + str(level):<8} {len(compressed):>11,} "
+                f"{len(body) / len(compressed):>6.1f}x "
+                f"{cpu_ms(lambda: compress(body, coding, level)):>9.1f}ms "
+                f"{cpu_ms(lambda: DECOMPRESSORS[coding](compressed)):>9.1f}ms"
+            )
+
+    started = time.process_time()
+    encodings = precompress(body, COMPRESS_MIN_BYTES)
+    precompute_ms = (time.process_time() - started) * 1000
+    print(f"\nprecompute all variants once per generation: {precompute_ms:.0f}ms CPU")
+    cached = EncodedResponse(
+        body, make_etag(body), datetime.now(timezone.utc), encodings=encodings
+    )
+    uncached = cached._replace(encodings=None)
+
+    print(f"\n{'accept-encoding':<16} {'mode':<12} {'wire bytes':>11} {'cpu/request':>12}")
+    for accept_encoding in ("identity", *CODINGS):
+        request = make_request(accept_encoding)
+        modes = (("precomputed", cached), ("per-request", uncached))
+        for mode, encoded in modes if accept_encoding != "identity" else modes[:1]:
+            wire = len(conditional_response(request, encoded).body)
+            per_request = cpu_ms(lambda: conditional_response(request, encoded), args.requests)
+            print(f"{accept_encoding:<16} {mode:<12} {wire:>11,} {per_request:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
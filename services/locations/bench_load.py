@@ -0,0 +1,157 @@
+"""Concurrent mixed read/write load benchmark for the locations service.
+
+Run it once against the old build and once against the new one, then compare
+the printed p50/p99 latencies, e.g.::
+
+    python bench_load.py --base-url http://localhost:9000 --label sync-sessions
+    python bench_load.py --base-url http://localhost:9000 --label async-engine
+
+``/healthz`` is probed alongside the real traffic: its tail latency is the
+clearest signal that database calls are (or are no longer) blocking the loop.
+Needs ``httpx`` installed locally (it is not part of the service image).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:9000", help="Locations service URL")
+    parser.add_argument("--label", default="run", help="Name printed next to the results")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument(
+        "--write-ratio",
+        type=float,
+        default=0.1,
+        help="Fraction of operations that are writes (create/update/delete)",
+    )
+    parser.add_argument("--seed-pins", type=int, default=200, help="Pins to create before measuring")
+    return parser.parse_args()
+
+
+def synthetic_pin(index: int) -> Dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"Bench pin {index}",
+        "description": "Synthetic pin created by bench_load.py",
+        "coordinates": {
+            "latitude": random.uniform(-60.0, 70.0),
+            "longitude": random.uniform(-180.0, 180.0),
+        },
+        "category": random.choice(["landscape", "astro", "city", "other"]),
+        "tags": ["bench"],
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def seed(client: httpx.AsyncClient, count: int) -> List[str]:
+    ids: List[str] = []
+    for index in range(count):
+        response = await client.post("/locations", json=synthetic_pin(index))
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    ids: List[str],
+    write_ratio: float,
+    deadline: float,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+) -> None:
+    counter = 0
+    while time.perf_counter() < deadline:
+        counter += 1
+        roll = random.random()
+        if roll < write_ratio / 3:
+            op = "create"
+            request = client.post("/locations", json=synthetic_pin(counter))
+        elif roll < 2 * write_ratio / 3 and ids:
+            op = "update"
+            request = client.put(f"/locations/{random.choice(ids)}", json=synthetic_pin(counter))
+        elif roll < write_ratio and ids:
+            op = "delete"
+            request = client.delete(f"/locations/{ids.pop(random.randrange(len(ids)))}")
+        elif roll < write_ratio + (1 - write_ratio) / 2 or not ids:
+            op = "list"
+            request = client.get("/locations")
+        else:
+            op = "get"
+            request = client.get(f"/locations/{random.choice(ids)}")
+
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            errors[op] += 1
+            continue
+        samples[op].append((time.perf_counter() - started) * 1000.0)
+        if response.status_code >= 400 and response.status_code != 404:
+            errors[op] += 1
+        elif op == "create":
+            ids.append(response.json()["id"])
+
+
+async def health_prober(
+    client: httpx.AsyncClient, deadline: float, samples: Dict[str, List[float]]
+) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.get("/healthz")
+        samples["healthz"].append((time.perf_counter() - started) * 1000.0)
+        await asyncio.sleep(0.05)
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        ids = await seed(client, args.seed_pins)
+        samples: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        deadline = time.perf_counter() + args.duration
+        tasks = [
+            worker(client, ids, args.write_ratio, deadline, samples, errors)
+            for _ in range(args.concurrency)
+        ]
+        tasks.append(health_prober(client, deadline, samples))
+        await asyncio.gather(*tasks)
+
+    total = sum(len(values) for values in samples.values())
+    print(f"[{args.label}] {total} requests in {args.duration:.0f}s ({total / args.duration:.1f} req/s)")
+    print(f"{'op':<8} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'errors':>7}")
+    for op in ("list", "get", "create", "update", "delete", "healthz"):
+        values = samples.get(op, [])
+        mean = statistics.fmean(values) if values else 0.0
+        print(
+            f"{op:<8} {len(values):>7} {percentile(values, 50):>9.1f} "
+            f"{percentile(values, 99):>9.1f} {mean:>9.1f} {errors.get(op, 0):>7}"
+        )
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
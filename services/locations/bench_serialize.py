@@ -0,0 +1,109 @@
+"""Profile CPU per request for encoding the pin list at 1k/10k/100k pins.
+
+Builds in-memory ``LocationPinRecord`` rows from the real
+``photo-site/pins.json`` documents (no database needed) and times, per list size:
+
+- ``pydantic``: the previous read path, re-validating every pin through
+  ``List[LocationPin]`` and dumping it with pydantic on each rebuild;
+- ``orjson``: the current path, where pins were validated by ``apply_write``
+  or the import and ``build_list_response`` hands the stored documents to orjson;
+- ``cached``: a request answered from the pre-encoded cache entry through
+  ``conditional_response``::
+
+    python bench_serialize.py --pins 1000 10000 100000 --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+import orjson
+from starlette.requests import Request
+
+from bench_import import TEMPLATE_PATH, generate_pins
+from main import (
+    PIN_LIST_ADAPTER,
+    PIN_SCHEMA_VERSION,
+    EncodedResponse,
+    LocationPinRecord,
+    conditional_response,
+    make_etag,
+    normalize_pin,
+    record_document,
+    serialize_record,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pins", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes timed per mode")
+    parser.add_argument("--requests", type=int, default=1_000, help="Cached requests timed")
+    return parser.parse_args()
+
+
+def cpu_ms(func: Callable[[], object], repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def build_records(count: int, templates: List[dict]) -> List[LocationPinRecord]:
+    """Rows as apply_write leaves them: canonical documents tagged with the schema version."""
+    now = datetime.now(timezone.utc)
+    records = []
+    for index, pin in enumerate(generate_pins(count, templates)):
+        updated_at = now - timedelta(seconds=index)
+        pin["createdAt"] = pin["updatedAt"] = updated_at.isoformat()
+        records.append(
+            LocationPinRecord(
+                id=uuid.UUID(pin["id"]),
+                data=normalize_pin(pin),
+                created_at=updated_at,
+                updated_at=updated_at,
+                schema_version=PIN_SCHEMA_VERSION,
+            )
+        )
+    return records
+
+
+def encode_pydantic(records: List[LocationPinRecord]) -> bytes:
+    items = [serialize_record(record) for record in records]
+    return PIN_LIST_ADAPTER.dump_json(PIN_LIST_ADAPTER.validate_python(items))
+
+
+def encode_orjson(records: List[LocationPinRecord]) -> bytes:
+    return orjson.dumps([record_document(record) for record in records])
+
+
+def main() -> None:
+    args = parse_args()
+    templates = json.loads(TEMPLATE_PATH.read_text(encoding="utf-8"))
+    request = Request({"type": "http", "method": "GET", "path": "/locations", "headers": []})
+
+    print(f"{'pins':>8} {'body':>9} {'pydantic':>11} {'orjson':>11} {'speedup':>8} {'cached':>10}")
+    for count in args.pins:
+        records = build_records(count, templates)
+        body = encode_orjson(records)
+        # Same pins either way; the pydantic dump only adds explicit nulls for unset fields.
+        assert PIN_LIST_ADAPTER.validate_json(body) == PIN_LIST_ADAPTER.validate_json(
+            encode_pydantic(records)
+        )
+        pydantic_ms = cpu_ms(lambda: encode_pydantic(records), args.repeat)
+        orjson_ms = cpu_ms(lambda: encode_orjson(records), args.repeat)
+        encoded = EncodedResponse(body, make_etag(body), records[0].updated_at)
+        cached_ms = cpu_ms(lambda: conditional_response(request, encoded), args.requests)
+        print(
+            f"{count:>8} {len(body) / 1e6:>7.1f}MB {pydantic_ms:>9.1f}ms {orjson_ms:>9.1f}ms "
+            f"{pydantic_ms / orjson_ms:>7.1f}x {cached_ms:>8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Hierarchical grid clustering of pins for the map, per zoom level.
+
+The map works in Web Mercator tiles. At zoom ``z`` every tile is split into
+``cells_per_tile`` x ``cells_per_tile`` cells, and all pins in one cell form
+one cluster. A cell at zoom ``z`` covers exactly four cells at ``z + 1``, so
+the levels form a quadtree. Each level only stores per-cell aggregates
+(count, coordinate sums, best representative pins), built bottom-up from
+the ``max_zoom`` cells, which keep their pins. Moving or removing a pin only
+re-aggregates the cells on its path to the root. That is one cell per level,
+so writes update the index in place.
+
+Above ``max_zoom`` clusters split into individual pins.
+"""
+
+from __future__ import annotations
+
+import gc
+import heapq
+import math
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+# Web Mercator stops short of the poles.
+MAX_LATITUDE = 85.05112878
+
+Cell = Tuple[int, int]
+# (not featured, pin id): featured pins represent their cluster first, then by id.
+Rank = Tuple[bool, str]
+
+
+class Cluster(NamedTuple):
+    latitude: float
+    longitude: float
+    count: int
+    pin_ids: List[str]
+
+
+def mercator_x(lon: float) -> float:
+    return (lon + 180.0) / 360.0
+
+
+def mercator_y(lat: float) -> float:
+    """Web Mercator y in [0, 1], growing southwards."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin = math.sin(math.radians(lat))
+    return 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+
+
+def project(lat: float, lon: float) -> Tuple[float, float]:
+    # Longitude 180 is -180: wrap it onto the first column of tiles.
+    return mercator_x(lon) % 1.0, mercator_y(lat)
+
+
+def tiles_spanned(zoom: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> int:
+    """How many tiles a box overlaps at ``zoom``; ``min_lon > max_lon`` crosses the antimeridian."""
+    size = 1 << zoom
+    first_column = math.floor(mercator_x(min_lon) * size)
+    last_column = math.floor(mercator_x(max_lon) * size) + (size if min_lon > max_lon else 0)
+    first_row = math.floor(mercator_y(max_lat) * size)
+    last_row = math.floor(mercator_y(min_lat) * size)
+    return min(size, last_column - first_column + 1) * min(size, last_row - first_row + 1)
+
+
+def unproject(x: float, y: float) -> Tuple[float, float]:
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, x * 360.0 - 180.0
+
+
+class ClusterIndex:
+    def __init__(self, max_zoom: int = 16, cells_per_tile: int = 8, representatives: int = 3) -> None:
+        if cells_per_tile < 1 or cells_per_tile & (cells_per_tile - 1):
+            raise ValueError("cells_per_tile must be a power of two")
+        self.max_zoom = max_zoom
+        self.cells_per_tile = cells_per_tile
+        self.cell_bits = cells_per_tile.bit_length() - 1
+        self.representatives = representatives
+        # levels[zoom][cell] = [count, x_sum, y_sum, representative ranks], never mutated
+        self.levels: List[Dict[Cell, list]] = [{} for _ in range(max_zoom + 1)]
+        # Pins in each max_zoom cell, for re-aggregating it and splitting it further.
+        self.leaves: Dict[Cell, Dict[str, Tuple[float, float, Rank]]] = {}
+        self.pins: Dict[str, Cell] = {}
+        # Bumped on every change, so responses can be cached per revision.
+        self.revision = 0
+
+    def __len__(self) -> int:
+        return len(self.pins)
+
+    @classmethod
+    def build(
+        cls, points: Iterable[Tuple[str, float, float, bool]], **options: int
+    ) -> "ClusterIndex":
+        """Bulk-load (pin_id, lat, lon, featured) points one level at a time."""
+        # Millions of new lists and tuples would trigger repeated full GC passes
+        # over everything allocated so far; nothing built here forms a cycle.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls._build(points, **options)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    @classmethod
+    def _build(cls, points: Iterable[Tuple[str, float, float, bool]], **options: int) -> "ClusterIndex":
+        index = cls(**options)
+        for pin_id, lat, lon, featured in points:
+            x, y = project(lat, lon)
+            cell = index._cell(x, y, index.max_zoom)
+            index.pins[pin_id] = cell
+            index.leaves.setdefault(cell, {})[pin_id] = (x, y, (not featured, pin_id))
+        index.levels[index.max_zoom] = {
+            cell: index._aggregate(members.values()) for cell, members in index.leaves.items()
+        }
+        for zoom in range(index.max_zoom - 1, -1, -1):
+            level: Dict[Cell, list] = {}
+            merged = set()
+            for (cx, cy), aggregate in index.levels[zoom + 1].items():
+                parent = (cx >> 1, cy >> 1)
+                existing = level.get(parent)
+                if existing is None:
+                    level[parent] = aggregate
+                else:
+                    level[parent] = [
+                        existing[0] + aggregate[0],
+                        existing[1] + aggregate[1],
+                        existing[2] + aggregate[2],
+                        existing[3] + aggregate[3],
+                    ]
+                    merged.add(parent)
+            for parent in merged:
+                aggregate = level[parent]
+                aggregate[3] = sorted(aggregate[3])[: index.representatives]
+            index.levels[zoom] = level
+        return index
+
+    def _cell(self, x: float, y: float, zoom: int) -> Cell:
+        size = 1 << (zoom + self.cell_bits)
+        return min(max(int(x * size), 0), size - 1), min(max(int(y * size), 0), size - 1)
+
+    def _aggregate(self, members: Iterable[Tuple[float, float, Rank]]) -> list:
+        count, x_sum, y_sum, ranks = 0, 0.0, 0.0, []
+        for x, y, rank in members:
+            count += 1
+            x_sum += x
+            y_sum += y
+            ranks.append(rank)
+        return [count, x_sum, y_sum, heapq.nsmallest(self.representatives, ranks)]
+
+    def _merge(self, parts: List[list]) -> list:
+        # Aggregates are never modified in place, so a lone child's is shared
+        # rather than copied. Above city zooms most cells hold a single pin.
+        if len(parts) == 1:
+            return parts[0]
+        return [
+            sum(part[0] for part in parts),
+            sum(part[1] for part in parts),
+            sum(part[2] for part in parts),
+            heapq.nsmallest(self.representatives, chain.from_iterable(part[3] for part in parts)),
+        ]
+
+    def _refresh(self, cell: Cell) -> None:
+        members = self.leaves.get(cell)
+        if members:
+            self.levels[self.max_zoom][cell] = self._aggregate(members.values())
+        else:
+            self.leaves.pop(cell, None)
+            self.levels[self.max_zoom].pop(cell, None)
+        cx, cy = cell
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            children = self.levels[zoom + 1]
+            parts = [
+                children[child]
+                for child in (
+                    (cx & ~1, cy & ~1),
+                    (cx | 1, cy & ~1),
+                    (cx & ~1, cy | 1),
+                    (cx | 1, cy | 1),
+                )
+                if child in children
+            ]
+            cx, cy = cx >> 1, cy >> 1
+            if parts:
+                self.levels[zoom][(cx, cy)] = self._merge(parts)
+            else:
+                self.levels[zoom].pop((cx, cy), None)
+
+    def upsert(self, pin_id: str, lat: float, lon: float, featured: bool = False) -> None:
+        x, y = project(lat, lon)
+        cell = self._cell(x, y, self.max_zoom)
+        previous = self.pins.get(pin_id)
+        if previous is not None:
+            self.leaves[previous].pop(pin_id, None)
+        self.pins[pin_id] = cell
+        self.leaves.setdefault(cell, {})[pin_id] = (x, y, (not featured, pin_id))
+        if previous is not None and previous != cell:
+            self._refresh(previous)
+        self._refresh(cell)
+        self.revision += 1
+
+    def remove(self, pin_id: str) -> None:
+        cell = self.pins.pop(pin_id, None)
+        if cell is None:
+            return
+        self.leaves[cell].pop(pin_id, None)
+        self._refresh(cell)
+        self.revision += 1
+
+    def _cells(
+        self, zoom: int, x_range: Tuple[int, int], y_range: Tuple[int, int]
+    ) -> Iterator[Tuple[Cell, list]]:
+        """Occupied cells of a level inside inclusive cell ranges."""
+        level = self.levels[zoom]
+        (x0, x1), (y0, y1) = x_range, y_range
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    aggregate = level.get((cx, cy))
+                    if aggregate is not None:
+                        yield (cx, cy), aggregate
+        else:
+            for (cx, cy), aggregate in level.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    yield (cx, cy), aggregate
+
+    def _query(self, zoom: int, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Cluster]:
+        """Clusters for a Mercator box; above max_zoom, the pins inside it."""
+        level = min(zoom, self.max_zoom)
+        x0, y0 = self._cell(x_min, y_min, level)
+        x1, y1 = self._cell(x_max, y_max, level)
+        clusters = []
+        for cell, (count, x_sum, y_sum, ranks) in self._cells(level, (x0, x1), (y0, y1)):
+            if zoom <= self.max_zoom:
+                lat, lon = unproject(x_sum / count, y_sum / count)
+                clusters.append(Cluster(lat, lon, count, [pin_id for _, pin_id in ranks]))
+                continue
+            for pin_id, (x, y, _) in self.leaves[cell].items():
+                if x_min <= x <= x_max and y_min <= y <= y_max:
+                    lat, lon = unproject(x, y)
+                    clusters.append(Cluster(lat, lon, 1, [pin_id]))
+        return clusters
+
+    def tile(self, zoom: int, x: int, y: int) -> List[Cluster]:
+        """Clusters of XYZ tile (zoom, x, y). Each cluster lies in exactly one tile.
+
+        Up to max_zoom, cells nest inside tiles. Above it, pins are split out
+        and assigned to the tile that contains them.
+        """
+        size = 1 << zoom
+        # Stay just inside the tile's right/bottom edges, which belong to the next tile.
+        inset = 0.5 / (size << max(self.cell_bits, 1) << 20)
+        return self._query(zoom, x / size, y / size, (x + 1) / size - inset, (y + 1) / size - inset)
+
+    def within(
+        self, zoom: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float
+    ) -> List[Cluster]:
+        """Clusters touching a box; ``min_lon > max_lon`` crosses the antimeridian."""
+        x_min, x_max = mercator_x(min_lon), mercator_x(max_lon)
+        y_min, y_max = mercator_y(max_lat), mercator_y(min_lat)
+        if min_lon <= max_lon:
+            return self._query(zoom, x_min, y_min, x_max, y_max)
+        return self._query(zoom, x_min, y_min, 1.0, y_max) + self._query(
+            zoom, 0.0, y_min, x_max, y_max
+        )
@@ -0,0 +1,77 @@
+"""Content-coding negotiation and compression for locations responses.
+
+Cached bodies (the full pin list, filtered views) are compressed once per cache
+generation at a high level and served as stored bytes. Uncached responses are
+compressed per request at a fast level.
+"""
+
+from __future__ import annotations
+
+import gzip
+from typing import Dict, Optional
+
+import brotli
+import zstandard
+
+# Server preference when the client weighs several codings equally.
+CODINGS = ("zstd", "br", "gzip")
+# Precomputed variants are built once per generation, so spend more CPU on them.
+STATIC_LEVELS = {"zstd": 10, "br": 5, "gzip": 9}
+DYNAMIC_LEVELS = {"zstd": 3, "br": 4, "gzip": 5}
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick a coding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        param, _, value = params.strip().partition("=")
+        if param.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    wildcard = weights.get("*")
+    best, best_weight = None, 0.0
+    for coding in CODINGS:
+        weight = weights.get(coding, wildcard if wildcard is not None else 0.0)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, coding: str, level: int) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if coding == "br":
+        return brotli.compress(body, quality=level)
+    if coding == "gzip":
+        # mtime=0 keeps the output deterministic for identical bodies.
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    raise ValueError(f"Unsupported content coding {coding!r}")
+
+
+def precompress(body: bytes, min_bytes: int) -> Dict[str, bytes]:
+    """Every coding of ``body`` at the static levels; empty below ``min_bytes``."""
+    if len(body) < min_bytes:
+        return {}
+    return {coding: compress(body, coding, STATIC_LEVELS[coding]) for coding in CODINGS}
+
+
+def variant_etag(etag: str, coding: Optional[str]) -> str:
+    """Each coding is a different representation, so it gets its own strong ETag."""
+    if coding is None:
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def base_etag(etag: str) -> str:
+    for coding in CODINGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
@@ -0,0 +1,165 @@
+"""In-memory spatial index used when the locations service runs without Postgres.
+
+Production queries go through the GiST index on ``point(longitude, latitude)``
+(see ``main.ensure_schema``). SQLite/local setups have no spatial index, so the
+service keeps this uniform lat/lon grid in memory instead and updates it on
+every write.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Return (min_lon, min_lat, max_lon, max_lat) enclosing a circle on the sphere.
+
+    Longitudes may come back with min_lon > max_lon when the box crosses the
+    antimeridian; near the poles the box widens to every longitude.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    widest = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest))
+    if widest >= 90.0 or cos_lat <= 1e-9 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180.0:
+        return -180.0, min_lat, 180.0, max_lat
+    dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+    min_lon = (lon - dlon + 180.0) % 360.0 - 180.0
+    max_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def pin_coordinates(data: Dict) -> Optional[Tuple[float, float]]:
+    """Extract (latitude, longitude) from a pin document, or None if unusable."""
+    coordinates = data.get("coordinates") or {}
+    try:
+        lat = float(coordinates["latitude"])
+        lon = float(coordinates["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+class GridIndex:
+    """Uniform grid of lat/lon cells mapping pin ids to coordinates.
+
+    Bounding-box queries only visit the cells the box overlaps, and k-nearest
+    queries expand rings of cells until k candidates are found, then rescan the
+    exact great-circle radius those candidates imply.
+    """
+
+    def __init__(self, cell_degrees: float = 1.0) -> None:
+        self.cell_degrees = cell_degrees
+        self._lat_cells = math.ceil(180.0 / cell_degrees)
+        self._lon_cells = math.ceil(360.0 / cell_degrees)
+        self._cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = defaultdict(dict)
+        self._points: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _lat_index(self, lat: float) -> int:
+        return min(self._lat_cells - 1, max(0, int((lat + 90.0) // self.cell_degrees)))
+
+    def _lon_index(self, lon: float) -> int:
+        return int((lon + 180.0) // self.cell_degrees) % self._lon_cells
+
+    def upsert(self, pin_id: str, lat: float, lon: float) -> None:
+        self.remove(pin_id)
+        self._points[pin_id] = (lat, lon)
+        self._cells[(self._lat_index(lat), self._lon_index(lon))][pin_id] = (lat, lon)
+
+    def remove(self, pin_id: str) -> None:
+        previous = self._points.pop(pin_id, None)
+        if previous is None:
+            return
+        key = (self._lat_index(previous[0]), self._lon_index(previous[1]))
+        bucket = self._cells[key]
+        bucket.pop(pin_id, None)
+        if not bucket:
+            del self._cells[key]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._points.clear()
+
+    def _lon_ranges(self, min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+        if min_lon <= max_lon:
+            return [(min_lon, max_lon)]
+        return [(min_lon, 180.0), (-180.0, max_lon)]
+
+    def _scan(
+        self, min_lon: float, min_lat: float, max_lon: float, max_lat: float
+    ) -> Iterator[Tuple[str, float, float]]:
+        for lo, hi in self._lon_ranges(min_lon, max_lon):
+            first_lon = self._lon_index(lo)
+            last_lon = self._lon_cells - 1 if hi >= 180.0 else self._lon_index(hi)
+            for i in range(self._lat_index(min_lat), self._lat_index(max_lat) + 1):
+                for j in range(first_lon, last_lon + 1):
+                    for pin_id, (lat, lon) in self._cells.get((i, j), {}).items():
+                        if min_lat <= lat <= max_lat and lo <= lon <= hi:
+                            yield pin_id, lat, lon
+
+    def within(
+        self, min_lon: float, min_lat: float, max_lon: float, max_lat: float
+    ) -> List[str]:
+        """Ids inside the box; ``min_lon > max_lon`` means it crosses the antimeridian."""
+        return [pin_id for pin_id, _, _ in self._scan(min_lon, min_lat, max_lon, max_lat)]
+
+    def _ring(self, center: Tuple[int, int], radius: int) -> Iterator[Tuple[int, int]]:
+        ci, cj = center
+        for di in range(-radius, radius + 1):
+            i = ci + di
+            if not 0 <= i < self._lat_cells:
+                continue
+            if abs(di) == radius:
+                steps = range(-radius, radius + 1)
+            else:
+                steps = (-radius, radius) if radius else (0,)
+            seen = set()
+            for dj in steps:
+                j = (cj + dj) % self._lon_cells
+                if j not in seen:
+                    seen.add(j)
+                    yield i, j
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[str, float]]:
+        """Return up to ``k`` (pin_id, distance_km) pairs ordered by great-circle distance."""
+        if k <= 0 or not self._points:
+            return []
+        center = (self._lat_index(lat), self._lon_index(lon))
+        max_radius = max(self._lat_cells, self._lon_cells)
+        candidates: List[Tuple[str, float, float]] = []
+        radius = 0
+        while len(candidates) < k and radius <= max_radius:
+            for cell in self._ring(center, radius):
+                candidates.extend(
+                    (pin_id, plat, plon) for pin_id, (plat, plon) in self._cells.get(cell, {}).items()
+                )
+            radius += 1
+
+        # Ring order is not distance order, so rescan everything within the
+        # distance of the k-th candidate to catch closer pins in other cells.
+        distances = [haversine_km(lat, lon, plat, plon) for _, plat, plon in candidates]
+        bound = heapq.nsmallest(k, distances)[-1]
+        box = radius_box(lat, lon, bound)
+        scored = (
+            (haversine_km(lat, lon, plat, plon), pin_id) for pin_id, plat, plon in self._scan(*box)
+        )
+        return [(pin_id, distance) for distance, pin_id in heapq.nsmallest(k, scored)]
@@ -1,20 +1,72 @@
 from __future__ import annotations
 
 import argparse
+import codecs
+import hashlib
 import json
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Sequence
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import boto3
 from botocore.exceptions import ClientError
-from sqlmodel import Session, SQLModel, delete
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, insert, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import redis
+from sqlmodel import Field, Session, SQLModel, create_engine, delete
 
-from main import LocationPinRecord, engine, ensure_uuid
+from main import (
+    CACHE_GENERATION_KEY,
+    CACHE_INVALIDATION_CHANNEL,
+    CACHE_MODIFIED_AT_KEY,
+    CHANGE_FEED_MAXLEN,
+    CHANGE_STREAM_KEY,
+    DATABASE_URL,
+    PIN_SCHEMA_VERSION,
+    REDIS_URL,
+    LocationPhotoRecord,
+    LocationPinRecord,
+    as_utc,
+    ensure_schema,
+    ensure_uuid,
+    normalize_pin,
+    photo_sync_statements,
+)
 
 DEFAULT_S3_BUCKET = os.environ.get("PHOTOGRAPHY_BUCKET", "tjprohammer-photography-data-v3")
 DEFAULT_S3_KEY = os.environ.get("PINS_OBJECT_KEY", "data/pins.json")
 DEFAULT_AWS_REGION = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+DEFAULT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+# Postgres allows 65535 bind parameters per statement, and each row of a
+# multi-VALUES upsert binds one per prepare_row key.
+ROW_PARAMETERS = 6
+MAX_BATCH_SIZE = 65_535 // ROW_PARAMETERS
+DEFAULT_S3_ENDPOINT_URL = os.environ.get("AWS_ENDPOINT_URL")
+READ_CHUNK_BYTES = 64 * 1024
+
+# The service itself runs on an async engine; this one-shot CLI keeps a plain
+# blocking engine since there is no event loop to protect.
+engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+
+class SyncState(SQLModel, table=True):
+    """Fingerprint of the last source document an import committed."""
+
+    __tablename__ = "pin_sync_state"
+
+    source: str = Field(primary_key=True)
+    etag: str
+    pin_count: int = 0
+    synced_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def batch_size(value: str) -> int:
+    size = int(value)
+    if not 1 <= size <= MAX_BATCH_SIZE:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {MAX_BATCH_SIZE}")
+    return size
 
 
 def parse_args() -> argparse.Namespace:
@@ -25,15 +77,38 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--key", default=DEFAULT_S3_KEY, help="S3 object key for the pins JSON payload")
     parser.add_argument("--region", default=DEFAULT_AWS_REGION, help="AWS region for the S3 bucket")
     parser.add_argument("--profile", default=None, help="Optional AWS named profile to use for credentials")
+    parser.add_argument(
+        "--endpoint-url",
+        default=DEFAULT_S3_ENDPOINT_URL,
+        help="Custom S3 endpoint (e.g. a local MinIO/LocalStack stand-in)",
+    )
     parser.add_argument(
         "--file",
         default=None,
-        help="Path to a local JSON file (bypasses S3 and is useful for offline development)",
+        help="Path to a local JSON array or NDJSON file (bypasses S3; useful for offline development)",
     )
     parser.add_argument(
         "--truncate",
         action="store_true",
-        help="Delete existing rows before inserting the imported pins",
+        help=(
+            "Delete existing rows before inserting the imported pins "
+            "(with --incremental: delete only pins missing from the source)"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Skip the run when the source ETag matches the last sync, and only "
+            "write pins whose content hash changed"
+        ),
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=batch_size,
+        # A string default goes through `type`, so IMPORT_BATCH_SIZE is checked too.
+        default=str(DEFAULT_BATCH_SIZE),
+        help=f"Pins written per INSERT ... ON CONFLICT statement (at most {MAX_BATCH_SIZE})",
     )
     parser.add_argument(
         "--dry-run",
@@ -53,71 +128,378 @@ def parse_timestamp(value: str | None) -> datetime:
         return datetime.now(timezone.utc)
 
 
-def load_pins_from_file(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as fp:
-        payload = json.load(fp)
-    if not isinstance(payload, list):
-        raise ValueError(f"Expected an array of pins in {path}")
-    return payload
+def iter_json_values(stream: BinaryIO, *, source: str) -> Iterator[Any]:
+    """Yield pins from a JSON array or NDJSON byte stream without loading it whole.
+
+    Only the chunk being parsed is held in memory. Reads grow geometrically
+    while a single value is incomplete, so very large pins stay linear-time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    eof = False
+    in_array: bool | None = None
+    next_read = READ_CHUNK_BYTES
+
+    def fill(size: int) -> None:
+        nonlocal buffer, position, eof
+        chunk = stream.read(size)
+        buffer = buffer[position:] + text_decoder.decode(chunk or b"", final=not chunk)
+        position = 0
+        eof = not chunk
+
+    while True:
+        while position < len(buffer) and (
+            buffer[position].isspace() or (in_array and buffer[position] == ",")
+        ):
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                break
+            fill(READ_CHUNK_BYTES)
+            continue
+
+        if in_array is None:
+            # A leading "[" means one JSON array; anything else is NDJSON.
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+            continue
+        if in_array and buffer[position] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            if eof:
+                raise ValueError(f"Invalid JSON in {source}: {exc}") from exc
+            fill(next_read)
+            next_read = max(next_read, len(buffer))
+            continue
+        if end == len(buffer) and not eof:
+            # A scalar may continue in the next chunk ("12" of "123"); re-read.
+            fill(READ_CHUNK_BYTES)
+            continue
+        position = end
+        next_read = READ_CHUNK_BYTES
+        yield value
 
+    if in_array:
+        raise ValueError(f"Unterminated JSON array in {source}")
 
-def load_pins_from_s3(
+
+def iter_pins(stream: BinaryIO, *, source: str) -> Iterator[Dict[str, Any]]:
+    for pin in iter_json_values(stream, source=source):
+        if not isinstance(pin, dict):
+            raise ValueError(f"Expected pin objects in {source}, got {type(pin).__name__}")
+        yield pin
+
+
+def iter_pins_from_file(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as fp:
+        yield from iter_pins(fp, source=path)
+
+
+def iter_pins_from_body(body: Any, *, source: str) -> Iterator[Dict[str, Any]]:
+    try:
+        yield from iter_pins(body, source=source)
+    finally:
+        body.close()
+
+
+def file_fingerprint(path: str) -> str:
+    """Cheap stand-in for an S3 ETag on local files: size plus mtime."""
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def open_s3_object(
     bucket: str,
     key: str,
     *,
     region: str | None = None,
     profile: str | None = None,
-) -> List[Dict[str, Any]]:
+    endpoint_url: str | None = None,
+    if_none_match: str | None = None,
+) -> Optional[Tuple[Any, str]]:
+    """Return (streaming body, ETag), or None when the ETag still matches ``if_none_match``."""
     session = boto3.session.Session(profile_name=profile, region_name=region)
-    s3 = session.client("s3")
+    s3 = session.client("s3", endpoint_url=endpoint_url)
+    conditions = {"IfNoneMatch": if_none_match} if if_none_match else {}
     try:
-        response = s3.get_object(Bucket=bucket, Key=key)
+        response = s3.get_object(Bucket=bucket, Key=key, **conditions)
     except ClientError as exc:
+        status_code = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if if_none_match and status_code == 304:
+            return None
         raise RuntimeError(f"Unable to download s3://{bucket}/{key}: {exc}") from exc
+    return response["Body"], response["ETag"]
+
+
+def load_sync_state(source: str) -> Optional[SyncState]:
+    with engine.begin() as connection:
+        ensure_schema(connection)
+    with Session(engine) as session:
+        return session.get(SyncState, source)
+
+
+def content_hash(pin: Dict[str, Any]) -> str:
+    canonical = json.dumps(pin, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def prepare_row(pin: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a source pin once here so the service can serve it without re-validating.
+
+    Raises ValidationError for a pin the service could not serve.
+    """
+    location_id = ensure_uuid(pin.get("id"))
+    created_at = parse_timestamp(pin.get("createdAt"))
+    updated_at = parse_timestamp(pin.get("updatedAt")) if pin.get("updatedAt") else created_at
 
-    body = response["Body"].read()
-    payload = json.loads(body.decode("utf-8"))
-    if not isinstance(payload, list):
-        raise ValueError(f"Expected s3://{bucket}/{key} to contain a JSON array of pins")
-    return payload
+    record_payload = dict(pin)
+    record_payload["id"] = str(location_id)
+    record_payload.setdefault("createdAt", created_at.isoformat())
+    record_payload["updatedAt"] = updated_at.isoformat()
+    record_payload = normalize_pin(record_payload)
+    return {
+        "id": location_id,
+        "data": record_payload,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        # Hashed before defaults are filled in, so unchanged source pins hash
+        # the same on every run.
+        "source_hash": content_hash(pin),
+        "schema_version": PIN_SCHEMA_VERSION,
+    }
 
 
-def upsert_pins(pins: Sequence[Dict[str, Any]], *, truncate: bool = False, dry_run: bool = False) -> Dict[str, int]:
-    SQLModel.metadata.create_all(engine)
+def valid_rows(
+    pins: Iterable[Dict[str, Any]], stats: Dict[str, int], seen: Set[Any]
+) -> Iterator[Dict[str, Any]]:
+    """Prepare each pin, skipping and counting the ones that fail validation.
 
-    stats = {"inserted": 0, "updated": 0, "deleted": 0}
+    A skipped pin's id still goes in ``seen``, so an incremental truncate
+    keeps the version already stored rather than deleting it.
+    """
+    for pin in pins:
+        try:
+            yield prepare_row(pin)
+        except ValidationError as exc:
+            stats["invalid"] += 1
+            seen.add(ensure_uuid(pin.get("id")))
+            problems = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()
+            )
+            print(f"Warning: skipping pin {pin.get('id')!r}, not a valid location ({problems})")
+
+
+def batched(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert_batch_postgres(session: Session, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    table = LocationPinRecord.__table__
+    statement = pg_insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={
+            "data": statement.excluded.data,
+            "updated_at": statement.excluded.updated_at,
+            "source_hash": statement.excluded.source_hash,
+            "schema_version": statement.excluded.schema_version,
+            "created_at": func.coalesce(table.c.created_at, statement.excluded.created_at),
+        },
+    )
+    # xmax is 0 only for freshly inserted tuples, which tells inserts and
+    # conflict-updates apart without a separate lookup.
+    inserted_flags = session.exec(statement.returning(literal_column("(xmax = 0)"))).scalars().all()
+    inserted = sum(1 for flag in inserted_flags if flag)
+    return {"inserted": inserted, "updated": len(inserted_flags) - inserted}
+
+
+def upsert_batch_generic(session: Session, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    table = LocationPinRecord.__table__
+    existing = set(
+        session.exec(select(table.c.id).where(table.c.id.in_([row["id"] for row in rows]))).scalars()
+    )
+    new_rows = [row for row in rows if row["id"] not in existing]
+    changed_rows = [
+        {
+            "row_id": row["id"],
+            "data": row["data"],
+            "updated_at": row["updated_at"],
+            "source_hash": row["source_hash"],
+            "schema_version": row["schema_version"],
+        }
+        for row in rows
+        if row["id"] in existing
+    ]
+    if new_rows:
+        session.exec(insert(table), params=new_rows)
+    if changed_rows:
+        session.exec(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(
+                data=bindparam("data"),
+                updated_at=bindparam("updated_at"),
+                source_hash=bindparam("source_hash"),
+                schema_version=bindparam("schema_version"),
+            ),
+            params=changed_rows,
+        )
+    return {"inserted": len(new_rows), "updated": len(changed_rows)}
+
+
+StoredVersion = Tuple[Optional[str], Optional[int], datetime]
+
+
+def stored_versions(
+    session: Session, rows: Optional[List[Dict[str, Any]]] = None
+) -> Dict[Any, StoredVersion]:
+    """(source_hash, schema_version, updated_at) of stored pins: the batch's, or all of them."""
+    table = LocationPinRecord.__table__
+    query = select(table.c.id, table.c.source_hash, table.c.schema_version, table.c.updated_at)
+    if rows is not None:
+        query = query.where(table.c.id.in_([row["id"] for row in rows]))
+    return {
+        row_id: (source_hash, schema_version, updated_at)
+        for row_id, source_hash, schema_version, updated_at in session.exec(query).all()
+    }
+
+
+def unchanged(row: Dict[str, Any], stored: Optional[StoredVersion]) -> bool:
+    return stored is not None and stored[:2] == (row["source_hash"], row["schema_version"])
+
+
+def changed_rows(
+    rows: List[Dict[str, Any]], stored: Dict[Any, StoredVersion]
+) -> List[Dict[str, Any]]:
+    """Drop rows whose stored source hash matches; missing or API-edited pins are kept.
+
+    Rows stored under an older schema_version are rewritten too, which brings
+    pins imported before write-time validation onto the fast read path.
+    """
+    return [row for row in rows if not unchanged(row, stored.get(row["id"]))]
+
+
+def restamp_rows(
+    rows: List[Dict[str, Any]], stored: Dict[Any, StoredVersion], now: datetime
+) -> None:
+    """Move updated_at exactly when an existing pin's content changes.
+
+    GET /locations/{id} tags a pin with its updated_at, and PATCH checks
+    If-Match against it. Sources often rewrite a pin without touching its
+    ``updatedAt``, so keeping the source value would leave a changed pin
+    with its old ETag. Unchanged pins keep the version already stored,
+    which a previous import may have moved past the source value.
+    """
+    for row in rows:
+        previous = stored.get(row["id"])
+        if previous is None:
+            continue
+        stored_at = as_utc(previous[2])
+        if unchanged(row, previous):
+            version = stored_at
+        else:
+            # Strictly later than the stored version, even if the clock is behind it.
+            version = max(now, stored_at + timedelta(microseconds=1))
+        row["updated_at"] = version
+        row["data"] = {**row["data"], "updatedAt": version.isoformat()}
+
+
+def delete_missing(session: Session, seen: Set[Any], batch_size: int) -> int:
+    table = LocationPinRecord.__table__
+    stale = [
+        record_id for record_id in session.exec(select(table.c.id)).scalars() if record_id not in seen
+    ]
+    deleted = 0
+    for offset in range(0, len(stale), batch_size):
+        for statement, params in photo_sync_statements([], stale[offset : offset + batch_size]):
+            session.exec(statement, params=params)
+        result = session.exec(
+            delete(LocationPinRecord).where(
+                LocationPinRecord.id.in_(stale[offset : offset + batch_size])
+            )
+        )
+        deleted += result.rowcount or 0
+    return deleted
+
+
+def upsert_pins(
+    pins: Iterable[Dict[str, Any]],
+    *,
+    truncate: bool = False,
+    dry_run: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    incremental: bool = False,
+    sync_state: Optional[SyncState] = None,
+) -> Dict[str, int]:
+    """Write pins in set-based batches inside one transaction.
+
+    Postgres gets one INSERT ... ON CONFLICT (id) DO UPDATE per batch; other
+    dialects fall back to one id lookup plus executemany insert/update per batch.
+    With ``incremental`` each batch first drops pins whose source hash is
+    unchanged, and ``truncate`` deletes only pins absent from the source.
+    ``sync_state`` is saved in the same transaction as the pins, and each
+    written pin's location_photos rows are replaced with it. Existing pins
+    whose content changed get a new updated_at (see restamp_rows). Search and
+    geo columns are generated from ``data``, so Postgres re-indexes each pin
+    as it is written; pods running without Postgres re-read their in-memory
+    indexes on the ``reset`` event that follows. Pins that fail validation are
+    skipped and counted as ``invalid`` (see valid_rows).
+    """
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}, not {batch_size}")
+    with engine.begin() as connection:
+        ensure_schema(connection)
+
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "invalid": 0}
+    upsert_batch = (
+        upsert_batch_postgres if engine.dialect.name == "postgresql" else upsert_batch_generic
+    )
+    seen: Set[Any] = set()
+    started_at = datetime.now(timezone.utc)
     with Session(engine) as session:
-        if truncate:
+        truncated: Optional[Dict[Any, StoredVersion]] = None
+        if truncate and not incremental:
+            # Kept so re-imported pins still get versions past the ones clients hold.
+            truncated = stored_versions(session)
+            session.exec(delete(LocationPhotoRecord))
             result = session.exec(delete(LocationPinRecord))
             stats["deleted"] = result.rowcount or 0
 
-        for pin in pins:
-            location_id = ensure_uuid(pin.get("id"))
-            created_at = parse_timestamp(pin.get("createdAt"))
-            updated_at = parse_timestamp(pin.get("updatedAt")) if pin.get("updatedAt") else created_at
-
-            record_payload = dict(pin)
-            record_payload["id"] = str(location_id)
-            record_payload.setdefault("createdAt", created_at.isoformat())
-            record_payload["updatedAt"] = updated_at.isoformat()
-
-            record = session.get(LocationPinRecord, location_id)
-            if record:
-                record.data = record_payload
-                record.updated_at = updated_at
-                if not record.created_at:
-                    record.created_at = created_at
-                stats["updated"] += 1
+        for batch in batched(valid_rows(pins, stats, seen), batch_size):
+            # One statement cannot touch the same row twice; the last copy wins.
+            rows = list({row["id"]: row for row in batch}.values())
+            if truncated is None:
+                stored = stored_versions(session, rows)
             else:
-                session.add(
-                    LocationPinRecord(
-                        id=location_id,
-                        data=record_payload,
-                        created_at=created_at,
-                        updated_at=updated_at,
-                    )
-                )
-                stats["inserted"] += 1
+                stored = {row["id"]: truncated[row["id"]] for row in rows if row["id"] in truncated}
+            if incremental:
+                if truncate:
+                    seen.update(row["id"] for row in rows)
+                changed = changed_rows(rows, stored)
+                stats["unchanged"] += len(rows) - len(changed)
+                rows = changed
+            restamp_rows(rows, stored, started_at)
+            if rows:
+                for key, count in upsert_batch(session, rows).items():
+                    stats[key] += count
+                written = [(row["id"], row["data"], row["updated_at"]) for row in rows]
+                for statement, params in photo_sync_statements(written):
+                    session.exec(statement, params=params)
+
+        if truncate and incremental:
+            stats["deleted"] = delete_missing(session, seen, batch_size)
+        if sync_state is not None:
+            sync_state.pin_count = stats["inserted"] + stats["updated"] + stats["unchanged"]
+            sync_state.synced_at = datetime.now(timezone.utc)
+            session.merge(sync_state)
 
         if dry_run:
             session.rollback()
@@ -127,28 +509,80 @@ def upsert_pins(pins: Sequence[Dict[str, Any]], *, truncate: bool = False, dry_r
     return stats
 
 
+def bump_cache_generation() -> None:
+    """Tell running locations pods the data changed, like an API write would.
+
+    An import can touch every pin, so the change feed gets one ``reset``
+    event (refetch the list) instead of an event per pin.
+    """
+    client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        pipeline = client.pipeline()
+        pipeline.incr(CACHE_GENERATION_KEY)
+        pipeline.set(CACHE_MODIFIED_AT_KEY, datetime.now(timezone.utc).isoformat())
+        pipeline.xadd(
+            CHANGE_STREAM_KEY,
+            {"op": "reset", "data": json.dumps({"op": "reset"})},
+            maxlen=CHANGE_FEED_MAXLEN,
+            approximate=True,
+        )
+        generation, *_ = pipeline.execute()
+        client.publish(CACHE_INVALIDATION_CHANNEL, generation)
+    except redis.RedisError as exc:
+        # The import is already committed; caches still expire on their own.
+        print(f"Warning: could not invalidate the locations cache via {REDIS_URL}: {exc}")
+    finally:
+        client.close()
+
+
 def main() -> None:
     args = parse_args()
     if not args.file and not args.bucket:
         raise SystemExit("Either --file or --bucket must be provided")
 
+    source = os.path.abspath(args.file) if args.file else f"s3://{args.bucket}/{args.key}"
+    previous = load_sync_state(source) if args.incremental else None
+    previous_etag = previous.etag if previous else None
+
     if args.file:
-        print(f"Loading pins from local file: {args.file}")
-        pins = load_pins_from_file(args.file)
+        etag = file_fingerprint(args.file)
+        if previous_etag == etag:
+            print(f"{source} unchanged since {previous.synced_at.isoformat()} (etag {etag}); nothing to do")
+            return
+        print(f"Streaming pins from local file: {args.file}")
+        pins = iter_pins_from_file(args.file)
     else:
-        bucket = args.bucket
-        key = args.key
-        region = args.region
-        print(f"Downloading pins from s3://{bucket}/{key}")
-        pins = load_pins_from_s3(bucket, key, region=region, profile=args.profile)
+        opened = open_s3_object(
+            args.bucket,
+            args.key,
+            region=args.region,
+            profile=args.profile,
+            endpoint_url=args.endpoint_url,
+            if_none_match=previous_etag,
+        )
+        if opened is None:
+            print(f"{source} unchanged since {previous.synced_at.isoformat()} (etag {previous_etag}); nothing to do")
+            return
+        body, etag = opened
+        print(f"Streaming pins from {source}")
+        pins = iter_pins_from_body(body, source=source)
 
-    print(f"Loaded {len(pins)} pins")
-    stats = upsert_pins(pins, truncate=args.truncate, dry_run=args.dry_run)
+    stats = upsert_pins(
+        pins,
+        truncate=args.truncate,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        sync_state=SyncState(source=source, etag=etag),
+    )
 
     action = "ROLLED BACK" if args.dry_run else "COMMITTED"
     print(
-        f"{action}: inserted={stats['inserted']} updated={stats['updated']} deleted={stats['deleted']}"
+        f"{action}: inserted={stats['inserted']} updated={stats['updated']} "
+        f"unchanged={stats['unchanged']} deleted={stats['deleted']} invalid={stats['invalid']}"
     )
+    if not args.dry_run and stats["inserted"] + stats["updated"] + stats["deleted"]:
+        bump_cache_generation()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+"""JSON Merge Patch (RFC 7396) and JSON Patch (RFC 6902) for pin documents.
+
+On Postgres, PATCH runs inside the UPDATE through the ``jsonb_merge_patch`` and
+``jsonb_patch`` functions that ``ensure_schema`` installs. Other databases
+(SQLite in local setups) apply the same semantics in Python with
+``merge_patch`` and ``apply_json_patch``. ``parse_patch`` checks the request
+body up front for both paths and turns JSON Pointers into path arrays.
+"""
+
+from __future__ import annotations
+
+import copy
+import re
+from typing import Any, Dict, List, Tuple
+
+MERGE_PATCH = "application/merge-patch+json"
+JSON_PATCH = "application/json-patch+json"
+PATCH_MEDIA_TYPES = (MERGE_PATCH, JSON_PATCH)
+OPERATIONS = {"add", "remove", "replace", "move", "copy", "test"}
+ARRAY_INDEX = re.compile(r"^(0|[1-9][0-9]*)$")
+
+# Custom SQLSTATEs raised by the functions below, mapped to HTTP statuses.
+CONFLICT_SQLSTATE = "PT409"
+UNPROCESSABLE_SQLSTATE = "PT422"
+
+PATCH_SCHEMA_STATEMENTS = (
+    """
+    CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb) RETURNS jsonb
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    BEGIN
+        IF jsonb_typeof(patch) IS DISTINCT FROM 'object' THEN
+            RETURN patch;
+        END IF;
+        IF jsonb_typeof(target) IS DISTINCT FROM 'object' THEN
+            target := '{}'::jsonb;
+        END IF;
+        RETURN (
+            SELECT coalesce(jsonb_object_agg(key, value), '{}'::jsonb)
+            FROM (
+                SELECT t.key, t.value FROM jsonb_each(target) AS t WHERE NOT (patch ? t.key)
+                UNION ALL
+                SELECT p.key, jsonb_merge_patch(target -> p.key, p.value)
+                FROM jsonb_each(patch) AS p
+                WHERE jsonb_typeof(p.value) <> 'null'
+            ) AS merged
+        );
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION jsonb_patch_check(target jsonb, path text[]) RETURNS void
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    BEGIN
+        IF target #> path IS NULL OR (
+            jsonb_typeof(target #> path[1:cardinality(path) - 1]) = 'array'
+            AND path[cardinality(path)] !~ '^(0|[1-9][0-9]*)$'
+        ) THEN
+            RAISE EXCEPTION USING ERRCODE = 'PT422',
+                MESSAGE = 'path /' || array_to_string(path, '/') || ' does not exist';
+        END IF;
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION jsonb_patch_add(target jsonb, path text[], value jsonb) RETURNS jsonb
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        parent_path text[] := path[1:cardinality(path) - 1];
+        parent jsonb := target #> parent_path;
+        key text := path[cardinality(path)];
+    BEGIN
+        IF jsonb_typeof(parent) = 'object' THEN
+            RETURN jsonb_set(target, path, value, true);
+        ELSIF jsonb_typeof(parent) = 'array' THEN
+            IF key = '-' OR key = jsonb_array_length(parent)::text THEN
+                RETURN jsonb_set(target, parent_path, parent || jsonb_build_array(value));
+            ELSIF key ~ '^(0|[1-9][0-9]*)$' AND key::int < jsonb_array_length(parent) THEN
+                RETURN jsonb_insert(target, path, value);
+            END IF;
+        END IF;
+        RAISE EXCEPTION USING ERRCODE = 'PT422',
+            MESSAGE = 'cannot add at /' || array_to_string(path, '/');
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION jsonb_patch(target jsonb, operations jsonb) RETURNS jsonb
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        operation jsonb;
+        path text[];
+        source text[];
+        value jsonb;
+    BEGIN
+        FOR operation IN SELECT jsonb_array_elements(operations) LOOP
+            path := ARRAY(SELECT jsonb_array_elements_text(operation -> 'path'));
+            CASE operation ->> 'op'
+            WHEN 'add' THEN
+                target := jsonb_patch_add(target, path, operation -> 'value');
+            WHEN 'remove' THEN
+                PERFORM jsonb_patch_check(target, path);
+                target := target #- path;
+            WHEN 'replace' THEN
+                PERFORM jsonb_patch_check(target, path);
+                target := jsonb_set(target, path, operation -> 'value', false);
+            WHEN 'move', 'copy' THEN
+                source := ARRAY(SELECT jsonb_array_elements_text(operation -> 'from'));
+                PERFORM jsonb_patch_check(target, source);
+                value := target #> source;
+                IF operation ->> 'op' = 'move' THEN
+                    target := target #- source;
+                END IF;
+                target := jsonb_patch_add(target, path, value);
+            WHEN 'test' THEN
+                IF (target #> path) IS DISTINCT FROM operation -> 'value' THEN
+                    RAISE EXCEPTION USING ERRCODE = 'PT409',
+                        MESSAGE = 'test failed at /' || array_to_string(path, '/');
+                END IF;
+            END CASE;
+        END LOOP;
+        RETURN target;
+    END;
+    $$
+    """,
+)
+
+
+class PatchError(ValueError):
+    """A patch that is malformed (422) or whose ``test`` failed (409)."""
+
+    def __init__(self, message: str, status_code: int = 422) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_pointer(pointer: Any) -> List[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Invalid JSON Pointer {pointer!r}")
+    if not pointer:
+        raise PatchError("Patching the whole document is not supported; use PUT")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def parse_patch(media_type: str, document: Any) -> Any:
+    """Check a PATCH body; JSON Patch operations come back with pointers as path arrays."""
+    if media_type == MERGE_PATCH:
+        if not isinstance(document, dict):
+            raise PatchError("A merge patch for a location must be a JSON object")
+        return document
+    if not isinstance(document, list):
+        raise PatchError("A JSON Patch must be an array of operations")
+    operations = []
+    for operation in document:
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+            raise PatchError(f"Invalid JSON Patch operation {operation!r}")
+        parsed: Dict[str, Any] = {"op": operation["op"], "path": parse_pointer(operation.get("path"))}
+        if operation["op"] in {"add", "replace", "test"}:
+            if "value" not in operation:
+                raise PatchError(f"{operation['op']} needs a value")
+            parsed["value"] = operation["value"]
+        if operation["op"] in {"move", "copy"}:
+            parsed["from"] = parse_pointer(operation.get("from"))
+            source, target = parsed["from"], parsed["path"]
+            if operation["op"] == "move" and len(target) > len(source) and target[: len(source)] == source:
+                raise PatchError("Cannot move a value into one of its children")
+        operations.append(parsed)
+    return operations
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _resolve(document: Any, path: List[str]) -> Tuple[Any, str]:
+    """Return the container holding the last path segment, and that segment."""
+    parent = document
+    for part in path[:-1]:
+        if isinstance(parent, dict) and part in parent:
+            parent = parent[part]
+        elif isinstance(parent, list) and ARRAY_INDEX.match(part) and int(part) < len(parent):
+            parent = parent[int(part)]
+        else:
+            raise PatchError(f"Path /{'/'.join(path)} does not exist")
+    return parent, path[-1]
+
+
+def _get(document: Any, path: List[str]) -> Any:
+    parent, key = _resolve(document, path)
+    if isinstance(parent, dict) and key in parent:
+        return parent[key]
+    if isinstance(parent, list) and ARRAY_INDEX.match(key) and int(key) < len(parent):
+        return parent[int(key)]
+    raise PatchError(f"Path /{'/'.join(path)} does not exist")
+
+
+def _add(document: Any, path: List[str], value: Any) -> None:
+    parent, key = _resolve(document, path)
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list) and key == "-":
+        parent.append(value)
+    elif isinstance(parent, list) and ARRAY_INDEX.match(key) and int(key) <= len(parent):
+        parent.insert(int(key), value)
+    else:
+        raise PatchError(f"Cannot add at /{'/'.join(path)}")
+
+
+def _remove(document: Any, path: List[str]) -> Any:
+    value = _get(document, path)
+    parent, key = _resolve(document, path)
+    if isinstance(parent, dict):
+        del parent[key]
+    else:
+        del parent[int(key)]
+    return value
+
+
+def apply_json_patch(document: Dict[str, Any], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply parsed operations to a copy of ``document``; all or nothing."""
+    result = copy.deepcopy(document)
+    for operation in operations:
+        op, path = operation["op"], operation["path"]
+        if op == "add":
+            _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, path)
+        elif op == "replace":
+            _get(result, path)
+            _remove(result, path)
+            _add(result, path, copy.deepcopy(operation["value"]))
+        elif op in {"move", "copy"}:
+            value = copy.deepcopy(_get(result, operation["from"]))
+            if op == "move":
+                _remove(result, operation["from"])
+            _add(result, path, value)
+        elif op == "test":
+            try:
+                matches = _get(result, path) == operation["value"]
+            except PatchError:
+                matches = False
+            if not matches:
+                raise PatchError(f"test failed at /{'/'.join(path)}", status_code=409)
+    return result
@@ -0,0 +1,202 @@
+"""In-memory inverted index used for search when the locations service runs without Postgres.
+
+Production search goes through the GIN-indexed ``search_vector`` column (see
+``main.SEARCH_SCHEMA_STATEMENTS``). SQLite/local setups have no full-text
+index, so the service keeps this one in memory instead and updates it on
+every write.
+
+Fields are weighted like the Postgres column (A title and tags, B description,
+C stories, D photo titles and alt text), and scores are normalised by document
+length like ``ts_rank(..., 1)``. There is no stemming or stop-word list, so
+rankings match Postgres only approximately.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# ts_rank's default weights for D, C, B and A.
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}
+# Candidate sets up to this size are scored in full rather than walked best-first.
+RANK_ALL_BELOW = 2_000
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _strings(values: Iterable[object]) -> Iterator[str]:
+    return (value for value in values if isinstance(value, str))
+
+
+def _items(value: object) -> List[Dict]:
+    return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+
+
+def pin_text(data: Dict) -> Iterator[Tuple[str, str]]:
+    """Yield (weight class, text) for every searchable field of a pin document."""
+    yield from (("A", text) for text in _strings([data.get("title")]))
+    yield from (("A", tag) for tag in _strings(data.get("tags") or ()))
+    yield from (("B", text) for text in _strings([data.get("description")]))
+    yield from (("C", text) for text in _strings([data.get("story")]))
+    trips = _items(data.get("trips"))
+    yield from (("C", text) for text in _strings(trip.get("story") for trip in trips))
+    photos = _items(data.get("photos"))
+    for trip in trips:
+        photos.extend(_items(trip.get("photos")))
+    for photo in photos:
+        yield from (("D", text) for text in _strings([photo.get("title"), photo.get("alt")]))
+
+
+def parse_query(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Split a websearch-style query into required and excluded (``-word``) terms."""
+    required: List[str] = []
+    excluded: List[str] = []
+    for word in text.split():
+        target = excluded if word.startswith("-") else required
+        target.extend(tokenize(word))
+    return tuple(dict.fromkeys(required)), tuple(dict.fromkeys(excluded))
+
+
+class Document(NamedTuple):
+    terms: Tuple[str, ...]
+    tags: Tuple[str, ...]
+    # Tie-breaker: newer pins first, as the Postgres query orders them.
+    updated_at: str
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        # term -> pin id -> weighted, length-normalised term frequency
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.tag_postings: Dict[str, Set[str]] = defaultdict(set)
+        self.documents: Dict[str, Document] = {}
+        # term -> pin ids best first, built when a query needs it and dropped
+        # when the term's postings change.
+        self.ranked: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def upsert(self, pin_id: str, data: Dict) -> None:
+        self.remove(pin_id)
+        scores: Counter = Counter()
+        length = 0
+        for weight, text in pin_text(data):
+            tokens = tokenize(text)
+            length += len(tokens)
+            for token in tokens:
+                scores[token] += WEIGHTS[weight]
+        norm = 1.0 + math.log(1 + length)
+        for term, score in scores.items():
+            self.postings[term][pin_id] = score / norm
+            self.ranked.pop(term, None)
+        tags = tuple(dict.fromkeys(_strings(data.get("tags") or ())))
+        for tag in tags:
+            self.tag_postings[tag].add(pin_id)
+        self.documents[pin_id] = Document(tuple(scores), tags, str(data.get("updatedAt") or ""))
+
+    def remove(self, pin_id: str) -> None:
+        document = self.documents.pop(pin_id, None)
+        if document is None:
+            return
+        for term in document.terms:
+            postings = self.postings[term]
+            postings.pop(pin_id, None)
+            self.ranked.pop(term, None)
+            if not postings:
+                del self.postings[term]
+        for tag in document.tags:
+            members = self.tag_postings[tag]
+            members.discard(pin_id)
+            if not members:
+                del self.tag_postings[tag]
+
+    def _ranked(self, term: str) -> List[str]:
+        ranked = self.ranked.get(term)
+        if ranked is None:
+            postings = self.postings[term]
+            ranked = sorted(
+                postings,
+                key=lambda pin_id: (postings[pin_id], self.documents[pin_id].updated_at),
+                reverse=True,
+            )
+            self.ranked[term] = ranked
+        return ranked
+
+    def search(
+        self, query: Optional[str], tags: Tuple[str, ...] = (), limit: int = 20
+    ) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (pin id, score) pairs, best first.
+
+        Every required term and every tag must match. Small candidate sets
+        (a rare word or tag among the filters) are scored outright. Otherwise
+        the terms' best-first lists are walked together and the walk stops once
+        no unseen pin can beat the results so far (Fagin's threshold algorithm),
+        so a common word costs about as much as a rare one.
+        """
+        required, excluded = parse_query(query or "")
+        if (query and not required) or (not required and not tags):
+            return []
+        if any(term not in self.postings for term in required):
+            return []
+        # Missing tags leave an empty filter, which matches nothing below.
+        postings = [self.postings[term] for term in required]
+        filters: List[Iterable[str]] = [self.tag_postings.get(tag, ()) for tag in tags]
+        smallest = min(map(len, postings + filters))
+        if not required or smallest <= RANK_ALL_BELOW:
+            candidates = set(min(postings + filters, key=len))
+            for members in postings + filters:
+                candidates.intersection_update(members)
+            for term in excluded:
+                candidates.difference_update(self.postings.get(term, ()))
+            scored = ((pin_id, sum(terms[pin_id] for terms in postings)) for pin_id in candidates)
+            return heapq.nlargest(limit, scored, key=self._order)
+        return self._threshold_search(required, postings, filters, excluded, limit)
+
+    def _order(self, pair: Tuple[str, float]) -> Tuple[float, str]:
+        return pair[1], self.documents[pair[0]].updated_at
+
+    def _threshold_search(
+        self,
+        required: Tuple[str, ...],
+        postings: List[Dict[str, float]],
+        filters: List[Iterable[str]],
+        excluded: Tuple[str, ...],
+        limit: int,
+    ) -> List[Tuple[str, float]]:
+        ranked = [self._ranked(term) for term in required]
+        exclusions = [self.postings.get(term, {}) for term in excluded]
+        best: List[Tuple[float, str, str]] = []
+        seen: Set[str] = set()
+        for depth in range(max(map(len, ranked))):
+            threshold = 0.0
+            for terms, order in zip(postings, ranked):
+                if depth >= len(order):
+                    continue
+                pin_id = order[depth]
+                threshold += terms[pin_id]
+                if pin_id in seen:
+                    continue
+                seen.add(pin_id)
+                if not all(pin_id in members for members in postings) or not all(
+                    pin_id in members for members in filters
+                ):
+                    continue
+                if any(pin_id in members for members in exclusions):
+                    continue
+                score = sum(members[pin_id] for members in postings)
+                entry = (score, self.documents[pin_id].updated_at, pin_id)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            # Every unseen pin scores at most the sum of the scores at this depth.
+            if len(best) == limit and best[0][0] > threshold:
+                break
+        return [(pin_id, score) for score, _, pin_id in sorted(best, reverse=True)]
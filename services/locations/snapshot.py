@@ -0,0 +1,215 @@
+"""Build the locations read snapshot: precomputed, precompressed responses in Redis.
+
+Run by the worker CronJob (job ``locations-snapshot``) or by hand::
+
+    python snapshot.py [--force]
+
+A snapshot holds these artifacts, each stored as the body, ETag, Last-Modified
+and compressed variants that the serving pods return unchanged:
+
+- ``list``: the full pin list (GET /locations)
+- ``summary``: map markers only (GET /locations/summary)
+- ``category:<name>``: one category's pins (GET /locations?category=<name>)
+
+Every build writes its artifacts under a fresh snapshot id and repoints
+``locations:snapshot`` in the same MULTI, so readers see either the whole new
+snapshot or the whole previous one. Superseded artifacts expire after
+SNAPSHOT_RETAIN_SECONDS. The pointer also records the cache generation read
+before querying, and serving pods only use a snapshot that matches their
+current generation.
+
+Runs are incremental. The table fingerprint is a digest of every pin's id,
+updated_at, source_hash and schema_version, so API writes, deletes and
+imports that change a pin's content all change it. When it still matches the
+published snapshot, nothing is rebuilt; the snapshot is only re-stamped with
+the current generation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+import redis
+from sqlmodel import Session, create_engine, select
+
+from compression import precompress
+from main import (
+    CACHE_GENERATION_KEY,
+    CACHE_MODIFIED_AT_KEY,
+    COMPRESS_MIN_BYTES,
+    DATABASE_URL,
+    LIST_CACHE_NAME,
+    REDIS_URL,
+    SNAPSHOT_KEY,
+    SUMMARY_CACHE_NAME,
+    EncodedResponse,
+    LocationPinRecord,
+    as_utc,
+    encode_items,
+    encodings_to_redis,
+    record_document,
+    snapshot_key,
+    summarize_pin,
+)
+
+SNAPSHOT_RETAIN_SECONDS = int(os.environ.get("SNAPSHOT_RETAIN_SECONDS", "900"))
+SNAPSHOT_SEQUENCE_KEY = f"{SNAPSHOT_KEY}:sequence"
+
+# Like migrate_from_s3, this runs outside the service's event loop on a plain engine.
+engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+
+class SnapshotResult(NamedTuple):
+    # "built", "restamped" (data unchanged, generation moved) or "unchanged".
+    status: str
+    rows: int
+    artifacts: int = 0
+    bytes: int = 0
+
+
+def table_fingerprint(session: Session) -> Tuple[str, int]:
+    """Digest of the version columns of every pin, and the pin count.
+
+    max(updated_at) alone misses imports that rewrite a pin without a newer
+    updated_at; source_hash changes with the imported content. Reading the
+    narrow version columns is far cheaper than the build it can skip.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    count = 0
+    rows = session.exec(
+        select(
+            LocationPinRecord.id,
+            LocationPinRecord.updated_at,
+            LocationPinRecord.source_hash,
+            LocationPinRecord.schema_version,
+        ).order_by(LocationPinRecord.id)
+    )
+    for pin_id, updated_at, source_hash, schema_version in rows:
+        digest.update(f"{pin_id}|{updated_at.isoformat()}|{source_hash}|{schema_version}\n".encode())
+        count += 1
+    return digest.hexdigest(), count
+
+
+def build_artifacts(
+    records: List[LocationPinRecord], modified_at: Optional[datetime]
+) -> Dict[str, EncodedResponse]:
+    """Encode every artifact from rows ordered newest first, as GET /locations orders them."""
+    extra = [modified_at] if modified_at is not None else []
+    documents = [record_document(record) for record in records]
+    timestamps = [as_utc(record.updated_at) for record in records]
+    artifacts = {
+        LIST_CACHE_NAME: encode_items(documents, timestamps=timestamps + extra),
+        SUMMARY_CACHE_NAME: encode_items(
+            [summarize_pin(document) for document in documents], timestamps=timestamps + extra
+        ),
+    }
+    categories: Dict[str, Tuple[List[Dict], List[datetime]]] = {}
+    for document, timestamp in zip(documents, timestamps):
+        category = document.get("category")
+        if isinstance(category, str):
+            items, times = categories.setdefault(category, ([], []))
+            items.append(document)
+            times.append(timestamp)
+    for category, (items, times) in categories.items():
+        artifacts[f"category:{category}"] = encode_items(items, timestamps=times + extra)
+    return {
+        name: encoded._replace(encodings=precompress(encoded.body, COMPRESS_MIN_BYTES))
+        for name, encoded in artifacts.items()
+    }
+
+
+def publish(
+    client: redis.Redis,
+    artifacts: Dict[str, EncodedResponse],
+    previous: Dict[str, str],
+    cache_generation: int,
+    fingerprint: Tuple[str, int],
+) -> int:
+    snapshot_id = client.incr(SNAPSHOT_SEQUENCE_KEY)
+    with client.pipeline(transaction=True) as pipe:
+        for name, encoded in artifacts.items():
+            pipe.hset(
+                snapshot_key(snapshot_id, name),
+                mapping={
+                    "body": encoded.body,
+                    "etag": encoded.etag,
+                    "lastModified": encoded.last_modified.isoformat(),
+                    **encodings_to_redis(encoded),
+                },
+            )
+        pipe.hset(
+            SNAPSHOT_KEY,
+            mapping={
+                "id": snapshot_id,
+                "cacheGeneration": cache_generation,
+                "fingerprint": fingerprint[0],
+                "rowCount": fingerprint[1],
+                "builtAt": time.time(),
+                "artifacts": orjson.dumps(list(artifacts)).decode("utf-8"),
+            },
+        )
+        # Readers that fetched the old pointer a moment ago can still finish.
+        for name in orjson.loads(previous.get("artifacts") or "[]"):
+            pipe.expire(snapshot_key(previous["id"], name), SNAPSHOT_RETAIN_SECONDS)
+        pipe.execute()
+    return snapshot_id
+
+
+def run(force: bool = False) -> SnapshotResult:
+    client = redis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        # Read the generation before the rows: a write that lands mid-build
+        # bumps it, so this snapshot is never served for data it is missing.
+        cache_generation = int(client.get(CACHE_GENERATION_KEY) or 0)
+        modified_at = client.get(CACHE_MODIFIED_AT_KEY)
+        previous = client.hgetall(SNAPSHOT_KEY)
+        with Session(engine) as session:
+            fingerprint = table_fingerprint(session)
+            published = (
+                bool(previous)
+                and (previous.get("fingerprint"), int(previous["rowCount"])) == fingerprint
+                and client.exists(snapshot_key(previous["id"], LIST_CACHE_NAME))
+            )
+            if published and not force:
+                if int(previous["cacheGeneration"]) == cache_generation:
+                    return SnapshotResult("unchanged", fingerprint[1])
+                client.hset(SNAPSHOT_KEY, "cacheGeneration", cache_generation)
+                return SnapshotResult("restamped", fingerprint[1])
+            records = session.exec(
+                select(LocationPinRecord).order_by(
+                    LocationPinRecord.updated_at.desc(), LocationPinRecord.id.desc()
+                )
+            ).all()
+        artifacts = build_artifacts(
+            records, datetime.fromisoformat(modified_at) if modified_at else None
+        )
+        publish(client, artifacts, previous, cache_generation, fingerprint)
+        return SnapshotResult(
+            "built",
+            len(records),
+            len(artifacts),
+            sum(encoded.size for encoded in artifacts.values()),
+        )
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute the locations read snapshot in Redis.")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if no pin changed")
+    args = parser.parse_args()
+    result = run(force=args.force)
+    print(
+        f"Snapshot {result.status}: {result.rows} pins, {result.artifacts} artifacts, "
+        f"{result.bytes} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
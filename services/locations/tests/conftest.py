@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVICE_DIR))
+
+# SQLite exercises the service's non-Postgres paths: in-memory geo and search
+# indexes and read-modify-write PATCH.
+DATABASE_FILE = Path(tempfile.mkdtemp()) / "locations.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_FILE}"
+
+import main  # noqa: E402
+import migrate_from_s3  # noqa: E402
+import snapshot  # noqa: E402
+
+PIN = {
+    "title": "Lake",
+    "description": "A quiet lake",
+    "category": "water",
+    "coordinates": {"latitude": 45.0, "longitude": -122.0},
+}
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def client(redis_server, monkeypatch):
+    """The locations app on a fresh SQLite file and an in-memory Redis."""
+    server = redis_server
+    monkeypatch.setattr(
+        main.redis,
+        "from_url",
+        lambda *args, **kwargs: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    monkeypatch.setattr(main, "_local_generation", None)
+    main.l1_cache.clear()
+    main.tile_cache.clear()
+    with TestClient(main.app) as http:
+        yield http
+    DATABASE_FILE.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def importer(sync_engine, monkeypatch):
+    """migrate_from_s3.upsert_pins against the app's database.
+
+    A real import bumps the cache generation afterwards; here the pod's L1
+    cache is simply dropped.
+    """
+    monkeypatch.setattr(migrate_from_s3, "engine", sync_engine)
+
+    def upsert_pins(pins, **options):
+        stats = migrate_from_s3.upsert_pins(pins, **options)
+        main.l1_cache.clear()
+        return stats
+
+    return upsert_pins
+
+
+@pytest.fixture
+def sync_engine(client):
+    """A blocking engine on the app's database, as the worker jobs use."""
+    return create_engine(f"sqlite:///{DATABASE_FILE}")
+
+
+@pytest.fixture
+def snapshot_job(sync_engine, redis_server, monkeypatch):
+    monkeypatch.setattr(snapshot, "engine", sync_engine)
+    monkeypatch.setattr(
+        snapshot.redis,
+        "from_url",
+        lambda *args, **kwargs: fakeredis.FakeRedis(server=redis_server, decode_responses=True),
+    )
+    return snapshot.run
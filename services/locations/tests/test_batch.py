@@ -0,0 +1,108 @@
+import uuid
+
+import pytest
+
+import main
+from conftest import PIN
+
+PHOTO = {"id": "p1", "src": "https://img.test/p1.jpg", "alt": "Shore", "title": "Shore"}
+
+
+def create(client, **overrides):
+    response = client.post("/locations", json={**PIN, **overrides})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def batch(client, *operations):
+    return client.post("/locations:batch", json={"operations": list(operations)})
+
+
+def test_results_come_back_in_request_order_with_their_own_status(client):
+    kept, removed = create(client, title="Kept"), create(client, title="Removed")
+    new_id, missing = str(uuid.uuid4()), str(uuid.uuid4())
+    response = batch(
+        client,
+        {"op": "create", "pin": {**PIN, "id": new_id, "title": "New"}},
+        {"op": "update", "id": kept, "pin": {**PIN, "title": "Kept v2"}},
+        {"op": "delete", "id": removed},
+        {"op": "update", "id": missing, "pin": PIN},
+        {"op": "delete", "id": kept},
+        {"op": "create", "pin": {**PIN, "id": new_id}},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(item["index"], item["op"], item["status"]) for item in results] == [
+        (0, "create", 201),
+        (1, "update", 200),
+        (2, "delete", 204),
+        (3, "update", 404),
+        (4, "delete", 409),
+        (5, "create", 409),
+    ]
+    assert [item["id"] for item in results] == [new_id, kept, removed, missing, kept, new_id]
+    assert results[1]["pin"]["title"] == "Kept v2"
+    # Failed items are skipped; the rest commit together.
+    assert client.get(f"/locations/{kept}").json()["title"] == "Kept v2"
+    assert client.get(f"/locations/{new_id}").json()["title"] == "New"
+    assert client.get(f"/locations/{removed}").status_code == 404
+
+
+def test_a_batch_invalidates_the_cache_once(client, monkeypatch):
+    bumps = []
+    original = main.bump_cache_generation
+
+    async def counting(changes=()):
+        bumps.append([change.op for change in changes])
+        await original(changes)
+
+    monkeypatch.setattr(main, "bump_cache_generation", counting)
+    response = batch(client, *({"op": "create", "pin": {**PIN, "title": f"P{n}"}} for n in range(3)))
+
+    assert bumps == [["create", "create", "create"]]
+    for item in response.json()["results"]:
+        assert client.get(f"/locations/{item['id']}").status_code == 200
+
+
+def test_a_failing_statement_rolls_back_the_whole_batch(client, monkeypatch):
+    removed = create(client, title="Removed")
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("photo sync failed")
+        yield
+
+    monkeypatch.setattr(main, "photo_sync_statements", broken)
+    new_id = str(uuid.uuid4())
+    with pytest.raises(RuntimeError):
+        batch(client, {"op": "create", "pin": {**PIN, "id": new_id}}, {"op": "delete", "id": removed})
+
+    assert client.get(f"/locations/{new_id}").status_code == 404
+    assert client.get(f"/locations/{removed}").status_code == 200
+
+
+def test_an_invalid_operation_rejects_the_request(client):
+    response = batch(client, {"op": "create", "pin": PIN}, {"op": "update", "pin": PIN})
+
+    assert response.status_code == 422
+    assert client.get("/locations").json() == []
+
+
+def test_batch_size_is_capped(client):
+    operations = [{"op": "delete", "id": str(uuid.uuid4())}] * (main.BATCH_MAX_OPERATIONS + 1)
+
+    assert batch(client, *operations).status_code == 422
+
+
+def test_batch_writes_keep_the_photo_table_in_sync(client):
+    kept, removed = create(client, photos=[PHOTO]), create(client, photos=[{**PHOTO, "id": "p2"}])
+    batch(
+        client,
+        {"op": "update", "id": kept, "pin": {**PIN, "photos": [{**PHOTO, "title": "Shore v2"}]}},
+        {"op": "delete", "id": removed},
+        {"op": "create", "pin": {**PIN, "photos": [{**PHOTO, "id": "p3"}]}},
+    )
+
+    photos = {photo["id"]: photo for photo in client.get("/photos").json()}
+    assert set(photos) == {"p1", "p3"}
+    assert photos["p1"]["title"] == "Shore v2"
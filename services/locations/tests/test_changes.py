@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import fakeredis
+
+import main
+from conftest import PIN
+
+
+def take(client, cursor, count):
+    """The first ``count`` messages of the change feed, parsed, read in the app's event loop."""
+
+    async def collect():
+        events = main.change_events(cursor)
+        messages = []
+        try:
+            async for message in events:
+                messages.append(parse(message))
+                if len(messages) == count:
+                    return messages
+        finally:
+            await events.aclose()
+
+    return client.portal.call(asyncio.wait_for, collect(), 5)
+
+
+def parse(message):
+    text = message.decode("utf-8")
+    assert text.endswith("\n\n")
+    if text.startswith(":"):
+        return {"comment": text.strip()}
+    fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+    return {"id": fields["id"], "event": fields["event"], "data": json.loads(fields["data"])}
+
+
+def stream(redis_server):
+    return fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+
+
+def test_writes_become_events_in_order(client, redis_server):
+    first = client.post("/locations", json=PIN).json()["id"]
+    second = client.post("/locations", json={**PIN, "title": "Pond"}).json()["id"]
+    client.put(f"/locations/{first}", json={**PIN, "title": "Lake v2"})
+    client.delete(f"/locations/{second}")
+    entries = stream(redis_server).xrange(main.CHANGE_STREAM_KEY)
+
+    # Resuming after the first event replays everything since.
+    events = take(client, entries[0][0], 3)
+
+    assert [event["id"] for event in events] == [entry_id for entry_id, _ in entries[1:]]
+    assert [(event["event"], event["data"]["id"]) for event in events] == [
+        ("create", second),
+        ("update", first),
+        ("delete", second),
+    ]
+    assert events[1]["data"]["pin"]["title"] == "Lake v2"
+    assert "pin" not in events[2]["data"]
+
+
+def test_a_cursor_older_than_the_stream_gets_a_reset(client, redis_server):
+    for title in ("A", "B", "C"):
+        client.post("/locations", json={**PIN, "title": title})
+    redis = stream(redis_server)
+    oldest = redis.xrange(main.CHANGE_STREAM_KEY)[0][0]
+    redis.xtrim(main.CHANGE_STREAM_KEY, maxlen=1, approximate=False)
+    newest = redis.xrange(main.CHANGE_STREAM_KEY)[0][0]
+
+    (event,) = take(client, oldest, 1)
+
+    assert (event["event"], event["id"], event["data"]) == ("reset", newest, {"op": "reset"})
+
+
+def test_idle_feeds_get_keepalive_comments(client, monkeypatch):
+    monkeypatch.setattr(main, "CHANGE_FEED_HEARTBEAT_SECONDS", 0.01)
+
+    assert take(client, None, 1) == [{"comment": ": keepalive"}]
+
+
+def test_last_event_id_resumes_the_feed(client, monkeypatch):
+    cursors = []
+
+    async def events(cursor):
+        cursors.append(cursor)
+        yield main.sse_event(cursor, "update", "{}")
+
+    monkeypatch.setattr(main, "change_events", events)
+    resumed = client.get("/locations/changes", headers={"Last-Event-ID": "1700000000000-3"})
+    explicit = client.get(
+        "/locations/changes", params={"cursor": "1700000000000-4"}, headers={"Last-Event-ID": "1-0"}
+    )
+
+    assert resumed.headers["content-type"].startswith("text/event-stream")
+    assert resumed.headers["cache-control"] == "no-store, no-transform"
+    assert resumed.text == "id: 1700000000000-3\nevent: update\ndata: {}\n\n"
+    assert cursors == ["1700000000000-3", "1700000000000-4"]
+    assert explicit.status_code == 200
+
+
+def test_malformed_cursors_are_rejected(client):
+    assert client.get("/locations/changes", headers={"Last-Event-ID": "yesterday"}).status_code == 400
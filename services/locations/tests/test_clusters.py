@@ -0,0 +1,106 @@
+import random
+import time
+
+import pytest
+
+from clusters import ClusterIndex
+from conftest import PIN
+
+
+def points(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        (f"pin{index}", rng.uniform(-60, 60), rng.uniform(-179, 179), index % 7 == 0)
+        for index in range(count)
+    ]
+
+
+def tiles(index, zoom):
+    size = 1 << zoom
+    return {
+        (x, y): sorted((cluster.count, tuple(cluster.pin_ids)) for cluster in index.tile(zoom, x, y))
+        for x in range(size)
+        for y in range(size)
+    }
+
+
+def test_every_zoom_accounts_for_every_pin_once():
+    index = ClusterIndex.build(points(500), max_zoom=6)
+
+    for zoom in range(9):
+        clusters = [cluster for tile in tiles(index, min(zoom, 4)).values() for cluster in tile]
+        assert sum(count for count, _ in clusters) == 500
+
+
+def test_incremental_writes_match_a_bulk_build():
+    pins = points(300)
+    incremental = ClusterIndex(max_zoom=5)
+    for pin_id, lat, lon, featured in pins:
+        # Land somewhere else first, so the move path is exercised too.
+        incremental.upsert(pin_id, -lat, -lon, not featured)
+        incremental.upsert(pin_id, lat, lon, featured)
+    incremental.upsert("gone", 10.0, 10.0)
+    incremental.remove("gone")
+
+    bulk = ClusterIndex.build(pins, max_zoom=5)
+    for zoom in range(4):
+        assert tiles(incremental, zoom) == tiles(bulk, zoom)
+
+
+def test_featured_pins_represent_their_cluster_first():
+    index = ClusterIndex.build(
+        [("a", 40.0, -105.0, False), ("b", 40.001, -105.001, True), ("c", 40.002, -105.002, False)]
+    )
+    [cluster] = index.tile(0, 0, 0)
+
+    assert cluster.count == 3
+    assert cluster.pin_ids == ["b", "a", "c"]
+
+
+def test_clusters_split_into_pins_above_max_zoom():
+    index = ClusterIndex.build(
+        [("a", 40.0, -105.0, False), ("b", 40.0001, -105.0001, False)], max_zoom=4
+    )
+
+    assert [cluster.count for cluster in index.within(4, -106, 39, -104, 41)] == [2]
+    assert sorted(cluster.pin_ids[0] for cluster in index.within(5, -106, 39, -104, 41)) == ["a", "b"]
+
+
+def test_boxes_across_the_antimeridian():
+    index = ClusterIndex.build(
+        [("east", 0.0, 179.5, False), ("west", 0.0, -179.5, False), ("mid", 0.0, 0.0, False)]
+    )
+    clusters = index.within(10, 179.0, -1.0, -179.0, 1.0)
+
+    found = {pin_id for cluster in clusters for pin_id in cluster.pin_ids}
+
+    assert found == {"east", "west"}
+
+
+@pytest.fixture
+def cluster_client(client):
+    # The index is built in the background at startup.
+    deadline = time.monotonic() + 5
+    while client.get("/locations/clusters/0/0/0").status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return client
+
+
+def test_tile_endpoint_follows_writes(cluster_client):
+    client = cluster_client
+
+    def create(lat, lon):
+        pin = {**PIN, "coordinates": {"latitude": lat, "longitude": lon}}
+        return client.post("/locations", json=pin).json()["id"]
+
+    ids = [create(40 + i * 0.01, -105.0) for i in range(3)]
+    create(-33.9, 151.2)
+
+    world = client.get("/locations/clusters/0/0/0")
+    assert sorted(cluster["count"] for cluster in world.json()) == [1, 3]
+    revalidated = client.get("/locations/clusters/0/0/0", headers={"if-none-match": world.headers["etag"]})
+    assert revalidated.status_code == 304
+
+    client.delete(f"/locations/{ids[0]}")
+    assert sorted(cluster["count"] for cluster in client.get("/locations/clusters/0/0/0").json()) == [1, 2]
+    assert client.get("/locations/clusters/2/4/0").status_code == 404
@@ -0,0 +1,22 @@
+from conftest import PIN
+
+
+def test_each_coding_has_its_own_etag_and_all_validate(client):
+    url = f"/locations/{client.post('/locations', json={**PIN, 'story': 'lake ' * 400}).json()['id']}"
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    variants = {coding: client.get(url, headers={"Accept-Encoding": coding}) for coding in ("zstd", "br", "gzip")}
+
+    for coding, response in variants.items():
+        assert response.headers["content-encoding"] == coding
+        assert response.headers["etag"] == plain.headers["etag"][:-1] + f'-{coding}"'
+        assert response.content == plain.content
+        # A stored copy in any coding is current while the body is.
+        assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_small_bodies_go_out_uncompressed(client):
+    url = f"/locations/{client.post('/locations', json=PIN).json()['id']}"
+    response = client.get(url, headers={"Accept-Encoding": "br"})
+
+    assert "content-encoding" not in response.headers
+    assert not response.headers["etag"].endswith('-br"')
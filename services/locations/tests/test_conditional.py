@@ -0,0 +1,46 @@
+from datetime import timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from conftest import PIN
+
+
+def test_list_validators_answer_304(client):
+    client.post("/locations", json=PIN)
+    first = client.get("/locations")
+    etag = first.headers["etag"]
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert "Accept-Encoding" in first.headers["vary"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = client.get("/locations", headers={"If-None-Match": header})
+        assert revalidated.status_code == 304, header
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+    assert client.get("/locations", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since_is_ignored_when_if_none_match_is_sent(client):
+    client.post("/locations", json=PIN)
+    last_modified = client.get("/locations").headers["last-modified"]
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(seconds=1), usegmt=True)
+
+    assert client.get("/locations", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/locations", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/locations", headers={"If-Modified-Since": "not a date"}).status_code == 200
+    both = {"If-Modified-Since": last_modified, "If-None-Match": '"other"'}
+    assert client.get("/locations", headers=both).status_code == 200
+
+
+def test_a_pins_etag_moves_with_its_version(client):
+    url = f"/locations/{client.post('/locations', json=PIN).json()['id']}"
+    before = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": before}).status_code == 304
+
+    client.put(url, json={**PIN, "title": "Lake v2"})
+    changed = client.get(url, headers={"If-None-Match": before})
+
+    assert changed.status_code == 200
+    assert changed.json()["title"] == "Lake v2"
+    assert changed.headers["etag"] != before
+    assert client.get(url, headers={"If-None-Match": changed.headers["etag"]}).status_code == 304
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from conftest import PIN
+from geo_index import GridIndex, haversine_km, radius_box
+
+
+@pytest.fixture
+def scattered():
+    """An index over random points, denser near the poles and the antimeridian, and its points."""
+    rng = random.Random(7)
+    points = {}
+    for index in range(2_000):
+        lat = rng.choice([rng.uniform(-90, 90), rng.uniform(80, 90), rng.uniform(-90, -80)])
+        lon = rng.choice([rng.uniform(-180, 180), rng.uniform(170, 180), rng.uniform(-180, -170)])
+        points[f"pin{index}"] = (lat, lon)
+    index = GridIndex(cell_degrees=2.0)
+    for pin_id, (lat, lon) in points.items():
+        index.upsert(pin_id, lat, lon)
+    return index, points
+
+
+def brute_nearest(points, lat, lon, k):
+    return sorted(points, key=lambda pin_id: haversine_km(lat, lon, *points[pin_id]))[:k]
+
+
+def test_boxes_crossing_the_antimeridian_wrap(scattered):
+    index, points = scattered
+    found = set(index.within(175.0, -10.0, -175.0, 10.0))
+
+    expected = {
+        pin_id
+        for pin_id, (lat, lon) in points.items()
+        if -10 <= lat <= 10 and (lon >= 175 or lon <= -175)
+    }
+    assert found == expected
+    assert expected
+
+
+@pytest.mark.parametrize(
+    "lat, lon",
+    [(0.0, 179.9), (0.0, -179.9), (89.9, 0.0), (-89.5, 120.0), (85.0, -179.0), (45.0, -122.0)],
+)
+def test_nearest_matches_brute_force_at_the_edges(scattered, lat, lon):
+    index, points = scattered
+    found = index.nearest(lat, lon, 15)
+
+    assert [pin_id for pin_id, _ in found] == brute_nearest(points, lat, lon, 15)
+    assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+
+def test_nearest_finds_a_pin_across_the_antimeridian():
+    index = GridIndex()
+    index.upsert("east", 0.0, 179.95)
+    index.upsert("west", 0.0, 170.0)
+
+    (pin_id, distance), _ = index.nearest(0.0, -179.95, 2)
+
+    assert pin_id == "east"
+    assert distance == pytest.approx(11.1, abs=0.1)
+
+
+def test_radius_boxes_widen_near_the_poles_and_wrap_at_the_antimeridian():
+    assert radius_box(89.9, 10.0, 50.0)[::2] == (-180.0, 180.0)
+    min_lon, _, max_lon, _ = radius_box(0.0, 179.9, 50.0)
+    assert min_lon > max_lon
+
+
+def test_updates_and_removals_move_pins(scattered):
+    index, points = scattered
+    index.upsert("pin0", 0.0, 0.0)
+    index.remove("pin1")
+
+    assert "pin0" in index.within(-0.5, -0.5, 0.5, 0.5)
+    assert "pin1" not in {pin_id for pin_id, _ in index.nearest(*points["pin1"], 5)}
+    assert len(index) == len(points) - 1
+
+
+def test_viewport_and_nearest_endpoints_use_the_index(client):
+    ids = {}
+    for title, lon in (("East", 179.5), ("West", -179.5), ("Far", 0.0)):
+        pin = {**PIN, "title": title, "coordinates": {"latitude": 10.0, "longitude": lon}}
+        ids[title] = client.post("/locations", json=pin).json()["id"]
+
+    viewport = client.get("/locations/viewport", params={"bbox": "179,0,-179,20"}).json()
+    nearest = client.get("/locations/nearest", params={"lat": 10.0, "lon": -179.9, "k": 2}).json()
+
+    assert {pin["id"] for pin in viewport} == {ids["East"], ids["West"]}
+    assert [pin["title"] for pin in nearest] == ["West", "East"]
+    assert nearest[0]["distanceKm"] < nearest[1]["distanceKm"]
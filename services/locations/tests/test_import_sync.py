@@ -0,0 +1,106 @@
+import argparse
+import json
+import sys
+import uuid
+
+import pytest
+
+import migrate_from_s3
+from conftest import PIN
+
+
+def source_pins(count):
+    return [{**PIN, "id": str(uuid.uuid4()), "title": f"P{index}"} for index in range(count)]
+
+
+def counts(inserted=0, updated=0, unchanged=0, deleted=0, invalid=0):
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "invalid": invalid,
+    }
+
+
+def test_incremental_sync_counts_only_what_changed(importer):
+    pins = source_pins(5)
+
+    assert importer(pins, incremental=True, batch_size=2) == counts(inserted=5)
+    assert importer(pins, incremental=True, batch_size=2) == counts(unchanged=5)
+    pins[1] = {**pins[1], "title": "Renamed"}
+    assert importer(pins, incremental=True, batch_size=2) == counts(updated=1, unchanged=4)
+
+
+def test_incremental_truncate_deletes_only_missing_pins(client, importer):
+    pins = source_pins(5)
+    importer(pins, incremental=True)
+    stats = importer(pins[:3], incremental=True, truncate=True, batch_size=2)
+
+    assert stats == counts(unchanged=3, deleted=2)
+    assert sorted(pin["id"] for pin in client.get("/locations").json()) == sorted(
+        pin["id"] for pin in pins[:3]
+    )
+
+
+def test_pins_edited_through_the_api_are_rewritten_by_the_next_sync(client, importer):
+    pins = source_pins(2)
+    importer(pins, incremental=True)
+    client.put(f"/locations/{pins[0]['id']}", json={**PIN, "title": "Edited"})
+
+    stats = importer(pins, incremental=True)
+
+    assert (stats["updated"], stats["unchanged"]) == (1, 1)
+    assert client.get(f"/locations/{pins[0]['id']}").json()["title"] == "P0"
+
+
+def test_sync_state_is_saved_with_the_pins(importer):
+    importer(source_pins(3), sync_state=migrate_from_s3.SyncState(source="s3://pins", etag='"e1"'))
+    state = migrate_from_s3.load_sync_state("s3://pins")
+
+    assert (state.etag, state.pin_count) == ('"e1"', 3)
+
+
+def test_unchanged_source_file_is_skipped(importer, tmp_path, monkeypatch, capsys):
+    source = tmp_path / "pins.json"
+    source.write_text(json.dumps(source_pins(2)))
+    bumps = []
+    monkeypatch.setattr(migrate_from_s3, "bump_cache_generation", lambda: bumps.append(1))
+    monkeypatch.setattr(sys, "argv", ["migrate_from_s3.py", "--file", str(source), "--incremental"])
+
+    migrate_from_s3.main()
+    migrate_from_s3.main()
+
+    output = capsys.readouterr().out
+    assert "COMMITTED: inserted=2 updated=0 unchanged=0 deleted=0" in output
+    assert "nothing to do" in output
+    assert bumps == [1]
+
+
+def test_batches_stay_under_the_postgres_parameter_limit(importer):
+    row = migrate_from_s3.prepare_row(PIN)
+
+    assert len(row) == migrate_from_s3.ROW_PARAMETERS
+    assert migrate_from_s3.MAX_BATCH_SIZE * len(row) <= 65_535
+    assert migrate_from_s3.batch_size(str(migrate_from_s3.MAX_BATCH_SIZE)) == migrate_from_s3.MAX_BATCH_SIZE
+    for too_big in (migrate_from_s3.MAX_BATCH_SIZE + 1, 0):
+        with pytest.raises(argparse.ArgumentTypeError):
+            migrate_from_s3.batch_size(str(too_big))
+        with pytest.raises(ValueError):
+            importer(source_pins(1), batch_size=too_big)
+
+
+def test_invalid_pins_are_skipped_and_counted(client, importer, capsys):
+    pins = source_pins(3)
+    importer(pins, incremental=True)
+    broken = {**pins[1], "title": "Broken", "coordinates": {"latitude": "north"}}
+    added = source_pins(1)[0]
+
+    stats = importer([pins[0], broken, added], incremental=True, truncate=True)
+
+    assert stats == counts(inserted=1, unchanged=1, deleted=1, invalid=1)
+    assert f"Warning: skipping pin {broken['id']!r}" in capsys.readouterr().out
+    # The stored version of the broken pin is kept, not deleted as missing.
+    assert client.get(f"/locations/{broken['id']}").json()["title"] == "P1"
+    assert client.get(f"/locations/{pins[2]['id']}").status_code == 404
+    assert client.get(f"/locations/{added['id']}").status_code == 200
@@ -0,0 +1,63 @@
+import uuid
+
+from conftest import PIN
+
+
+def walk(client, **params):
+    """Every page of GET /locations, following X-Next-Cursor."""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get("/locations", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+
+
+def seed(client, count):
+    titles = []
+    for index in range(count):
+        pin = {
+            **PIN,
+            "title": f"P{index}",
+            "category": "astro" if index % 2 else "city",
+            "featured": index % 3 == 0,
+            "tags": ["night", "sky"] if index % 2 else ["night"],
+        }
+        assert client.post("/locations", json=pin).status_code == 201
+        titles.append(pin["title"])
+    return titles
+
+
+def test_cursor_pages_cover_every_pin_once_newest_first(client):
+    titles = seed(client, 7)
+    pages = walk(client, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [pin["title"] for page in pages for pin in page] == titles[::-1]
+
+
+def test_pins_sharing_updated_at_are_not_skipped(client, importer):
+    ids = sorted(str(uuid.uuid4()) for _ in range(5))
+    importer([{**PIN, "id": pin_id, "updatedAt": "2024-01-01T00:00:00+00:00"} for pin_id in ids])
+    pages = walk(client, limit=2)
+
+    # Ties on updated_at fall back to id, descending.
+    assert [pin["id"] for page in pages for pin in page] == ids[::-1]
+
+
+def test_filters_and_projection_apply_to_every_page(client):
+    seed(client, 7)
+    pages = walk(client, category="astro", tags="sky,night", fields="title", limit=2)
+
+    assert [pin["title"] for page in pages for pin in page] == ["P5", "P3", "P1"]
+    assert all(set(pin) == {"id", "title"} for page in pages for pin in page)
+    featured = client.get("/locations", params={"featured": "true"}).json()
+    assert [pin["title"] for pin in featured] == ["P6", "P3", "P0"]
+
+
+def test_bad_cursor_or_field_is_rejected(client):
+    assert client.get("/locations", params={"cursor": "zzz"}).status_code == 400
+    assert client.get("/locations", params={"fields": "bad-field"}).status_code == 400
@@ -0,0 +1,97 @@
+import json
+
+from conftest import PIN
+
+MERGE = {"content-type": "application/merge-patch+json"}
+JSON_PATCH = {"content-type": "application/json-patch+json"}
+
+
+def create(client, **overrides):
+    response = client.post("/locations", json={**PIN, **overrides})
+    assert response.status_code == 201
+    return f"/locations/{response.json()['id']}"
+
+
+def patch(client, url, body, headers):
+    return client.patch(url, content=json.dumps(body), headers=headers)
+
+
+def test_merge_patch_sets_and_removes_members(client):
+    url = create(client, story="Old story", tags=["lake"])
+    response = patch(client, url, {"title": "Lake at dusk", "story": None, "featured": True}, MERGE)
+
+    assert response.status_code == 200
+    pin = response.json()
+    assert (pin["title"], pin["featured"], pin["tags"]) == ("Lake at dusk", True, ["lake"])
+    assert "story" not in pin
+    assert client.get(url).json()["title"] == "Lake at dusk"
+
+
+def test_json_patch_applies_operations_in_order(client):
+    url = create(client, tags=["lake"])
+    operations = [
+        {"op": "add", "path": "/tags/-", "value": "swim"},
+        {"op": "test", "path": "/tags/1", "value": "swim"},
+        {"op": "move", "from": "/tags/0", "path": "/tags/-"},
+    ]
+    response = patch(client, url, operations, JSON_PATCH)
+
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["swim", "lake"]
+
+
+def test_failed_test_operation_leaves_the_pin_unchanged(client):
+    url = create(client)
+    before = client.get(url)
+    response = patch(
+        client,
+        url,
+        [{"op": "replace", "path": "/title", "value": "X"}, {"op": "test", "path": "/title", "value": "Y"}],
+        JSON_PATCH,
+    )
+
+    assert response.status_code == 409
+    assert client.get(url).json() == before.json()
+
+
+def test_patches_that_break_the_schema_are_rejected(client):
+    url = create(client)
+
+    assert patch(client, url, {"title": None}, MERGE).status_code == 422
+    assert patch(client, url, [{"op": "remove", "path": "/nope/x"}], JSON_PATCH).status_code == 422
+    assert client.patch(url, json={"title": "X"}).status_code == 415
+
+
+def test_if_match_guards_against_lost_updates(client):
+    url = create(client)
+    etag = client.get(url).headers["etag"]
+
+    first = patch(client, url, {"title": "First"}, {**MERGE, "if-match": etag})
+    second = patch(client, url, {"title": "Second"}, {**MERGE, "if-match": etag})
+
+    assert first.status_code == 200
+    assert first.headers["etag"] != etag
+    assert first.headers["etag"] == client.get(url).headers["etag"]
+    assert second.status_code == 412
+    assert patch(client, url, {"title": "X"}, {**MERGE, "if-match": '"abc"'}).status_code == 412
+    assert client.get(url).json()["title"] == "First"
+
+
+def test_reimport_that_changes_a_pin_changes_its_etag(client, importer):
+    pin = {**PIN, "id": "7f3b2c4e-0000-4000-8000-000000000001", "updatedAt": "2024-01-01T00:00:00+00:00"}
+    url = f"/locations/{pin['id']}"
+    importer([pin])
+    etag = client.get(url).headers["etag"]
+
+    # Same content: the version a client holds stays valid.
+    importer([pin])
+    assert client.get(url, headers={"if-none-match": etag}).status_code == 304
+
+    # Changed content, same source updatedAt: the old ETag must stop matching.
+    importer([{**pin, "title": "Renamed"}], truncate=True)
+    fresh = client.get(url, headers={"if-none-match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()["title"] == "Renamed"
+    assert fresh.headers["etag"] != etag
+    assert patch(client, url, {"title": "X"}, {**MERGE, "if-match": etag}).status_code == 412
+    assert patch(client, url, {"title": "X"}, {**MERGE, "if-match": fresh.headers["etag"]}).status_code == 200
@@ -0,0 +1,85 @@
+import json
+import uuid
+
+import pytest
+from sqlmodel import Session, select
+
+import main
+from conftest import PIN
+
+
+def photo(photo_id, **overrides):
+    return {"id": photo_id, "src": f"https://img.test/{photo_id}.jpg", "alt": "", "title": photo_id, **overrides}
+
+
+TRIP = {"id": "t1", "title": "Spring", "story": "Rain", "visitDate": "2024-04-01", "photos": [photo("t1-a")]}
+
+
+@pytest.fixture
+def photo_rows(sync_engine):
+    """location_photos as (pin id, photo id, trip id, category, visit date), in gallery order."""
+
+    def read():
+        with Session(sync_engine) as session:
+            records = session.exec(
+                select(main.LocationPhotoRecord).order_by(
+                    main.LocationPhotoRecord.pin_id, main.LocationPhotoRecord.position
+                )
+            ).all()
+        return [
+            (str(record.pin_id), record.photo_id, record.trip_id, record.category, record.visit_date)
+            for record in records
+        ]
+
+    return read
+
+
+def test_create_flattens_pin_and_trip_photos(client, photo_rows):
+    pin = client.post(
+        "/locations",
+        json={**PIN, "visitDate": "2023-01-01", "photos": [photo("a", category="night")], "trips": [TRIP]},
+    ).json()
+
+    assert photo_rows() == [
+        (pin["id"], "a", None, "night", "2023-01-01"),
+        (pin["id"], "t1-a", "t1", "water", "2024-04-01"),
+    ]
+
+
+def test_update_and_patch_replace_a_pins_rows(client, photo_rows):
+    pin_id = client.post("/locations", json={**PIN, "photos": [photo("a"), photo("b")]}).json()["id"]
+    client.put(f"/locations/{pin_id}", json={**PIN, "photos": [photo("b")], "trips": [TRIP]})
+    assert [row[1] for row in photo_rows()] == ["b", "t1-a"]
+
+    client.patch(
+        f"/locations/{pin_id}",
+        content=json.dumps([{"op": "add", "path": "/trips/0/photos/-", "value": photo("t1-b")}]),
+        headers={"content-type": "application/json-patch+json"},
+    )
+    assert [row[1] for row in photo_rows()] == ["b", "t1-a", "t1-b"]
+
+    client.patch(
+        f"/locations/{pin_id}",
+        content=json.dumps({"photos": None}),
+        headers={"content-type": "application/merge-patch+json"},
+    )
+    assert [row[1] for row in photo_rows()] == ["t1-a", "t1-b"]
+
+
+def test_delete_drops_a_pins_rows(client, photo_rows):
+    kept = client.post("/locations", json={**PIN, "photos": [photo("a")]}).json()["id"]
+    removed = client.post("/locations", json={**PIN, "photos": [photo("b")]}).json()["id"]
+    client.delete(f"/locations/{removed}")
+
+    assert photo_rows() == [(kept, "a", None, "water", None)]
+
+
+def test_imports_replace_changed_pins_rows_and_drop_missing_pins(client, importer, photo_rows):
+    pins = [{**PIN, "id": str(uuid.uuid4()), "title": f"P{n}", "photos": [photo(f"p{n}")]} for n in range(3)]
+    importer(pins)
+    assert sorted(row[1] for row in photo_rows()) == ["p0", "p1", "p2"]
+
+    pins[0] = {**pins[0], "photos": [photo("p0-new")]}
+    importer(pins[:2], incremental=True, truncate=True, batch_size=1)
+
+    assert sorted(row[1] for row in photo_rows()) == ["p0-new", "p1"]
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+import main
+import search_index
+from conftest import PIN
+from search_index import SearchIndex
+
+WORDS = [f"w{rank}" for rank in range(60)]
+TAGS = ["hike", "water", "urban", "night"]
+
+
+def corpus(count, seed=11):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+    index = SearchIndex()
+    for number in range(count):
+        index.upsert(
+            f"pin{number}",
+            {
+                "title": " ".join(rng.choices(WORDS, weights, k=2)),
+                "description": " ".join(rng.choices(WORDS, weights, k=8)),
+                "tags": rng.sample(TAGS, 2),
+                # Distinct, so ties on score have one right order.
+                "updatedAt": f"2024-01-01T00:00:00.{number:06d}",
+            },
+        )
+    return index
+
+
+@pytest.mark.parametrize("query,tags", [("w0", ()), ("w0 w1", ()), ("w1 -w0", ()), ("w2", ("hike",))])
+def test_threshold_walk_returns_the_exhaustive_top_k(query, tags, monkeypatch):
+    index = corpus(3000)
+    monkeypatch.setattr(search_index, "RANK_ALL_BELOW", 10**9)
+    exhaustive = index.search(query, tags, 20)
+    monkeypatch.setattr(search_index, "RANK_ALL_BELOW", 0)
+    walked = index.search(query, tags, 20)
+
+    assert len(walked) == 20
+    assert [score for _, score in walked] == pytest.approx([score for _, score in exhaustive])
+    assert {pin_id for pin_id, _ in walked} == {pin_id for pin_id, _ in exhaustive}
+
+
+def test_fields_are_weighted_and_terms_combined():
+    index = SearchIndex()
+    index.upsert("title", {"title": "Lake"})
+    index.upsert("photo", {"title": "Pond", "photos": [{"alt": "lake at dawn"}]})
+    index.upsert("both", {"title": "Lake view", "description": "A bridge"})
+
+    assert [pin_id for pin_id, _ in index.search("lake")][0] == "title"
+    assert [pin_id for pin_id, _ in index.search("lake")][-1] == "photo"
+    assert [pin_id for pin_id, _ in index.search("lake bridge")] == ["both"]
+    assert [pin_id for pin_id, _ in index.search("lake -bridge")] == ["title", "photo"]
+    assert index.search("-lake") == []
+
+
+def test_rewrites_and_removals_update_the_index():
+    index = SearchIndex()
+    index.upsert("a", {"title": "Lake", "tags": ["water"]})
+    index.upsert("a", {"title": "Pond", "tags": ["hike"]})
+
+    assert index.search("lake") == []
+    assert [pin_id for pin_id, _ in index.search(None, ("hike",))] == ["a"]
+    index.remove("a")
+    assert index.search("pond") == [] and index.search(None, ("hike",)) == []
+    assert len(index) == 0 and not index.postings and not index.tag_postings
+
+
+def titles(response):
+    assert response.status_code == 200
+    return [pin["title"] for pin in response.json()]
+
+
+def test_search_endpoint_on_sqlite_follows_writes(client):
+    assert main.memory_search_index is not None
+
+    def create(title, description, tags):
+        pin = {**PIN, "title": title, "description": description, "tags": tags}
+        return client.post("/locations", json=pin).json()["id"]
+
+    mountain = create("Mountain lake", "Quiet alpine water", ["hike", "water"])
+    bridge = create("City bridge", "A lake view from the bridge", ["urban"])
+
+    assert titles(client.get("/locations/search", params={"q": "lake"})) == ["Mountain lake", "City bridge"]
+    assert titles(client.get("/locations/search", params={"q": "lake", "tags": "urban"})) == ["City bridge"]
+    assert all("score" in pin for pin in client.get("/locations/search", params={"q": "lake"}).json())
+
+    client.put(f"/locations/{mountain}", json={**PIN, "title": "Mountain pond", "description": "Still"})
+    client.delete(f"/locations/{bridge}")
+    assert titles(client.get("/locations/search", params={"q": "lake"})) == []
+    assert titles(client.get("/locations/search", params={"q": "pond"})) == ["Mountain pond"]
@@ -0,0 +1,36 @@
+import fakeredis
+from sqlalchemy import text
+
+from conftest import PIN
+
+
+def test_unchanged_table_is_not_rebuilt(client, snapshot_job):
+    client.post("/locations", json=PIN)
+
+    assert snapshot_job().status == "built"
+    assert snapshot_job().status == "unchanged"
+
+
+def test_new_generation_alone_only_restamps(client, snapshot_job, redis_server):
+    client.post("/locations", json=PIN)
+    snapshot_job()
+    fakeredis.FakeRedis(server=redis_server).incr("locations:generation")
+
+    assert snapshot_job().status == "restamped"
+
+
+def test_content_change_without_newer_updated_at_rebuilds(client, snapshot_job, sync_engine):
+    older = client.post("/locations", json={**PIN, "title": "Older"}).json()
+    client.post("/locations", json={**PIN, "title": "Newer"})
+    snapshot_job()
+
+    # What an import does to a pin whose source kept its updatedAt: new content
+    # and source hash, same updated_at, same row count.
+    with sync_engine.begin() as connection:
+        result = connection.execute(
+            text("UPDATE location_pins SET source_hash = 'changed' WHERE id = :id"),
+            {"id": older["id"].replace("-", "")},
+        )
+    assert result.rowcount == 1
+
+    assert snapshot_job().status == "built"
@@ -0,0 +1,112 @@
+"""Benchmark notification dispatch throughput (messages/second) per channel.
+
+Runs the dispatcher in-process against the fake provider, which sleeps
+``--call-latency`` per provider call plus ``--per-message`` per notification.
+Each channel is measured twice:
+
+- ``inline``: one worker and one provider call per message, which is what
+  delivering inside the request handler amounts to;
+- ``pipeline``: the channel's configured worker pool and batch size
+  (``NOTIFY_<CHANNEL>_*`` overrides apply).
+
+Rate limits are lifted unless ``--rate-limited`` is given, so the numbers show
+capacity rather than the configured ceiling. ``--http`` also times how fast
+``POST /send`` accepts messages::
+
+    python bench_dispatch.py --messages 5000 --call-latency 0.02 --http
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+import main
+from dispatch import BatchOutcome, ChannelConfig, Dispatcher
+from providers import FakeProvider, Notification
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5_000, help="Messages sent per channel and mode")
+    parser.add_argument("--channels", nargs="+", default=list(main.CHANNELS))
+    parser.add_argument("--call-latency", type=float, default=0.02, help="Fake provider seconds per call")
+    parser.add_argument("--per-message", type=float, default=0.0005, help="Fake provider seconds per message")
+    parser.add_argument("--rate-limited", action="store_true", help="Keep the configured rate limits")
+    parser.add_argument("--http", action="store_true", help="Also time POST /send acceptance")
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight POST /send requests")
+    return parser.parse_args()
+
+
+async def run_channel(
+    channel: str, config: ChannelConfig, provider: FakeProvider, messages: int
+) -> tuple[float, list[float]]:
+    lags: list[float] = []
+
+    def on_batch(outcome: BatchOutcome) -> None:
+        now = datetime.now(timezone.utc)
+        lags.extend((now - item.queued_at).total_seconds() for item in outcome.delivered)
+
+    dispatcher = Dispatcher({channel: config._replace(queue_size=messages)}, provider, on_batch)
+    started = time.perf_counter()
+    for index in range(messages):
+        dispatcher.submit(
+            Notification(f"{channel}-{index}", channel, "bench@example.com", "hi", datetime.now(timezone.utc))
+        )
+    dispatcher.start()
+    await dispatcher.channels[channel].queue.join()
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop(0)
+    return messages / elapsed, lags
+
+
+async def bench_http(channel: str, messages: int, concurrency: int) -> float:
+    import httpx  # only needed for --http; not a service dependency
+
+    main.dispatcher.start()
+    transport = httpx.ASGITransport(app=main.app)
+    payload = {"channel": channel, "recipient": "bench@example.com", "message": "hi"}
+    remaining = iter(range(messages))
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for _ in remaining:
+            response = await client.post("/send", json=payload)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://notifications") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    await main.dispatcher.stop(60)
+    return messages / elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    provider = FakeProvider(call_latency_seconds=args.call_latency, per_message_seconds=args.per_message)
+    print(f"{'channel':<8} {'mode':<9} {'workers':>7} {'batch':>6} {'msgs/s':>10} {'p50 lag':>9} {'p99 lag':>9}")
+    for channel in args.channels:
+        configured = main.CHANNEL_CONFIGS[channel]
+        if not args.rate_limited:
+            configured = configured._replace(rate_per_second=0.0)
+        inline = configured._replace(workers=1, batch_size=1, batch_wait_seconds=0.0)
+        for mode, config in (("inline", inline), ("pipeline", configured)):
+            # Inline delivery is slow; a sample is enough to get its rate.
+            messages = min(args.messages, 200) if mode == "inline" else args.messages
+            rate, lags = await run_channel(channel, config, provider, messages)
+            quantiles = statistics.quantiles(lags, n=100)
+            print(
+                f"{channel:<8} {mode:<9} {config.workers:>7} {config.batch_size:>6} {rate:>10,.0f} "
+                f"{quantiles[49]:>8.2f}s {quantiles[98]:>8.2f}s"
+            )
+    if args.http:
+        print()
+        for channel in args.channels:
+            rate = await bench_http(channel, args.messages, args.concurrency)
+            print(f"POST /send {channel:<6} accepted {rate:>10,.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
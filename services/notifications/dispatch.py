@@ -0,0 +1,200 @@
+"""Asynchronous per-channel dispatch: bounded queues, batching workers, rate limits.
+
+``POST /send`` only enqueues. Each channel (email, sms, push) has its own
+bounded ``asyncio.Queue`` and worker pool, so a slow SMS provider cannot hold
+up push delivery. A worker takes whatever is queued, up to ``batch_size``,
+waiting at most ``batch_wait_seconds`` to fill a batch. It then waits for the
+channel's token bucket and hands the batch to the provider in one call.
+Failed messages go back on the queue until ``max_attempts``.
+
+Queues live in process memory: anything still queued when a pod dies is lost.
+Shutdown drains the queues for up to ``drain_seconds`` first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Callable, NamedTuple
+
+from providers import DeliveryResult, Notification, Provider
+
+logger = logging.getLogger("notifications-service")
+
+
+class ChannelConfig(NamedTuple):
+    workers: int
+    batch_size: int
+    batch_wait_seconds: float
+    # Messages per second across the channel's workers; 0 disables the limit.
+    rate_per_second: float
+    queue_size: int
+    max_attempts: int
+
+
+class BatchOutcome(NamedTuple):
+    channel: str
+    size: int
+    seconds: float
+    delivered: list[Notification]
+    failed: list[tuple[Notification, DeliveryResult]]
+    retried: int
+
+
+class RateLimiter:
+    """Token bucket shared by a channel's workers; a batch takes one token per message."""
+
+    def __init__(self, rate_per_second: float, burst: float) -> None:
+        self.rate = rate_per_second
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, count: int) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                await asyncio.sleep((count - self.tokens) / self.rate)
+
+
+class ChannelDispatcher:
+    def __init__(
+        self,
+        channel: str,
+        config: ChannelConfig,
+        provider: Provider,
+        on_batch: Callable[[BatchOutcome], None],
+    ) -> None:
+        self.channel = channel
+        self.config = config
+        self.provider = provider
+        self.on_batch = on_batch
+        self.queue: asyncio.Queue[Notification] = asyncio.Queue(maxsize=config.queue_size)
+        # A batch never needs more tokens than the bucket can hold.
+        self.limiter = RateLimiter(
+            config.rate_per_second, max(config.rate_per_second, config.batch_size)
+        )
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"notify-{self.channel}-{index}")
+            for index in range(self.config.workers)
+        ]
+
+    async def stop(self, drain_seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            if self.queue.qsize():
+                logger.warning(
+                    "Dropping %d queued %s notifications at shutdown", self.queue.qsize(), self.channel
+                )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, notification: Notification) -> bool:
+        """Enqueue without waiting; False when the queue is full."""
+        try:
+            self.queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _next_batch(self) -> list[Notification]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.config.batch_wait_seconds
+        while len(batch) < self.config.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send(self, batch: list[Notification]) -> BatchOutcome:
+        await self.limiter.acquire(len(batch))
+        started = time.perf_counter()
+        try:
+            results = await self.provider.send_batch(self.channel, batch)
+        except Exception as exc:  # noqa: BLE001 - a provider outage fails the batch, not the worker
+            logger.warning("%s provider call failed for %s: %s", self.provider.name, self.channel, exc)
+            results = [DeliveryResult(item.id, False, str(exc)) for item in batch]
+        seconds = time.perf_counter() - started
+
+        by_id = {result.id: result for result in results}
+        delivered: list[Notification] = []
+        failed: list[tuple[Notification, DeliveryResult]] = []
+        retried = 0
+        for item in batch:
+            result = by_id.get(item.id) or DeliveryResult(item.id, False, "no result from provider")
+            if result.delivered:
+                delivered.append(item)
+            elif item.attempts + 1 < self.config.max_attempts and self.submit(
+                item._replace(attempts=item.attempts + 1)
+            ):
+                retried += 1
+            else:
+                failed.append((item, result))
+        return BatchOutcome(self.channel, len(batch), seconds, delivered, failed, retried)
+
+    async def _work(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                self.on_batch(await self._send(batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - keep the worker alive
+                logger.exception("Dispatching a %s batch failed", self.channel)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class Dispatcher:
+    """One ChannelDispatcher per channel, started and drained with the app."""
+
+    def __init__(
+        self,
+        configs: dict[str, ChannelConfig],
+        provider: Provider,
+        on_batch: Callable[[BatchOutcome], None],
+    ) -> None:
+        self.channels = {
+            channel: ChannelDispatcher(channel, config, provider, on_batch)
+            for channel, config in configs.items()
+        }
+
+    def start(self) -> None:
+        for dispatcher in self.channels.values():
+            dispatcher.start()
+
+    async def stop(self, drain_seconds: float) -> None:
+        await asyncio.gather(
+            *(dispatcher.stop(drain_seconds) for dispatcher in self.channels.values())
+        )
+
+    def submit(self, notification: Notification) -> bool:
+        return self.channels[notification.channel].submit(notification)
+
+    def depth(self, channel: str) -> int:
+        return self.channels[channel].queue.qsize()
@@ -2,18 +2,81 @@
 
 from __future__ import annotations
 
-from collections import Counter as StatsCounter
+import asyncio
+import logging
+import os
 from datetime import datetime, timezone
 from typing import Literal
 from uuid import uuid4
 
-from fastapi import FastAPI
-from prometheus_client import Counter, CONTENT_TYPE_LATEST, generate_latest
+import redis.asyncio as redis
+from fastapi import FastAPI, HTTPException, status
+from prometheus_client import Counter, CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
 from prometheus_fastapi_instrumentator import Instrumentator
 from pydantic import BaseModel, Field
 from fastapi.responses import Response
 import uvicorn
 
+from dispatch import BatchOutcome, ChannelConfig, Dispatcher
+from providers import Notification, build_provider
+from stats import StatsRecorder
+
+CHANNELS = ("email", "sms", "push")
+NOTIFY_PROVIDER = os.environ.get("NOTIFY_PROVIDER", "fake")
+NOTIFY_DRAIN_SECONDS = float(os.environ.get("NOTIFY_DRAIN_SECONDS", "10"))
+NOTIFY_STATS_FLUSH_SECONDS = float(os.environ.get("NOTIFY_STATS_FLUSH_SECONDS", "1"))
+NOTIFY_STATS_ROLLUP_SECONDS = float(os.environ.get("NOTIFY_STATS_ROLLUP_SECONDS", "5"))
+
+DEFAULT_REDIS_HOST = "redis.sandbox-app.svc.cluster.local"
+REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", "")
+DEFAULT_REDIS_URL = (
+    f"redis://:{REDIS_PASSWORD}@{DEFAULT_REDIS_HOST}:6379/0"
+    if REDIS_PASSWORD
+    else f"redis://{DEFAULT_REDIS_HOST}:6379/0"
+)
+# Empty keeps /stats per pod.
+REDIS_URL = os.environ.get("REDIS_URL", DEFAULT_REDIS_URL)
+DEFAULT_CHANNEL_CONFIGS = {
+    "email": ChannelConfig(
+        workers=4,
+        batch_size=50,
+        batch_wait_seconds=0.05,
+        rate_per_second=500.0,
+        queue_size=10_000,
+        max_attempts=3,
+    ),
+    "sms": ChannelConfig(
+        workers=2,
+        batch_size=20,
+        batch_wait_seconds=0.05,
+        rate_per_second=100.0,
+        queue_size=10_000,
+        max_attempts=3,
+    ),
+    "push": ChannelConfig(
+        workers=8,
+        batch_size=100,
+        batch_wait_seconds=0.02,
+        rate_per_second=2_000.0,
+        queue_size=20_000,
+        max_attempts=3,
+    ),
+}
+
+
+def _channel_config(channel: str) -> ChannelConfig:
+    """Apply NOTIFY_<CHANNEL>_<FIELD> overrides, e.g. NOTIFY_SMS_RATE_PER_SECOND=20."""
+    defaults = DEFAULT_CHANNEL_CONFIGS[channel]
+    overrides = {}
+    for field, default in defaults._asdict().items():
+        value = os.environ.get(f"NOTIFY_{channel.upper()}_{field.upper()}")
+        if value is not None:
+            overrides[field] = type(default)(value)
+    return defaults._replace(**overrides)
+
+
+CHANNEL_CONFIGS = {channel: _channel_config(channel) for channel in CHANNELS}
+
 app = FastAPI(title="Notifications API", version="0.1.0")
 
 # Expose /metrics immediately so scrapes do not depend on startup timing.
@@ -38,20 +101,141 @@ class NotificationResponse(BaseModel):
     recipient: str
     message: str
     status: Literal["queued", "sent"]
-    sent_at: datetime
+    queued_at: datetime
+    sent_at: datetime | None = None
 
 
 class StatsResponse(BaseModel):
+    # "cluster" when read from the Redis rollup, "pod" for this process only.
+    scope: Literal["cluster", "pod"]
+    as_of: datetime
     total_sent: int
     by_channel: dict[str, int]
+    failed_by_channel: dict[str, int] = Field(default_factory=dict)
+    rejected_by_channel: dict[str, int] = Field(default_factory=dict)
+    # This pod's queues; they are not shared.
+    queued_by_channel: dict[str, int] = Field(default_factory=dict)
+    # "1m", "1h", "24h" -> event (sent, failed, retried, rejected) -> channel -> count
+    windows: dict[str, dict[str, dict[str, int]]] = Field(default_factory=dict)
 
 
-stats = StatsCounter()
+logger = logging.getLogger("notifications-service")
+stats = StatsRecorder()
+redis_client: redis.Redis | None = None
+_stats_task: asyncio.Task | None = None
 NOTIFICATIONS_SENT = Counter(
     "notifications_sent_total",
-    "Total notifications processed by channel",
+    "Total notifications delivered by channel",
+    labelnames=("channel",),
+)
+NOTIFICATIONS_FAILED = Counter(
+    "notifications_failed_total",
+    "Notifications given up on after NOTIFY_<CHANNEL>_MAX_ATTEMPTS by channel",
     labelnames=("channel",),
 )
+NOTIFICATIONS_RETRIED = Counter(
+    "notifications_retried_total",
+    "Failed deliveries put back on the queue by channel",
+    labelnames=("channel",),
+)
+NOTIFICATIONS_REJECTED = Counter(
+    "notifications_rejected_total",
+    "Sends refused with 503 because the channel queue was full",
+    labelnames=("channel",),
+)
+QUEUE_DEPTH = Gauge(
+    "notifications_queue_depth", "Notifications waiting in each channel queue", labelnames=("channel",)
+)
+BATCH_SIZE = Histogram(
+    "notifications_batch_size",
+    "Notifications per provider call by channel",
+    labelnames=("channel",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+PROVIDER_SECONDS = Histogram(
+    "notifications_provider_call_seconds",
+    "Provider call latency per batch by channel",
+    labelnames=("channel",),
+)
+DELIVERY_LAG = Histogram(
+    "notifications_delivery_lag_seconds",
+    "Time from POST /send to delivery by channel",
+    labelnames=("channel",),
+)
+STATS_FLUSHES = Counter(
+    "notifications_stats_flushes_total",
+    "Flushes of buffered /stats counts to Redis by outcome (ok, error)",
+    labelnames=("outcome",),
+)
+STATS_PENDING = Gauge(
+    "notifications_stats_pending", "Counts buffered in this pod and not yet flushed to Redis"
+)
+STATS_PENDING.set_function(lambda: sum(stats.pending.values()))
+
+
+def record_batch(outcome: BatchOutcome) -> None:
+    """Fold one provider call into the stats and metrics."""
+    channel = outcome.channel
+    BATCH_SIZE.labels(channel).observe(outcome.size)
+    PROVIDER_SECONDS.labels(channel).observe(outcome.seconds)
+    NOTIFICATIONS_RETRIED.labels(channel).inc(outcome.retried)
+    stats.add("retried", channel, outcome.retried)
+    if outcome.delivered:
+        stats.add("sent", channel, len(outcome.delivered))
+        NOTIFICATIONS_SENT.labels(channel=channel).inc(len(outcome.delivered))
+        now = datetime.now(timezone.utc)
+        for notification in outcome.delivered:
+            DELIVERY_LAG.labels(channel).observe((now - notification.queued_at).total_seconds())
+    if outcome.failed:
+        stats.add("failed", channel, len(outcome.failed))
+        NOTIFICATIONS_FAILED.labels(channel).inc(len(outcome.failed))
+
+
+dispatcher = Dispatcher(CHANNEL_CONFIGS, build_provider(NOTIFY_PROVIDER), record_batch)
+for _channel in CHANNELS:
+    QUEUE_DEPTH.labels(_channel).set_function(lambda channel=_channel: dispatcher.depth(channel))
+
+
+async def flush_stats() -> None:
+    """Flush buffered counts to Redis and take turns recomputing the cluster rollup."""
+    next_rollup = 0.0
+    while redis_client is not None:
+        await asyncio.sleep(NOTIFY_STATS_FLUSH_SECONDS)
+        stats.prune()
+        try:
+            await stats.flush(redis_client)
+            STATS_FLUSHES.labels("ok").inc()
+            if stats.clock() >= next_rollup:
+                next_rollup = stats.clock() + NOTIFY_STATS_ROLLUP_SECONDS
+                await stats.publish_rollup(redis_client, NOTIFY_STATS_ROLLUP_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001 - counts stay buffered until Redis is back
+            STATS_FLUSHES.labels("error").inc()
+            logger.warning("Could not flush notification stats to Redis: %s", exc)
+
+
+@app.on_event("startup")
+async def start_dispatch() -> None:
+    global redis_client, _stats_task
+    dispatcher.start()
+    if REDIS_URL:
+        redis_client = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+        _stats_task = asyncio.create_task(flush_stats())
+
+
+@app.on_event("shutdown")
+async def drain_dispatch() -> None:
+    await dispatcher.stop(NOTIFY_DRAIN_SECONDS)
+    if _stats_task is not None:
+        _stats_task.cancel()
+    if redis_client is not None:
+        # Counts from the drain would otherwise be lost with the pod.
+        try:
+            await stats.flush(redis_client)
+        except Exception as exc:  # noqa: BLE001 - shutting down either way
+            logger.warning("Dropping %d unflushed stats counts: %s", sum(stats.pending.values()), exc)
+        await redis_client.aclose()
 
 
 @app.get("/healthz", response_model=HealthResponse)
@@ -60,31 +244,55 @@ def healthz() -> HealthResponse:
     return HealthResponse()
 
 
-@app.post("/send", response_model=NotificationResponse)
-def send_notification(payload: NotificationRequest) -> NotificationResponse:
-    """Simulate dispatching a notification and keep track of aggregates."""
+@app.post("/send", response_model=NotificationResponse, status_code=status.HTTP_202_ACCEPTED)
+async def send_notification(payload: NotificationRequest) -> NotificationResponse:
+    """Queue a notification for its channel's workers and return immediately."""
 
-    stats["total"] += 1
-    stats[payload.channel] += 1
-    NOTIFICATIONS_SENT.labels(channel=payload.channel).inc()
-
-    return NotificationResponse(
+    notification = Notification(
         id=str(uuid4()),
         channel=payload.channel,
         recipient=payload.recipient,
         message=payload.message,
-        status="sent",
-        sent_at=datetime.now(timezone.utc),
+        queued_at=datetime.now(timezone.utc),
+    )
+    if not dispatcher.submit(notification):
+        NOTIFICATIONS_REJECTED.labels(payload.channel).inc()
+        stats.add("rejected", payload.channel)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The {payload.channel} queue is full",
+            headers={"Retry-After": "1"},
+        )
+
+    return NotificationResponse(
+        id=notification.id,
+        channel=notification.channel,
+        recipient=notification.recipient,
+        message=notification.message,
+        status="queued",
+        queued_at=notification.queued_at,
     )
 
 
 @app.get("/stats", response_model=StatsResponse)
-def get_stats() -> StatsResponse:
-    """Return aggregate counts for demos/tests."""
+async def get_stats() -> StatsResponse:
+    """Return cluster-wide counts and rolling windows from the precomputed rollup.
+
+    Falls back to this pod's own counts when Redis is unavailable or no
+    rollup exists yet.
+    """
 
+    rollup = None
+    if redis_client is not None:
+        try:
+            rollup = await stats.read_rollup(redis_client)
+        except Exception as exc:  # noqa: BLE001 - serve this pod's view instead
+            logger.warning("Could not read the stats rollup: %s", exc)
+    if rollup is None:
+        rollup = stats.local_rollup()
     return StatsResponse(
-        total_sent=stats.get("total", 0),
-        by_channel={k: v for k, v in stats.items() if k != "total"},
+        **rollup,
+        queued_by_channel={channel: dispatcher.depth(channel) for channel in CHANNELS},
     )
 
 
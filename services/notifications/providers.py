@@ -0,0 +1,83 @@
+"""Delivery providers behind the dispatch workers.
+
+A provider takes a batch of notifications for one channel and reports which
+ones were delivered. Real integrations (SES, Twilio, FCM, ...) plug in by
+implementing ``Provider`` and registering a factory in ``PROVIDERS``; the
+sandbox ships a fake that only simulates latency and failures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from datetime import datetime
+from typing import Callable, NamedTuple, Protocol
+
+
+class Notification(NamedTuple):
+    id: str
+    channel: str
+    recipient: str
+    message: str
+    queued_at: datetime
+    attempts: int = 0
+
+
+class DeliveryResult(NamedTuple):
+    id: str
+    delivered: bool
+    error: str | None = None
+
+
+class Provider(Protocol):
+    name: str
+
+    async def send_batch(self, channel: str, batch: list[Notification]) -> list[DeliveryResult]:
+        """Deliver ``batch`` and return one result per notification."""
+        ...
+
+
+class FakeProvider:
+    """Sleeps like a remote API would: a fixed cost per call plus a cost per message."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        call_latency_seconds: float = 0.02,
+        per_message_seconds: float = 0.0005,
+        failure_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.call_latency_seconds = call_latency_seconds
+        self.per_message_seconds = per_message_seconds
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    async def send_batch(self, channel: str, batch: list[Notification]) -> list[DeliveryResult]:
+        await asyncio.sleep(self.call_latency_seconds + self.per_message_seconds * len(batch))
+        return [
+            DeliveryResult(item.id, False, "simulated provider failure")
+            if self._random.random() < self.failure_rate
+            else DeliveryResult(item.id, True)
+            for item in batch
+        ]
+
+
+def fake_provider_from_env() -> FakeProvider:
+    return FakeProvider(
+        call_latency_seconds=float(os.environ.get("FAKE_PROVIDER_CALL_LATENCY_SECONDS", "0.02")),
+        per_message_seconds=float(os.environ.get("FAKE_PROVIDER_PER_MESSAGE_SECONDS", "0.0005")),
+        failure_rate=float(os.environ.get("FAKE_PROVIDER_FAILURE_RATE", "0")),
+    )
+
+
+PROVIDERS: dict[str, Callable[[], Provider]] = {"fake": fake_provider_from_env}
+
+
+def build_provider(name: str) -> Provider:
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown notification provider {name!r}") from None
@@ -0,0 +1,181 @@
+"""Cluster-wide notification counts with rolling 1m/1h/24h windows, kept in Redis.
+
+Handlers and dispatch workers only bump counters in this process
+(``StatsRecorder.add``), with no awaits and no locks, since everything runs on
+the event loop. A background task flushes them every few seconds in one
+MULTI of HINCRBYs:
+
+- ``notifications:stats:totals``: all-time counts;
+- ``notifications:stats:<bucket seconds>:<bucket start>``: counts per time
+  bucket at three resolutions (10s, 1m, 1h), expiring once no window needs them.
+
+Fields are ``<event>:<channel>`` for the events sent, failed, retried and
+rejected.
+
+On a fixed interval one replica (whichever sets the short-lived turn key
+first) sums the buckets into ``notifications:stats:rollup``, and GET /stats
+returns that document as it is. The rollup expires after a few intervals, so
+if every replica stops publishing, /stats stops serving frozen totals. Windows are bucket-aligned: "1m" is the
+current 10s bucket plus the five before it, "1h" is 60 one-minute buckets,
+and "24h" is 24 one-hour buckets.
+
+Without Redis, or with no current rollup, the same rollup is built from
+this process's own counts and marked ``scope: "pod"``.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Mapping, NamedTuple, Optional
+
+EVENTS = ("sent", "failed", "retried", "rejected")
+KEY_PREFIX = "notifications:stats"
+TOTALS_KEY = f"{KEY_PREFIX}:totals"
+ROLLUP_KEY = f"{KEY_PREFIX}:rollup"
+ROLLUP_TURN_KEY = f"{KEY_PREFIX}:rollup-turn"
+# Rollup intervals a published rollup outlives; missing one publish is fine.
+ROLLUP_TTL_INTERVALS = 3
+
+
+class Window(NamedTuple):
+    name: str
+    seconds: int
+    bucket_seconds: int
+
+    def starts(self, now: float) -> list[int]:
+        """Starts of the buckets the window covers at ``now``, newest first."""
+        current = self.start(now)
+        count = self.seconds // self.bucket_seconds
+        return [current - index * self.bucket_seconds for index in range(count)]
+
+    def start(self, moment: float) -> int:
+        return int(moment) // self.bucket_seconds * self.bucket_seconds
+
+    def key(self, start: int) -> str:
+        return f"{KEY_PREFIX}:{self.bucket_seconds}:{start}"
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.seconds + self.bucket_seconds
+
+
+WINDOWS = (Window("1m", 60, 10), Window("1h", 3_600, 60), Window("24h", 86_400, 3_600))
+FINEST = WINDOWS[0]
+
+
+def build_rollup(
+    totals: Mapping[str, Any], windows: Mapping[str, Mapping[str, Any]], as_of: float, scope: str
+) -> dict[str, Any]:
+    """Group ``<event>:<channel>`` counts into the document GET /stats returns."""
+
+    def by_event(counts: Mapping[str, Any]) -> dict[str, dict[str, int]]:
+        grouped: dict[str, dict[str, int]] = {event: {} for event in EVENTS}
+        for field, count in counts.items():
+            event, _, channel = field.partition(":")
+            if event in grouped and int(count):
+                grouped[event][channel] = grouped[event].get(channel, 0) + int(count)
+        return grouped
+
+    overall = by_event(totals)
+    return {
+        "scope": scope,
+        "as_of": datetime.fromtimestamp(as_of, timezone.utc).isoformat(),
+        "total_sent": sum(overall["sent"].values()),
+        "by_channel": overall["sent"],
+        "failed_by_channel": overall["failed"],
+        "rejected_by_channel": overall["rejected"],
+        "windows": {name: by_event(counts) for name, counts in windows.items()},
+    }
+
+
+class StatsRecorder:
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        # (field, start of its 10s bucket) -> count not yet flushed to Redis
+        self.pending: Counter = Counter()
+        # This process's own counts, for the pod-scope fallback.
+        self.totals: Counter = Counter()
+        self.buckets: dict[tuple[Window, int], Counter] = {}
+
+    def add(self, event: str, channel: str, count: int = 1) -> None:
+        if count <= 0:
+            return
+        now = self.clock()
+        field = f"{event}:{channel}"
+        self.pending[field, FINEST.start(now)] += count
+        self.totals[field] += count
+        for window in WINDOWS:
+            self.buckets.setdefault((window, window.start(now)), Counter())[field] += count
+
+    def prune(self) -> None:
+        """Forget local buckets that no window covers any more."""
+        now = self.clock()
+        for window, start in [key for key in self.buckets if key[1] + key[0].ttl_seconds < now]:
+            del self.buckets[window, start]
+
+    def local_rollup(self) -> dict[str, Any]:
+        now = self.clock()
+        windows = {}
+        for window in WINDOWS:
+            counts: Counter = Counter()
+            for start in window.starts(now):
+                counts.update(self.buckets.get((window, start), {}))
+            windows[window.name] = counts
+        return build_rollup(self.totals, windows, now, "pod")
+
+    async def flush(self, client: Any) -> int:
+        """Write pending counts to Redis in one MULTI; returns how many were written.
+
+        On failure the counts go back into the buffer for the next flush. The
+        MULTI applies all or nothing, so a failed flush leaves no partial counts.
+        """
+        pending, self.pending = self.pending, Counter()
+        if not pending:
+            return 0
+        increments: Counter = Counter()
+        for (field, start), count in pending.items():
+            increments[TOTALS_KEY, field] += count
+            for window in WINDOWS:
+                increments[window.key(window.start(start)), field] += count
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                for (key, field), count in increments.items():
+                    pipe.hincrby(key, field, count)
+                for window in WINDOWS:
+                    for key in {window.key(window.start(start)) for _, start in pending}:
+                        pipe.expire(key, window.ttl_seconds)
+                await pipe.execute()
+        except BaseException:
+            self.pending.update(pending)
+            raise
+        return sum(pending.values())
+
+    async def publish_rollup(self, client: Any, interval_seconds: float) -> bool:
+        """Recompute the cluster rollup if no other replica has this interval's turn."""
+        turn_ms = max(1, int(interval_seconds * 1000))
+        if not await client.set(ROLLUP_TURN_KEY, "1", nx=True, px=turn_ms):
+            return False
+        now = self.clock()
+        plan = [(window.name, window.key(start)) for window in WINDOWS for start in window.starts(now)]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(TOTALS_KEY)
+            for _, key in plan:
+                pipe.hgetall(key)
+            totals, *buckets = await pipe.execute()
+        windows: dict[str, Counter] = {window.name: Counter() for window in WINDOWS}
+        for (name, _), counts in zip(plan, buckets):
+            windows[name].update({field: int(count) for field, count in counts.items()})
+        await client.set(
+            ROLLUP_KEY,
+            json.dumps(build_rollup(totals, windows, now, "cluster")),
+            px=turn_ms * ROLLUP_TTL_INTERVALS,
+        )
+        return True
+
+    @staticmethod
+    async def read_rollup(client: Any) -> Optional[dict[str, Any]]:
+        raw = await client.get(ROLLUP_KEY)
+        return json.loads(raw) if raw else None
@@ -0,0 +1,16 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVICE_DIR))
+
+# No Redis: /stats stays per pod unless a test points it at fakeredis.
+os.environ["REDIS_URL"] = ""
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from dispatch import ChannelConfig, ChannelDispatcher, RateLimiter
+from providers import DeliveryResult, Notification
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = ChannelConfig(
+    workers=1, batch_size=3, batch_wait_seconds=0.01, rate_per_second=0, queue_size=100, max_attempts=3
+)
+
+
+class RecordingProvider:
+    name = "recording"
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    async def send_batch(self, channel, batch):
+        self.calls.append([item.id for item in batch])
+        return [DeliveryResult(item.id, item.id not in self.fail) for item in batch]
+
+
+def notification(index):
+    return Notification(str(index), "email", "dev@example.com", "hi", datetime.now(timezone.utc))
+
+
+async def run(provider, notifications, config=CONFIG):
+    outcomes = []
+    dispatcher = ChannelDispatcher("email", config, provider, outcomes.append)
+    for item in notifications:
+        assert dispatcher.submit(item)
+    dispatcher.start()
+    await dispatcher.stop(drain_seconds=5)
+    return outcomes
+
+
+async def test_queued_notifications_go_out_in_batches():
+    provider = RecordingProvider()
+    outcomes = await run(provider, [notification(index) for index in range(7)])
+
+    assert provider.calls == [["0", "1", "2"], ["3", "4", "5"], ["6"]]
+    assert [len(outcome.delivered) for outcome in outcomes] == [3, 3, 1]
+
+
+async def test_a_batch_waits_briefly_for_more_notifications():
+    provider = RecordingProvider()
+    dispatcher = ChannelDispatcher("email", CONFIG._replace(batch_wait_seconds=0.2), provider, lambda _: None)
+    dispatcher.start()
+    dispatcher.submit(notification(0))
+    await asyncio.sleep(0.05)
+    dispatcher.submit(notification(1))
+    await dispatcher.stop(drain_seconds=5)
+
+    assert provider.calls == [["0", "1"]]
+
+
+async def test_failures_are_retried_until_max_attempts():
+    provider = RecordingProvider(fail={"1"})
+    outcomes = await run(provider, [notification(0), notification(1)])
+
+    assert [call.count("1") for call in provider.calls] == [1, 1, 1]
+    assert sum(outcome.retried for outcome in outcomes) == 2
+    (failed,) = [item for outcome in outcomes for item, _ in outcome.failed]
+    assert (failed.id, failed.attempts) == ("1", 2)
+
+
+async def test_a_provider_error_fails_the_batch_not_the_worker():
+    class Broken(RecordingProvider):
+        async def send_batch(self, channel, batch):
+            await super().send_batch(channel, batch)
+            raise RuntimeError("provider down")
+
+    provider = Broken()
+    outcomes = await run(provider, [notification(0)], CONFIG._replace(max_attempts=1))
+
+    assert [result.error for outcome in outcomes for _, result in outcome.failed] == ["provider down"]
+
+
+async def test_submit_refuses_once_the_queue_is_full():
+    dispatcher = ChannelDispatcher("email", CONFIG._replace(queue_size=2), RecordingProvider(), print)
+
+    assert [dispatcher.submit(notification(index)) for index in range(3)] == [True, True, False]
+
+
+async def test_rate_limit_spaces_batches_out():
+    # A 5-token burst at 100/s: 15 messages take at least 0.1s.
+    limiter = RateLimiter(rate_per_second=100, burst=5)
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire(5)
+
+    assert time.monotonic() - started >= 0.095
+
+
+async def test_channel_rate_limit_is_shared_by_its_workers():
+    # The bucket holds max(rate, batch size) = 100 tokens, so the last 20 of
+    # 120 messages wait about 0.2s whichever worker sends them.
+    provider = RecordingProvider()
+    config = CONFIG._replace(workers=3, batch_size=10, rate_per_second=100, queue_size=200)
+    started = time.monotonic()
+    await run(provider, [notification(index) for index in range(120)], config)
+
+    assert time.monotonic() - started >= 0.18
+    assert sum(map(len, provider.calls)) == 120
@@ -0,0 +1,41 @@
+import httpx
+import pytest
+
+import main
+from dispatch import Dispatcher
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(monkeypatch):
+    """The app without its lifespan, so nothing drains the queues."""
+    config = main.CHANNEL_CONFIGS["sms"]._replace(queue_size=1)
+    dispatcher = Dispatcher({**main.CHANNEL_CONFIGS, "sms": config}, main.build_provider("fake"), main.record_batch)
+    monkeypatch.setattr(main, "dispatcher", dispatcher)
+    monkeypatch.setattr(main, "stats", main.StatsRecorder())
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://notifications.test") as http:
+        yield http
+
+
+async def test_send_queues_and_returns_202(client):
+    response = await client.post("/send", json={"channel": "sms", "recipient": "+15550100", "message": "hi"})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    assert response.json()["sent_at"] is None
+    assert main.dispatcher.depth("sms") == 1
+
+
+async def test_a_full_queue_is_rejected_with_503(client):
+    body = {"channel": "sms", "recipient": "+15550100", "message": "hi"}
+    await client.post("/send", json=body)
+    response = await client.post("/send", json=body)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    stats = (await client.get("/stats")).json()
+    assert stats["scope"] == "pod"
+    assert stats["rejected_by_channel"] == {"sms": 1}
+    assert stats["queued_by_channel"] == {"email": 0, "sms": 1, "push": 0}
@@ -0,0 +1,103 @@
+import fakeredis
+import pytest
+
+import stats
+from stats import FINEST, WINDOWS, StatsRecorder, Window
+
+pytestmark = pytest.mark.anyio
+
+# Aligned to every bucket size, so offsets below read as seconds into the hour.
+HOUR = 1_700_000_000 // 3_600 * 3_600
+
+
+class Clock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def test_window_buckets_are_aligned_and_cover_the_window():
+    window = Window("1m", 60, 10)
+
+    assert window.start(HOUR + 125.9) == HOUR + 120
+    assert window.starts(HOUR + 125.9) == [HOUR + 120 - 10 * index for index in range(6)]
+    assert window.key(HOUR) == f"notifications:stats:10:{HOUR}"
+    assert [window.ttl_seconds for window in WINDOWS] == [70, 3_660, 90_000]
+
+
+def test_local_rollup_drops_counts_that_leave_a_window():
+    clock = Clock(HOUR + 5)
+    recorder = StatsRecorder(clock)
+    recorder.add("sent", "email", 3)
+    clock.now = HOUR + 65
+    recorder.add("sent", "email")
+    recorder.add("failed", "sms", 2)
+    recorder.add("sent", "push", 0)
+
+    rollup = recorder.local_rollup()
+
+    assert rollup["scope"] == "pod"
+    assert (rollup["total_sent"], rollup["by_channel"]) == (4, {"email": 4})
+    assert rollup["failed_by_channel"] == {"sms": 2}
+    # The first send is in a 10s bucket that "1m" no longer covers.
+    assert rollup["windows"]["1m"]["sent"] == {"email": 1}
+    assert rollup["windows"]["1h"]["sent"] == {"email": 4}
+
+
+def test_prune_forgets_buckets_no_window_covers():
+    clock = Clock(HOUR)
+    recorder = StatsRecorder(clock)
+    recorder.add("sent", "email")
+    clock.now = HOUR + 3_600 + 61
+
+    recorder.prune()
+
+    assert {window.name for window, _ in recorder.buckets} == {"24h"}
+
+
+async def test_replicas_flush_into_one_cluster_rollup(redis_client):
+    clock = Clock(HOUR + 30)
+    replicas = [StatsRecorder(clock), StatsRecorder(clock)]
+    replicas[0].add("sent", "email", 2)
+    replicas[1].add("sent", "email")
+    replicas[1].add("rejected", "sms")
+
+    assert [await replica.flush(redis_client) for replica in replicas] == [2, 2]
+    assert await replicas[0].publish_rollup(redis_client, 5)
+    # The other replica's turn comes in the next interval.
+    assert not await replicas[1].publish_rollup(redis_client, 5)
+
+    rollup = await StatsRecorder.read_rollup(redis_client)
+    assert rollup["scope"] == "cluster"
+    assert (rollup["total_sent"], rollup["rejected_by_channel"]) == (3, {"sms": 1})
+    assert rollup["windows"]["1m"]["sent"] == {"email": 3}
+    assert await redis_client.ttl(FINEST.key(HOUR + 30)) == FINEST.ttl_seconds
+
+
+async def test_the_rollup_expires_when_nobody_publishes(redis_client):
+    recorder = StatsRecorder(Clock(HOUR))
+    await recorder.publish_rollup(redis_client, 5)
+
+    assert 0 < await redis_client.pttl(stats.ROLLUP_KEY) <= 5_000 * stats.ROLLUP_TTL_INTERVALS
+
+
+async def test_a_failed_flush_keeps_the_counts(redis_client):
+    recorder = StatsRecorder(Clock(HOUR))
+    recorder.add("sent", "email", 2)
+
+    class Down:
+        def pipeline(self, transaction):
+            raise ConnectionError("redis down")
+
+    with pytest.raises(ConnectionError):
+        await recorder.flush(Down())
+    assert sum(recorder.pending.values()) == 2
+    assert await recorder.flush(redis_client) == 2
+    assert sum(recorder.pending.values()) == 0
@@ -1,14 +1,123 @@
+"""Job runner for the worker CronJob.
+
+Jobs register in JOBS with ``@job``. Each CronJob run executes the jobs named
+on the command line, or in WORKER_JOBS (comma-separated). A finished Job
+cannot be scraped, so every run's duration, row and artifact counts and
+outcome are pushed to a Prometheus Pushgateway when PUSHGATEWAY_URL is set.
+They are always logged.
+"""
+
+import logging
 import os
+import sys
 import time
-from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+WORKER_JOBS = os.getenv("WORKER_JOBS", "locations-snapshot")
+PUSHGATEWAY_URL = os.getenv("PUSHGATEWAY_URL", "")
+# The worker image (and the repo) keep the locations service next to this directory.
+LOCATIONS_PATH = os.getenv(
+    "LOCATIONS_PATH", str(Path(__file__).resolve().parent.parent / "locations")
+)
+
+logger = logging.getLogger("worker")
+
+registry = CollectorRegistry()
+JOB_DURATION = Gauge(
+    "worker_job_duration_seconds", "Wall time of the job's last run", ("job",), registry=registry
+)
+JOB_ROWS = Gauge("worker_job_rows", "Rows the job's last run read", ("job",), registry=registry)
+JOB_ARTIFACTS = Gauge(
+    "worker_job_artifacts", "Artifacts the job's last run wrote", ("job",), registry=registry
+)
+JOB_ARTIFACT_BYTES = Gauge(
+    "worker_job_artifact_bytes",
+    "Bytes of artifacts the job's last run wrote, compressed variants included",
+    ("job",),
+    registry=registry,
+)
+JOB_LAST_RUN = Gauge(
+    "worker_job_last_run_timestamp_seconds",
+    "When the job last finished, by status (built, restamped, unchanged, failed, ...)",
+    ("job", "status"),
+    registry=registry,
+)
+
+
+class JobResult(NamedTuple):
+    # Job-specific outcome, e.g. "built" or "unchanged" for incremental jobs.
+    status: str
+    rows: int = 0
+    artifacts: int = 0
+    artifact_bytes: int = 0
+
+
+JOBS: Dict[str, Callable[[], JobResult]] = {}
+
+
+def job(name: str) -> Callable[[Callable[[], JobResult]], Callable[[], JobResult]]:
+    def register(func: Callable[[], JobResult]) -> Callable[[], JobResult]:
+        JOBS[name] = func
+        return func
+
+    return register
+
+
+@job("locations-snapshot")
+def locations_snapshot() -> JobResult:
+    """Precompute the locations list, map summary and category slices into Redis."""
+    # Put the locations code first so its own `import main` does not find this file.
+    sys.path.insert(0, LOCATIONS_PATH)
+    import snapshot
+
+    result = snapshot.run()
+    return JobResult(result.status, result.rows, result.artifacts, result.bytes)
+
+
+def run_job(name: str) -> bool:
+    logger.info("%s started", name)
+    started = time.perf_counter()
+    try:
+        result = JOBS[name]()
+    except Exception:  # noqa: BLE001 - record the failure and let the other jobs run
+        logger.exception("%s failed", name)
+        result = JobResult("failed")
+    duration = time.perf_counter() - started
+    JOB_DURATION.labels(name).set(duration)
+    JOB_ROWS.labels(name).set(result.rows)
+    JOB_ARTIFACTS.labels(name).set(result.artifacts)
+    JOB_ARTIFACT_BYTES.labels(name).set(result.artifact_bytes)
+    JOB_LAST_RUN.labels(name, result.status).set_to_current_time()
+    logger.info(
+        "%s %s in %.2fs: %d rows, %d artifacts, %d bytes",
+        name,
+        result.status,
+        duration,
+        result.rows,
+        result.artifacts,
+        result.artifact_bytes,
+    )
+    return result.status != "failed"
 
 
-def run() -> None:
-    job_name = os.getenv("JOB_NAME", "worker")
-    print(f"[{datetime.utcnow().isoformat()}] {job_name} started")
-    time.sleep(1)
-    print(f"[{datetime.utcnow().isoformat()}] {job_name} completed")
+def run(names: List[str]) -> int:
+    unknown = [name for name in names if name not in JOBS]
+    if unknown:
+        logger.error("Unknown jobs %s; registered: %s", ", ".join(unknown), ", ".join(sorted(JOBS)))
+        return 2
+    succeeded = [run_job(name) for name in names]
+    if PUSHGATEWAY_URL:
+        try:
+            push_to_gateway(PUSHGATEWAY_URL, job="worker", registry=registry)
+        except OSError as exc:
+            logger.warning("Could not push metrics to %s: %s", PUSHGATEWAY_URL, exc)
+    return 0 if all(succeeded) else 1
 
 
 if __name__ == "__main__":
-    run()
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(name)s %(message)s")
+    names = sys.argv[1:] or [name.strip() for name in WORKER_JOBS.split(",") if name.strip()]
+    sys.exit(run(names))